@@ -1,35 +1,135 @@
-from flask import Flask, render_template, request, redirect, url_for, flash, jsonify
+from flask import Flask, Response, render_template, request, redirect, url_for, flash, jsonify, g
 from flask_migrate import Migrate
-from models import db, Customer, Service, Order
-import json
+from sqlalchemy.orm import aliased, joinedload, selectinload
+from models import db, chunked, Customer, DuplicateCandidate, Service, Order, OrderLine, OrderArchive, OrderLineArchive, Job, ORDER_SORTS, JOB_STATUSES
+from assets import build_assets, setup_assets
+from compression import setup_compression
+from dashboard import setup_dashboard
+from dedup import find_duplicates, save_candidates
+from events import EventBroker, stream as event_stream
+from db_schema import SchemaExistsError, bootstrap_schema
+from template_cache import precompile_templates, setup_template_cache
+from archive import archive_orders, move_orders, purge_deleted_orders
+from audit import setup_audit, snapshot
+from jobs import HANDLERS as JOB_HANDLERS, cancel as cancel_job, enqueue, run_workers, work
+from idempotency import IdempotencyConflict, find_result, remember, request_hash, request_key
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+import click
+import uuid
+import os
+from config import get_settings, CONFIG_FILE
 from logger_config import setup_logger
 from health_check_config import check_db, check_logging
-from validation import is_valid_phone, ValidDate, is_empty_field
-from datetime import datetime
+from db_pool import engine_options, register_pool_events, pool_metrics
+from schemas import customer_schema, service_schema, order_schema, order_line_schema
+from validation import is_empty_field, parse_price
+from datetime import datetime, timedelta
 
 
 app = Flask(__name__)
-try:
-    with open('config.json', 'r') as json_config:
-        config_data = json.load(json_config)
-        app.config.update(config_data)
-
-except FileNotFoundError:
-    app.config['SECRET_KEY'] = 'something-goes-wrong-use-this-key'
-    app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///flask.db'
-    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-    app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
-        'pool_pre_ping': True,
-        'pool_recycle': 600
-    }
+# Настройки проверяются один раз при запуске; ошибка конфигурации
+# останавливает приложение с перечнем всех проблем
+settings = get_settings(os.getenv('APP_CONFIG', CONFIG_FILE))
+app.config.from_mapping(settings)
+app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
 
 setup_logger(app)
+audit_writer = setup_audit(app)
+setup_assets(app)
+setup_compression(app)
+setup_template_cache(app)
 db.init_app(app)
+kpi_store = setup_dashboard(app)
+with app.app_context():
+    register_pool_events(db.engine, app.config)
 migrate = Migrate(app, db)
 
-PER_PAGE_CUSTOMERS = app.config['PER_PAGE_CUSTOMERS']
-PER_PAGE_SERVICES = app.config['PER_PAGE_SERVICES']
-PER_PAGE_ORDERS = app.config['PER_PAGE_ORDERS']
+PER_PAGE_CUSTOMERS = settings['PER_PAGE_CUSTOMERS']
+PER_PAGE_SERVICES = settings['PER_PAGE_SERVICES']
+PER_PAGE_ORDERS = settings['PER_PAGE_ORDERS']
+
+# События изменения заказов для открытых страниц списка заказов
+order_events = EventBroker(buffer_size=settings['EVENTS_BUFFER_SIZE'],
+                           history_size=settings['EVENTS_BUFFER_SIZE'])
+
+
+@app.before_request
+def assign_request_id():
+    # Идентификатор запроса связывает записи аудита одного запроса
+    g.request_id = request.headers.get('X-Request-ID') or uuid.uuid4().hex
+
+
+@app.after_request
+def add_request_id_header(response):
+    if 'request_id' in g:
+        response.headers['X-Request-ID'] = g.request_id
+    return response
+
+
+def audit(entity, entity_id, action, before=None, after=None):
+    """Ставит в очередь журнала аудита изменение сущности."""
+    audit_writer.write(entity, entity_id, action, before=before, after=after,
+                       request_id=g.get('request_id'))
+
+
+def publish_order_event(action, order_id, order=None):
+    """Сообщает открытым спискам заказов о созданном, изменённом или
+    удалённом заказе. Вызывается после commit.
+
+    Вместе с событием уходит готовая строка таблицы, страница вставляет
+    её без запроса к серверу.
+    """
+    data = {'id': order_id}
+    if order is not None:
+        data['order_date'] = order.order_date.isoformat()
+        data['html'] = render_template('order_row.html', order=order)
+    order_events.publish(action, data)
+
+
+def version_conflict(entity, entity_id, expected, current):
+    """Форма отправлена по устаревшей версии записи.
+
+    Кто-то сохранил запись после того, как форма была открыта; изменения
+    не применяются, а форма показывается заново с актуальными данными.
+    """
+    app.logger.warning(
+        f"Attempt to update a {entity} from a stale version. ID: {entity_id}, "
+        f"version: {expected}, current version: {current}.")
+    flash("Эту запись уже изменил другой пользователь. В форме актуальные данные, "
+          "внесите изменения ещё раз", 'warning')
+
+
+def record_deleted(entity, entity_id, list_endpoint):
+    """Запись удалили, пока была открыта форма редактирования."""
+    app.logger.warning(
+        f"Attempt to update a {entity} that has been deleted. ID: {entity_id}.")
+    flash("Эту запись уже удалил другой пользователь", 'warning')
+    return redirect(url_for(list_endpoint))
+
+
+def load_snapshots(model, ids):
+    """Снимки для журнала аудита существующих записей из ids: {id: снимок}."""
+    snapshots = {}
+    for chunk in chunked(sorted(ids)):
+        for obj in model.query.filter(model.id.in_(chunk)):
+            snapshots[obj.id] = snapshot(obj)
+    return snapshots
+
+
+def order_snapshot(order):
+    return snapshot(order, lines=[
+        [line.service_id, line.quantity, line.price_kopecks]
+        for line in order.lines])
+
+
+def flash_form_errors(errors, action, entity_id=None):
+    """Записывает в журнал и показывает пользователю все ошибки формы сразу."""
+    suffix = f" ID: {entity_id}." if entity_id is not None else ''
+    for error in errors:
+        app.logger.warning(
+            f"Attempt to {action} with {error.log_message}.{suffix}")
+        flash(error.message, 'danger')
 
 
 @app.route('/health')
@@ -41,13 +141,19 @@ def health_check():
 
     overall_check = all(value == 'OK' for value in health_status.values())
     status_code = 200 if overall_check else 500
-    return jsonify(status='OK' if overall_check else 'FAIL', details=health_status), status_code
+    return jsonify(status='OK' if overall_check else 'FAIL', details=health_status,
+                   pool=pool_metrics.snapshot(db.engine.pool)), status_code
+
+
+@app.route('/metrics')
+def metrics():
+    return jsonify(pool=pool_metrics.snapshot(db.engine.pool))
 
 
 # <-- Базовый блок страницы
 @app.route('/')
 def index():
-    return render_template('index.html')
+    return render_template('index.html', kpis=kpi_store.get())
 # Базовый блок страницы -->
 
 
@@ -64,38 +170,9 @@ def add_customer():
         app.logger.info(
             f"Start creating customer")
 
-        if is_empty_field(name):
-            app.logger.warning(
-                f"Attempt to create a customer with an empty name field.")
-            flash("Поле \"ФИО\" обязательно для заполнения", 'danger')
-            return render_template('add_customer.html', form_data=request.form)
-
-        if is_empty_field(phone_number):
-            app.logger.warning(
-                f"Attempt to create a customer with an empty phone number field.")
-            flash("Поле \"Номер телефона\" обязательно для заполнения", 'danger')
-            return render_template('add_customer.html', form_data=request.form)
-
-        if not is_valid_phone(phone_number):
-            app.logger.warning(
-                f"Attempt to create a client with an invalid phone number format.")
-            flash(
-                "Неверный формат номера телефона. Используйте российский формат", 'danger')
-            return render_template('add_customer.html', form_data=request.form)
-
-        is_valid, message = ValidDate.is_valid_birth_date(date_of_birth)
-        if not is_valid:
-            app.logger.warning(
-                f"Attempt to create a client with an invalid date of birth. Message: {message}")
-            flash(message, 'danger')
-            return render_template('add_customer.html', form_data=request.form)
-
-        existing_phone_number = Customer.query.filter_by(
-            phone_number=phone_number).first()
-        if existing_phone_number:
-            app.logger.warning(
-                f"Attempt to create a client with an existing phone number in the database. Phone number: {phone_number}")
-            flash("Клиент с таким номером телефона уже существует", 'danger')
+        errors = customer_schema.validate(request.form)
+        if errors:
+            flash_form_errors(errors, "create a customer")
             return render_template('add_customer.html', form_data=request.form)
 
         try:
@@ -111,9 +188,11 @@ def add_customer():
 
             db.session.add(new_customer)
             db.session.commit()
+            audit('customer', new_customer.id, 'create',
+                  after=snapshot(new_customer))
 
             app.logger.info(
-                f"Service successfully created. ID: {new_customer.id}")
+                f"Customer successfully created. ID: {new_customer.id}")
 
             flash("Клиент успешно добавлен!", 'success')
             return redirect(url_for('list_customers'))
@@ -121,7 +200,7 @@ def add_customer():
         except Exception as e:
             db.session.rollback()
             app.logger.error(
-                f"Error creating service. ID: {new_customer.id}. Error: {str(e)}", exc_info=True)
+                f"Error creating customer. Phone: {phone_number}. Error: {str(e)}", exc_info=True)
             print(f"Ошибка при добавлении клиента: {e}")
             flash("Произошла ошибка при добавлении клиента", 'danger')
             return render_template('add_customer.html', form_data=request.form)
@@ -142,48 +221,24 @@ def update_customer(customer_id):
         email = request.form.get('email')
         company = request.form.get('company')
 
+        expected_version = request.form.get('version', type=int)
+
         app.logger.info(
             f"Start editing customer. ID: {customer_id}.")
 
-        if is_empty_field(name):
-            app.logger.warning(
-                f"Attempt to send an customer with an empty customer name field. ID: {customer_id}.")
-            flash("Поле \"ФИО\" обязательно для заполнения", 'danger')
-            return render_template('update_customer.html', customer=customer)
-
-        if is_empty_field(phone_number):
-            app.logger.warning(
-                f"Attempt to send an customer with an empty customer phone number field. ID: {customer_id}.")
-            flash("Поле \"Номер телефона\" обязательно для заполнения", 'danger')
-            return render_template('update_customer.html', customer=customer)
-
-        if not is_valid_phone(phone_number):
-            app.logger.warning(
-                f"Attempt to send a customer with an invalid phone number format.")
-            flash(
-                "Неверный формат номера телефона. Используйте российский формат", 'danger')
-            return render_template('update_customer.html', customer=customer)
+        if expected_version is not None and expected_version != customer.version:
+            version_conflict('customer', customer_id, expected_version, customer.version)
+            return render_template('update_customer.html', customer=customer), 409
 
-        is_valid, message = ValidDate.is_valid_birth_date(date_of_birth)
-        if not is_valid:
-            app.logger.warning(
-                f"Attempt to send a customer with an invalid date of birth. Message: {message}")
-            flash(message, 'danger')
-            return render_template('update_customer.html', customer=customer)
-
-        existing_phone_number = Customer.query.filter(
-            Customer.phone_number == phone_number,
-            Customer.id != customer_id
-        ).first()
-
-        if existing_phone_number:
-            app.logger.warning(
-                f"Attempt to send a customer with an existing phone number in the database. Phone number: {phone_number}")
-            flash("Клиент с таким номером телефона уже существует", 'danger')
+        errors = customer_schema.validate(
+            request.form, instance_id=customer_id)
+        if errors:
+            flash_form_errors(errors, "send a customer", customer_id)
             return render_template('update_customer.html', customer=customer)
 
         try:
             date_obj = datetime.strptime(date_of_birth, '%Y-%m-%d').date()
+            before = snapshot(customer)
 
             customer.name = name
             customer.date_of_birth = date_obj
@@ -192,6 +247,8 @@ def update_customer(customer_id):
             customer.company = company
 
             db.session.commit()
+            audit('customer', customer_id, 'update',
+                  before=before, after=snapshot(customer))
 
             app.logger.info(
                 f"Customer successfully updated. ID: {customer_id}.")
@@ -199,6 +256,15 @@ def update_customer(customer_id):
             flash("Данные клиента успешно обновлены!", 'success')
             return redirect(url_for('list_customers'))
 
+        except StaleDataError:
+            # Запись изменили между загрузкой и UPDATE ... WHERE version = ...
+            db.session.rollback()
+            customer = db.session.get(Customer, customer_id)
+            if customer is None:
+                return record_deleted('customer', customer_id, 'list_customers')
+            version_conflict('customer', customer_id, expected_version, customer.version)
+            return render_template('update_customer.html', customer=customer), 409
+
         except Exception as e:
             db.session.rollback()
             app.logger.error(
@@ -216,20 +282,21 @@ def delete_customer(customer_id):
     try:
         customer = Customer.query.get_or_404(customer_id)
 
-        orders_count = Order.query.filter_by(customer_id=customer_id).count()
-
-        if orders_count > 0:
+        if Customer.referenced_ids([customer_id]):
             app.logger.warning(
-                f"Attempt to delete a customer associated with an order(s). ID: {customer.id}, Number of orders: {orders_count}.")
+                f"Attempt to delete a customer associated with an order(s). ID: {customer.id}.")
             flash(
-                f"Невозможно удалить клиента. У этого клиента есть оформленные заказы: {orders_count}", 'warning')
+                "Невозможно удалить клиента. У этого клиента есть оформленные заказы", 'warning')
             return redirect(url_for('list_customers'))
 
+        before = snapshot(customer)
+        purge_deleted_orders(OrderArchive.customer_id == customer_id)
         db.session.delete(customer)
         db.session.commit()
+        audit('customer', customer_id, 'delete', before=before)
 
         app.logger.info(
-            f"Service successfully deleted. ID: {customer.id}.")
+            f"Customer successfully deleted. ID: {customer.id}.")
 
         flash("Клиент успешно удален!", 'success')
         return redirect(url_for('list_customers'))
@@ -237,12 +304,116 @@ def delete_customer(customer_id):
     except Exception as e:
         db.session.rollback()
         app.logger.error(
-            f"Error deleting service. ID: {customer.id}. Error: {str(e)}", exc_info=True)
+            f"Error deleting customer. ID: {customer.id}. Error: {str(e)}", exc_info=True)
         print(f"Ошибка при удалении клиента: {e}")
         flash("Произошла ошибка при удалении клиента", 'danger')
         return redirect(url_for('list_customers'))
 
 
+@app.route('/delete-customers', methods=['POST'])
+def delete_customers():
+    ids = set(request.form.getlist('ids', type=int))
+    if not ids:
+        flash("Не выбрано ни одного клиента", 'warning')
+        return redirect(url_for('list_customers'))
+
+    app.logger.info(f"Start deleting customers. Selected: {len(ids)}.")
+    try:
+        referenced = Customer.referenced_ids(ids)
+        before = load_snapshots(Customer, ids - referenced)
+        for chunk in chunked(sorted(before)):
+            purge_deleted_orders(OrderArchive.customer_id.in_(chunk))
+            db.session.execute(
+                db.delete(Customer).where(Customer.id.in_(chunk)),
+                execution_options={'synchronize_session': False})
+        db.session.commit()
+        for customer_id, snapshot_before in before.items():
+            audit('customer', customer_id, 'delete', before=snapshot_before)
+
+        app.logger.info(
+            f"Customers deleted: {len(before)}, skipped with orders: {len(referenced)}.")
+        flash(f"Удалено клиентов: {len(before)}", 'success')
+        if referenced:
+            flash(f"Не удалены клиенты с оформленными заказами: {len(referenced)}", 'warning')
+
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(
+            f"Error deleting customers. IDs: {sorted(ids)}. Error: {str(e)}", exc_info=True)
+        flash("Произошла ошибка при удалении клиентов", 'danger')
+
+    return redirect(url_for('list_customers'))
+
+
+@app.route('/merge-customers', methods=['POST'])
+def merge_customers():
+    survivor_id = request.form.get('survivor_id', type=int)
+    duplicate_ids = set(request.form.getlist('ids', type=int)) - {survivor_id}
+    survivor = db.session.get(Customer, survivor_id) if survivor_id else None
+    # Объединение из очереди дубликатов возвращает обратно в очередь
+    back = url_for('duplicates') if request.form.get('from_review') else url_for('list_customers')
+    if survivor is None or not duplicate_ids:
+        app.logger.warning(
+            f"Attempt to merge customers without a survivor or duplicates. Survivor: {survivor_id}, duplicates: {sorted(duplicate_ids)}.")
+        flash("Выберите основного клиента и хотя бы одного дубликата", 'warning')
+        return redirect(back)
+
+    app.logger.info(
+        f"Start merging customers. Survivor: {survivor_id}, duplicates: {len(duplicate_ids)}.")
+    try:
+        before = load_snapshots(Customer, duplicate_ids)
+        moved = Customer.merge(survivor_id, before)
+        db.session.commit()
+        audit('customer', survivor_id, 'merge',
+              after={'merged_ids': sorted(before), 'orders_moved': moved})
+        for customer_id, snapshot_before in before.items():
+            audit('customer', customer_id, 'delete', before=snapshot_before)
+
+        app.logger.info(
+            f"Customers merged. Survivor: {survivor_id}, merged: {len(before)}, orders moved: {moved}.")
+        flash(f"Клиенты объединены с «{survivor.name}». Объединено: {len(before)}, перенесено заказов: {moved}", 'success')
+
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(
+            f"Error merging customers. Survivor: {survivor_id}. Error: {str(e)}", exc_info=True)
+        flash("Произошла ошибка при объединении клиентов", 'danger')
+
+    return redirect(back)
+
+
+@app.route('/duplicates')
+def duplicates():
+    page = request.args.get('page', 1, type=int)
+    customer = aliased(Customer)
+    duplicate = aliased(Customer)
+    # Пары, где один из клиентов уже удалён, отпадают при соединении
+    candidates = DuplicateCandidate.query.join(
+        customer, customer.id == DuplicateCandidate.customer_id).join(
+        duplicate, duplicate.id == DuplicateCandidate.duplicate_id).filter(
+        DuplicateCandidate.status == 'pending').options(
+        selectinload(DuplicateCandidate.customer),
+        selectinload(DuplicateCandidate.duplicate)).order_by(
+        DuplicateCandidate.score.desc(), DuplicateCandidate.id).paginate(
+        page=page, per_page=PER_PAGE_CUSTOMERS, error_out=False)
+
+    app.logger.info(
+        f"The duplicate review page has been loaded. Page {page}, total pages: {candidates.pages}")
+    return render_template('duplicates.html', candidates=candidates)
+
+
+@app.route('/duplicates/<int:candidate_id>/dismiss', methods=['POST'])
+def dismiss_duplicate(candidate_id):
+    candidate = db.get_or_404(DuplicateCandidate, candidate_id)
+    candidate.status = 'dismissed'
+    candidate.reviewed_at = datetime.now()
+    db.session.commit()
+    app.logger.info(
+        f"Duplicate candidate dismissed. ID: {candidate_id}, customers: {candidate.customer_id}, {candidate.duplicate_id}.")
+    flash("Пара отмечена как разные клиенты", 'success')
+    return redirect(url_for('duplicates', page=request.form.get('page', 1, type=int)))
+
+
 @app.route('/list-customers')
 def list_customers():
     page = request.args.get('page', 1, type=int)
@@ -255,6 +426,32 @@ def list_customers():
     app.logger.info(
         f"The page with customers has been loaded. Page {page}, total pages: {customers.pages}")
     return render_template('list_customers.html', customers=customers)
+
+
+@app.route('/customer/<int:customer_id>')
+def customer_detail(customer_id):
+    customer = Customer.query.get_or_404(customer_id)
+    page = request.args.get('page', 1, type=int)
+
+    orders = Order.query.options(
+        selectinload(Order.lines).joinedload(OrderLine.service)
+    ).filter(
+        Order.customer_id == customer_id
+    ).order_by(
+        Order.order_date.desc(), Order.id.desc()
+    ).paginate(
+        page=page,
+        per_page=PER_PAGE_ORDERS,
+        error_out=False
+    )
+    # Сводка по архиву считается только по запросу: UNION с архивом дороже
+    include_archive = request.args.get('archive', 0, type=int) == 1
+    summary = customer.order_summary(include_archive=include_archive)
+
+    app.logger.info(
+        f"The customer page has been loaded. ID: {customer_id}, page {page}, total pages: {orders.pages}, archive: {include_archive}")
+    return render_template('customer_detail.html', customer=customer, orders=orders, summary=summary,
+                           include_archive=include_archive)
 # Работа с клиентами -->
 
 
@@ -269,22 +466,9 @@ def add_service():
         app.logger.info(
             f"Start creating service")
 
-        if is_empty_field(service_name):
-            app.logger.warning(
-                f"Attempt to create a service with an empty service name field.")
-            flash("Поле \"Название услуги\" обязательно для заполнения", 'danger')
-            return render_template('add_service.html', form_data=request.form)
-
-        if is_empty_field(description):
-            app.logger.warning(
-                f"Attempt to create a service with an empty service description field.")
-            flash("Поле \"Описание услуги\" обязательно для заполнения", 'danger')
-            return render_template('add_service.html', form_data=request.form)
-
-        if is_empty_field(price):
-            app.logger.warning(
-                f"Attempt to create a service with an empty price field.")
-            flash("Поле \"Стоимость\" обязательно для заполнения", 'danger')
+        errors = service_schema.validate(request.form)
+        if errors:
+            flash_form_errors(errors, "create a service")
             return render_template('add_service.html', form_data=request.form)
 
         try:
@@ -296,6 +480,8 @@ def add_service():
 
             db.session.add(new_service)
             db.session.commit()
+            audit('service', new_service.id, 'create',
+                  after=snapshot(new_service))
 
             app.logger.info(
                 f"Service successfully created. ID: {new_service.id}")
@@ -325,38 +511,42 @@ def update_service(service_id):
         description = request.form.get('description')
         price = request.form.get('price')
 
+        expected_version = request.form.get('version', type=int)
+
         app.logger.info(
             f"Start editing service. ID: {service_id}.")
 
-        if is_empty_field(service_name):
-            app.logger.warning(
-                f"Attempt to send an service with an empty order name field. ID: {service_id}.")
-            flash("Поле \"Название услуги\" обязательно для заполнения", 'danger')
-            return render_template('update_service.html', service=service)
-
-        if is_empty_field(description):
-            app.logger.warning(
-                f"Attempt to send an service with an empty order description field. ID: {service_id}.")
-            flash("Поле \"Описание услуги\" обязательно для заполнения", 'danger')
-            return render_template('update_service.html', service=service)
+        if expected_version is not None and expected_version != service.version:
+            version_conflict('service', service_id, expected_version, service.version)
+            return render_template('update_service.html', service=service), 409
 
-        if is_empty_field(price):
-            app.logger.warning(
-                f"Attempt to send an service with an empty order price field. ID: {service_id}.")
-            flash("Поле \"Стоимость услуги\" обязательно для заполнения", 'danger')
+        errors = service_schema.validate(request.form, instance_id=service_id)
+        if errors:
+            flash_form_errors(errors, "send a service", service_id)
             return render_template('update_service.html', service=service)
 
         try:
+            before = snapshot(service)
             service.service_name = service_name
             service.description = description
             service.price = price
 
             db.session.commit()
+            audit('service', service_id, 'update',
+                  before=before, after=snapshot(service))
             app.logger.info(
                 f"Service successfully updated. ID: {service_id}.")
             flash("Данные услуги успешно обновлены!", 'success')
             return redirect(url_for('list_services'))
 
+        except StaleDataError:
+            db.session.rollback()
+            service = db.session.get(Service, service_id)
+            if service is None:
+                return record_deleted('service', service_id, 'list_services')
+            version_conflict('service', service_id, expected_version, service.version)
+            return render_template('update_service.html', service=service), 409
+
         except Exception as e:
             db.session.rollback()
             app.logger.error(
@@ -374,17 +564,20 @@ def delete_service(service_id):
     try:
         service = Service.query.get_or_404(service_id)
 
-        orders_count = Order.query.filter_by(service_id=service_id).count()
-
-        if orders_count > 0:
+        if Service.referenced_ids([service_id]):
             app.logger.warning(
-                f"Attempt to delete a service associated with an order(s). ID: {service.id}, Number of orders: {orders_count}.")
+                f"Attempt to delete a service associated with an order(s). ID: {service.id}.")
             flash(
-                f"Невозможно удалить услугу. Есть оформленные заказы с этой услугой: {orders_count}", 'warning')
+                "Невозможно удалить услугу. Есть оформленные заказы с этой услугой", 'warning')
             return redirect(url_for('list_services'))
 
+        purge_deleted_orders(OrderArchive.id.in_(
+            db.select(OrderLineArchive.order_id).where(
+                OrderLineArchive.service_id == service_id)))
+        before = snapshot(service)
         db.session.delete(service)
         db.session.commit()
+        audit('service', service_id, 'delete', before=before)
 
         app.logger.info(
             f"Service successfully deleted. ID: {service.id}.")
@@ -401,6 +594,43 @@ def delete_service(service_id):
         return redirect(url_for('list_services'))
 
 
+@app.route('/delete-services', methods=['POST'])
+def delete_services():
+    ids = set(request.form.getlist('ids', type=int))
+    if not ids:
+        flash("Не выбрано ни одной услуги", 'warning')
+        return redirect(url_for('list_services'))
+
+    app.logger.info(f"Start deleting services. Selected: {len(ids)}.")
+    try:
+        referenced = Service.referenced_ids(ids)
+        before = load_snapshots(Service, ids - referenced)
+        for chunk in chunked(sorted(before)):
+            purge_deleted_orders(OrderArchive.id.in_(
+                db.select(OrderLineArchive.order_id).where(
+                    OrderLineArchive.service_id.in_(chunk))))
+            db.session.execute(
+                db.delete(Service).where(Service.id.in_(chunk)),
+                execution_options={'synchronize_session': False})
+        db.session.commit()
+        for service_id, snapshot_before in before.items():
+            audit('service', service_id, 'delete', before=snapshot_before)
+
+        app.logger.info(
+            f"Services deleted: {len(before)}, skipped with orders: {len(referenced)}.")
+        flash(f"Удалено услуг: {len(before)}", 'success')
+        if referenced:
+            flash(f"Не удалены услуги, которые есть в заказах: {len(referenced)}", 'warning')
+
+    except Exception as e:
+        db.session.rollback()
+        app.logger.error(
+            f"Error deleting services. IDs: {sorted(ids)}. Error: {str(e)}", exc_info=True)
+        flash("Произошла ошибка при удалении услуг", 'danger')
+
+    return redirect(url_for('list_services'))
+
+
 @app.route('/list-services')
 def list_services():
     page = request.args.get('page', 1, type=int)
@@ -417,6 +647,67 @@ def list_services():
 
 
 # <-- Работа с заказами
+def order_lines_from_form(form):
+    """Строки заказа из формы: параллельные списки service_id и quantity.
+
+    Пустые дополнительные строки отбрасываются; если заполненных строк нет,
+    остаётся одна пустая, чтобы схема сообщила о невыбранной услуге.
+    """
+    service_ids = form.getlist('service_id')
+    quantities = form.getlist('quantity')
+    lines = [
+        {'service_id': service_id,
+         'quantity': quantities[index] if index < len(quantities) else None}
+        for index, service_id in enumerate(service_ids)
+    ]
+    filled = [line for line in lines if not is_empty_field(line['service_id'])]
+    return filled or lines[:1] or [{'service_id': None, 'quantity': None}]
+
+
+def validate_order_form(form, order_id=None):
+    """Проверяет шапку заказа и все его строки, возвращает (строки, ошибки)."""
+    lines = order_lines_from_form(form)
+    errors = order_schema.validate(form, instance_id=order_id)
+
+    seen = set()
+    for line_errors in order_line_schema.validate_many(lines):
+        for error in line_errors:
+            if (error.field, error.code) not in seen:
+                seen.add((error.field, error.code))
+                errors.append(error)
+    return lines, errors
+
+
+def build_order_lines(lines, existing_lines=()):
+    """Строки заказа с ценой за единицу.
+
+    Повторяющиеся услуги объединяются в одну строку. Для услуг, которые уже
+    были в заказе, сохраняется прежняя цена, для новых берётся текущая цена
+    услуги (одним запросом на все строки).
+    """
+    quantities = {}
+    for line in lines:
+        service_id = int(line['service_id'])
+        quantities[service_id] = quantities.get(service_id, 0) + \
+            int(line['quantity'] or 1)
+
+    prices = dict(db.session.query(Service.id, Service.price_kopecks).filter(
+        Service.id.in_(quantities)))
+    prices.update({line.service_id: line.price_kopecks
+                   for line in existing_lines})
+
+    return [
+        OrderLine(service_id=service_id, quantity=quantity,
+                  price_kopecks=prices[service_id])
+        for service_id, quantity in quantities.items()
+    ]
+
+
+def format_order_lines(lines):
+    return ', '.join(
+        f"{line['service_id']}x{line['quantity'] or 1}" for line in lines)
+
+
 @app.route('/add-order', methods=['GET', 'POST'])
 def add_order():
     customers = Customer.query.all()
@@ -424,74 +715,100 @@ def add_order():
 
     if request.method == 'POST':
         customer_id = request.form.get('customer_id')
-        service_id = request.form.get('service_id')
         order_date = request.form.get('order_date')
+        idempotency_key = request_key(request)
+        fingerprint = request_hash(request.form)
 
-        app.logger.info(
-            f"Start creating order. Customer: {customer_id}, Service: {service_id}")
-
-        if is_empty_field(customer_id):
-            app.logger.warning(
-                f"Attempt to create an order with empty fields. Customer: {customer_id}, Service: {service_id}")
-            flash("Пожалуйста, выберите клиента", 'danger')
-            return render_template('add_order.html', customers=customers, services=services, now=datetime.now)
-
-        if is_empty_field(service_id):
-            app.logger.warning(
-                f"Attempt to create an order with empty fields. Customer: {customer_id}, Service: {service_id}")
-            flash("Пожалуйста, выберите услугу", 'danger')
-            return render_template('add_order.html', customers=customers, services=services, now=datetime.now)
+        def render_form(status=200):
+            return render_template('add_order.html', customers=customers, services=services,
+                                   now=datetime.now, idempotency_key=idempotency_key or uuid.uuid4().hex), status
 
-        customer = Customer.query.get(customer_id)
-        if not customer:
+        def key_conflict():
             app.logger.warning(
-                f"Attempt to create an order with non-existent customer. Customer ID: {customer_id}")
-            flash("Выбранный клиент не существует в базе данных", 'danger')
-            return render_template('add_order.html', customers=customers, services=services, now=datetime.now)
+                f"Attempt to create an order with a reused idempotency key. Key: {idempotency_key}")
+            flash("Эта форма уже была отправлена с другими данными. Обновите страницу и оформите заказ заново", 'danger')
+            return render_form(422)
+
+        if idempotency_key:
+            # Повтор той же отправки (двойной клик, повтор прокси) получает
+            # исходный результат без новой вставки
+            try:
+                order_id = find_result('add_order', idempotency_key, fingerprint)
+            except IdempotencyConflict:
+                return key_conflict()
+            if order_id is not None:
+                return replay_order(order_id, idempotency_key)
+
+        lines, errors = validate_order_form(request.form)
+        service_ids = format_order_lines(lines)
 
-        service = Service.query.get(service_id)
-        if not service:
-            app.logger.warning(
-                f"Attempt to create an order with non-existent service. Service ID: {service_id}")
-            flash("Выбранная услуга не существует в базе данных", 'danger')
-            return render_template('add_order.html', customers=customers, services=services, now=datetime.now)
+        app.logger.info(
+            f"Start creating order. Customer: {customer_id}, Service: {service_ids}")
 
-        is_valid, message = ValidDate.is_valid_order_date(order_date)
-        if not is_valid:
-            app.logger.warning(
-                f"Attempt to create an order with invalid date of order. Message: {message}")
-            flash(message, 'danger')
-            return render_template('add_order.html', customers=customers, services=services, now=datetime.now)
+        if errors:
+            flash_form_errors(errors, "create an order")
+            return render_form()
 
         try:
             order_date = datetime.now().date()
 
             new_order = Order(
                 customer_id=customer_id,
-                service_id=service_id,
-                order_date=order_date
+                order_date=order_date,
+                lines=build_order_lines(lines)
             )
 
             db.session.add(new_order)
+            if idempotency_key:
+                # id заказа нужен ключу; commit по-прежнему один
+                db.session.flush()
+                remember('add_order', idempotency_key, fingerprint, new_order.id,
+                         app.config['IDEMPOTENCY_TTL_SECONDS'])
             db.session.commit()
+            audit('order', new_order.id, 'create',
+                  after=order_snapshot(new_order))
+            publish_order_event('create', new_order.id, new_order)
 
             app.logger.info(
-                f"Order successfully created. ID: {new_order.id}, Customer: {customer_id}, Service: {service_id}, Date: {order_date}")
+                f"Order successfully created. ID: {new_order.id}, Customer: {customer_id}, Service: {service_ids}, Date: {order_date}")
 
             flash("Заказ успешно оформлен", 'success')
             return redirect(url_for('list_orders'))
 
+        except IntegrityError as e:
+            db.session.rollback()
+            # Одновременный повтор успел сохранить заказ с этим ключом первым
+            try:
+                order_id = find_result('add_order', idempotency_key, fingerprint) if idempotency_key else None
+            except IdempotencyConflict:
+                return key_conflict()
+            if order_id is not None:
+                return replay_order(order_id, idempotency_key)
+            app.logger.error(
+                f"Error creating order. Customer: {customer_id}, Service: {service_ids}. Error: {str(e)}", exc_info=True)
+            flash("Произошла ошибка при оформлении заказа", 'danger')
+            return render_form()
+
         except Exception as e:
             db.session.rollback()
             app.logger.error(
-                f"Error creating order. Customer: {customer_id}, Service: {service_id}. Error: {str(e)}", exc_info=True)
+                f"Error creating order. Customer: {customer_id}, Service: {service_ids}. Error: {str(e)}", exc_info=True)
             print(f"Ошибка при оформлении заказа: {e}")
             flash("Произошла ошибка при оформлении заказа", 'danger')
-            return render_template('add_order.html', customers=customers, services=services)
+            return render_form()
 
     app.logger.info("The new order creation page has loaded")
 
-    return render_template('add_order.html', customers=customers, services=services, now=datetime.now)
+    return render_template('add_order.html', customers=customers, services=services, now=datetime.now,
+                           idempotency_key=uuid.uuid4().hex)
+
+
+def replay_order(order_id, idempotency_key):
+    """Ответ на повторную отправку формы заказа: тот же, что и на первую."""
+    app.logger.info(
+        f"Order submission replayed. ID: {order_id}, Key: {idempotency_key}")
+    flash("Заказ успешно оформлен", 'success')
+    return redirect(url_for('list_orders'))
 
 
 @app.route('/update-order/<int:order_id>', methods=['GET', 'POST'])
@@ -502,65 +819,57 @@ def update_order(order_id):
 
     if request.method == 'POST':
         customer_id = request.form.get('customer_id')
-        service_id = request.form.get('service_id')
         order_date = request.form.get('order_date')
+        expected_version = request.form.get('version', type=int)
+        lines, errors = validate_order_form(request.form, order_id=order_id)
+        service_ids = format_order_lines(lines)
 
         app.logger.info(
-            f"Start editing order. Order: {order.id},Customer: {customer_id}, Service: {service_id}")
-
-        if is_empty_field(customer_id):
-            app.logger.warning(
-                f"Attempt to edit order {order.id} without selecting a customer")
-            flash("Пожалуйста, выберите клиента", 'danger')
-            return render_template('update_order.html', order=order, customers=customers, services=services, now=datetime.now)
-
-        if is_empty_field(service_id):
-            app.logger.warning(
-                f"Attempt to edit order {order.id} without selecting a service")
-            flash("Пожалуйста, выберите услугу", 'danger')
-            return render_template('update_order.html', order=order, customers=customers, services=services, now=datetime.now)
+            f"Start editing order. Order: {order.id},Customer: {customer_id}, Service: {service_ids}")
 
-        customer = Customer.query.get(customer_id)
-        if not customer:
-            app.logger.warning(
-                f"Attempt to create an order with non-existent customer. Customer ID: {customer_id}")
-            flash("Выбранный клиент не существует в базе данных", 'danger')
-            return render_template('add_order.html', customers=customers, services=services, now=datetime.now)
-
-        service = Service.query.get(service_id)
-        if not service:
-            app.logger.warning(
-                f"Attempt to create an order with non-existent service. Service ID: {service_id}")
-            flash("Выбранная услуга не существует в базе данных", 'danger')
-            return render_template('add_order.html', customers=customers, services=services, now=datetime.now)
+        if expected_version is not None and expected_version != order.version:
+            version_conflict('order', order_id, expected_version, order.version)
+            return render_template('update_order.html', order=order, customers=customers, services=services, now=datetime.now), 409
 
-        is_valid, message = ValidDate.is_valid_order_date(order_date)
-        if not is_valid:
-            app.logger.warning(
-                f"Attempt to send an order with an invalid date of order. Message: {message}")
-            flash(message, 'danger')
+        if errors:
+            flash_form_errors(errors, "send an order", order_id)
             return render_template('update_order.html', order=order, customers=customers, services=services, now=datetime.now)
 
         try:
+            before = order_snapshot(order)
+            # Строки собираются до изменения заказа: запрос цен внутри
+            # build_order_lines не должен сохранять заказ раньше времени
+            new_lines = build_order_lines(lines, existing_lines=order.lines)
             order.customer_id = customer_id
-            order.service_id = service_id
+            order.lines = new_lines
 
             if order_date and order_date.strip():
                 order.order_date = datetime.strptime(
                     order_date, '%Y-%m-%d').date()
 
             db.session.commit()
+            audit('order', order_id, 'update',
+                  before=before, after=order_snapshot(order))
+            publish_order_event('update', order_id, order)
 
             app.logger.info(
-                f"Order successfully updated. ID: {order.id}, Customer: {customer_id}, Service: {service_id}, Date: {order_date}")
+                f"Order successfully updated. ID: {order.id}, Customer: {customer_id}, Service: {service_ids}, Date: {order_date}")
 
             flash('Данные заказа успешно обновлены', 'success')
             return redirect(url_for('list_orders'))
 
+        except StaleDataError:
+            db.session.rollback()
+            order = db.session.get(Order, order_id)
+            if order is None:
+                return record_deleted('order', order_id, 'list_orders')
+            version_conflict('order', order_id, expected_version, order.version)
+            return render_template('update_order.html', order=order, customers=customers, services=services, now=datetime.now), 409
+
         except Exception as e:
             db.session.rollback()
             app.logger.error(
-                f"Order modification error. Customer: {customer_id}, Service: {service_id}. Error: {str(e)}", exc_info=True)
+                f"Order modification error. Customer: {customer_id}, Service: {service_ids}. Error: {str(e)}", exc_info=True)
             print(f"Ошибка при обновлении заказа: {e}")
             flash('Произошла ошибка при обновлении заказа', 'danger')
             return render_template('update_order.html', order=order, customers=customers, services=services, now=datetime.now)
@@ -574,19 +883,28 @@ def update_order(order_id):
 def delete_order(order_id):
     try:
         order = Order.query.get_or_404(order_id)
-
-        db.session.delete(order)
+        service_ids = ', '.join(
+            f"{line.service_id}x{line.quantity}" for line in order.lines)
+        customer_id, order_date = order.customer_id, order.order_date
+        before = order_snapshot(order)
+
+        # Мягкое удаление: заказ переносится в архив с отметкой удаления.
+        # Объект заказа больше не нужен, убираем его из сессии до commit
+        db.session.expunge(order)
+        move_orders([order_id], deleted_at=datetime.now())
         db.session.commit()
+        audit('order', order_id, 'delete', before=before)
+        publish_order_event('delete', order_id)
 
         app.logger.info(
-            f"Order successfully deleted. ID: {order.id}, Customer: {order.customer_id}, Service: {order.service_id}, Date: {order.order_date}")
+            f"Order successfully deleted. ID: {order_id}, Customer: {customer_id}, Service: {service_ids}, Date: {order_date}")
         flash("Заказ успешно удален!", 'success')
         return redirect(url_for('list_orders'))
 
     except Exception as e:
         db.session.rollback()
         app.logger.error(
-            f"Error deleting order. ID: {order.id}, Customer: {order.customer_id}, Service: {order.service_id}. Error: {str(e)}", exc_info=True)
+            f"Error deleting order. ID: {order_id}. Error: {str(e)}", exc_info=True)
         print(f"Ошибка при удалении заказа: {e}")
         flash("Произошла ошибка при удалении заказа", 'danger')
         return redirect(url_for('list_orders'))
@@ -595,18 +913,242 @@ def delete_order(order_id):
 @app.route('/list-orders')
 def list_orders():
     page = request.args.get('page', 1, type=int)
-    orders = Order.query.paginate(
+    filters, sort, descending = order_filters_from_args(request.args)
+    orders = Order.search(
+        sort=sort, descending=descending, **filters
+    ).options(
+        joinedload(Order.customer),
+        selectinload(Order.lines).joinedload(OrderLine.service)
+    ).paginate(
         page=page,
         per_page=PER_PAGE_ORDERS,
         error_out=False
     )
 
+    # Для выпадающих списков фильтра достаточно id и названия
+    customers = db.session.execute(
+        db.select(Customer.id, Customer.name).order_by(Customer.name)).all()
+    services = db.session.execute(
+        db.select(Service.id, Service.service_name).order_by(
+            Service.service_name)).all()
+
+    # Параметры запроса без страницы: для ссылок пагинации и сортировки
+    args = {key: value for key, value in request.args.items()
+            if key != 'page' and value}
+
     app.logger.info(
-        f"The page with orders has been loaded. Page {page}, total pages: {orders.pages}")
-    return render_template('list_orders.html', orders=orders)
+        f"The page with orders has been loaded. Page {page}, total pages: {orders.pages}, "
+        f"filters: {filters}, sort: {sort} {'desc' if descending else 'asc'}")
+    return render_template('list_orders.html', orders=orders,
+                           customers=customers, services=services,
+                           args=args, sort=sort, descending=descending)
+
+
+@app.route('/orders/events')
+def order_events_stream():
+    # Браузер передаёт номер последнего полученного события при переподключении
+    last_event_id = request.headers.get('Last-Event-ID', type=int)
+    subscription = order_events.subscribe(last_event_id)
+    app.logger.info(
+        f"Order events subscriber connected. Subscribers: {order_events.subscriber_count}")
+
+    response = Response(
+        event_stream(order_events, subscription,
+                     heartbeat=app.config['EVENTS_HEARTBEAT_SECONDS']),
+        mimetype='text/event-stream')
+    response.headers['Cache-Control'] = 'no-cache'
+    # nginx не должен буферизовать поток событий
+    response.headers['X-Accel-Buffering'] = 'no'
+    response.call_on_close(lambda: order_events.unsubscribe(subscription))
+    return response
+
+
+def order_filters_from_args(args):
+    """Фильтры и сортировка списка заказов из строки запроса.
+
+    Некорректные значения не ломают страницу: фильтр пропускается,
+    а в лог пишется предупреждение.
+    """
+    filters = {}
+
+    for name in ('date_from', 'date_to'):
+        value = args.get(name, '').strip()
+        if not value:
+            continue
+        try:
+            filters[name] = datetime.strptime(value, '%Y-%m-%d').date()
+        except ValueError:
+            app.logger.warning(f"Ignoring invalid order filter {name}={value!r}.")
+
+    for name in ('customer_id', 'service_id'):
+        value = args.get(name, type=int)
+        if value is not None:
+            filters[name] = value
+
+    for name in ('price_min', 'price_max'):
+        value = args.get(name, '').strip()
+        if not value:
+            continue
+        try:
+            filters[name] = parse_price(value)
+        except ValueError:
+            app.logger.warning(f"Ignoring invalid order filter {name}={value!r}.")
+
+    sort = args.get('sort', 'date')
+    if sort not in ORDER_SORTS:
+        sort = 'date'
+    descending = args.get('direction', 'desc') != 'asc'
+    return filters, sort, descending
 # Работа с заказми -->
 
 
+# <-- Фоновые задачи
+@app.route('/jobs', methods=['GET', 'POST'])
+def jobs():
+    if request.method == 'POST':
+        payload = request.get_json(silent=True) or {}
+        kind = payload.get('kind')
+        params = payload.get('params') or {}
+        if kind not in JOB_HANDLERS or not isinstance(params, dict):
+            app.logger.warning(f"Attempt to enqueue an invalid job. Kind: {kind!r}")
+            return jsonify(error=f"Неизвестный тип задачи: {kind}"), 400
+
+        try:
+            job = enqueue(kind, **params)
+        except ValueError as e:
+            app.logger.warning(f"Attempt to enqueue a job with invalid parameters. Kind: {kind}. Error: {e}")
+            return jsonify(error=str(e)), 400
+        app.logger.info(f"Job enqueued. ID: {job.id}, Kind: {kind}")
+        return jsonify(job.as_dict()), 202, {'Location': url_for('job_status', job_id=job.id)}
+
+    query = db.select(Job).order_by(Job.id.desc()).limit(50)
+    status = request.args.get('status')
+    if status in JOB_STATUSES:
+        query = query.where(Job.status == status)
+    return jsonify(jobs=[job.as_dict() for job in db.session.scalars(query)])
+
+
+@app.route('/jobs/<int:job_id>')
+def job_status(job_id):
+    job = db.get_or_404(Job, job_id)
+    return jsonify(job.as_dict())
+
+
+@app.route('/jobs/<int:job_id>/cancel', methods=['POST'])
+def job_cancel(job_id):
+    job = cancel_job(job_id)
+    if job is None:
+        return jsonify(error="Задача не найдена"), 404
+    app.logger.info(f"Job cancellation requested. ID: {job_id}, Status: {job.status}")
+    return jsonify(job.as_dict())
+# Фоновые задачи -->
+
+
+@app.cli.command('archive-orders')
+@click.option('--days', type=int, default=None,
+              help='Архивировать заказы старше указанного числа дней.')
+@click.option('--before', type=click.DateTime(formats=['%Y-%m-%d']), default=None,
+              help='Архивировать заказы с датой раньше указанной (ГГГГ-ММ-ДД).')
+@click.option('--batch-size', type=int, default=None,
+              help='Число заказов в одной транзакции.')
+@click.option('--background', is_flag=True,
+              help='Поставить перенос в очередь фоновых задач.')
+def archive_orders_command(days, before, batch_size, background):
+    """Переносит старые заказы из orders в orders_archive."""
+    if before is not None:
+        cutoff = before.date()
+    else:
+        days = days if days is not None else app.config['ARCHIVE_AFTER_DAYS']
+        cutoff = datetime.now().date() - timedelta(days=days)
+    batch_size = batch_size or app.config['ARCHIVE_BATCH_SIZE']
+
+    if background:
+        job = enqueue('archive_orders', before=cutoff.isoformat(), batch_size=batch_size)
+        click.echo(f"Задача поставлена в очередь: {job.id}")
+        return
+
+    app.logger.info(f"Archiving orders older than {cutoff} in batches of {batch_size}.")
+    moved = archive_orders(cutoff, batch_size=batch_size, logger=app.logger)
+    app.logger.info(f"Archiving finished. Orders archived: {moved}.")
+    click.echo(f"Перенесено в архив заказов: {moved}")
+
+
+@app.cli.command('dedup-customers')
+@click.option('--min-score', type=click.FloatRange(0, 1), default=None,
+              help='Минимальная оценка пары для очереди проверки (0-1).')
+@click.option('--background', is_flag=True,
+              help='Поставить поиск в очередь фоновых задач.')
+def dedup_customers_command(min_score, background):
+    """Ищет клиентов-дубликатов и обновляет очередь проверки."""
+    params = {
+        'min_score': min_score if min_score is not None else app.config['DEDUP_MIN_SCORE'],
+        'batch_size': app.config['DEDUP_BATCH_SIZE'],
+        'max_block_size': app.config['DEDUP_MAX_BLOCK_SIZE'],
+    }
+    if background:
+        job = enqueue('dedup_customers', **params)
+        click.echo(f"Задача поставлена в очередь: {job.id}")
+        return
+
+    app.logger.info(f"Searching for duplicate customers. Min score: {params['min_score']}.")
+    found, stats = find_duplicates(params.pop('min_score'), **params)
+    save_candidates(found)
+    db.session.commit()
+    app.logger.info(
+        f"Duplicate search finished. Pairs compared: {stats['pairs']}, "
+        f"candidates: {len(found)}, skipped blocks: {stats['skipped_blocks']}.")
+    click.echo(f"Пар сравнено: {stats['pairs']}, в очереди проверки: {len(found)}")
+
+
+@app.cli.command('init-db')
+def init_db_command():
+    """Создаёт схему пустой базы из моделей и помечает её последней ревизией."""
+    try:
+        with db.engine.begin() as connection:
+            revision = bootstrap_schema(app, db.metadata, connection)
+    except SchemaExistsError as e:
+        app.logger.warning(f"Attempt to bootstrap a non-empty database. {e}")
+        raise click.ClickException(
+            "В базе уже есть таблицы; обновите её командой flask db upgrade")
+    app.logger.info(f"Database schema created and stamped at {revision}.")
+    click.echo(f"Схема создана, ревизия: {revision}")
+
+
+@app.cli.command('build-assets')
+def build_assets_command():
+    """Собирает static/ в static/dist/: имена с хешем, .gz/.br, WebP."""
+    manifest = build_assets(app.static_folder,
+                            image_max_width=app.config['ASSETS_IMAGE_MAX_WIDTH'],
+                            logger=app.logger)
+    click.echo(f"Собрано файлов: {len(manifest)}")
+
+
+@app.cli.command('compile-templates')
+def compile_templates_command():
+    """Компилирует шаблоны в кеш байткода (TEMPLATE_CACHE_DIR)."""
+    names = precompile_templates(app)
+    app.logger.info(f"Precompiled {len(names)} templates.")
+    click.echo(f"Скомпилировано шаблонов: {len(names)}")
+
+
+@app.cli.command('jobs-worker')
+@click.option('--processes', type=int, default=None,
+              help='Число процессов-обработчиков.')
+@click.option('--once', is_flag=True,
+              help='Выполнить задачи из очереди в текущем процессе и выйти.')
+def jobs_worker_command(processes, once):
+    """Выполняет фоновые задачи из таблицы jobs."""
+    poll_interval = app.config['JOB_POLL_INTERVAL']
+    if once:
+        processed = work(app, poll_interval=poll_interval, once=True)
+        click.echo(f"Выполнено задач: {processed}")
+        return
+
+    processes = processes or app.config['JOB_WORKERS']
+    app.logger.info(f"Starting {processes} job workers.")
+    run_workers(processes, poll_interval=poll_interval)
+
+
 if __name__ == "__main__":
     app.run(
         host=app.config['HOST'],
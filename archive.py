@@ -0,0 +1,89 @@
+from datetime import datetime
+
+from models import db, Order, OrderLine, OrderArchive, OrderLineArchive
+
+# Заказов в одной транзакции переноса: короткие транзакции не блокируют
+# базу надолго, а IN-список укладывается в лимит параметров SQLite
+ARCHIVE_BATCH_SIZE = 500
+
+ORDER_COLUMNS = ('id', 'customer_id', 'order_date', 'total_kopecks')
+LINE_COLUMNS = ('order_id', 'service_id', 'quantity', 'price_kopecks')
+
+
+def move_orders(order_ids, deleted_at=None, archived_at=None):
+    """Переносит заказы и их строки из orders в orders_archive.
+
+    Четыре запроса на весь список id, без загрузки объектов в сессию.
+    Commit остаётся за вызывающим кодом.
+    """
+    if not order_ids:
+        return 0
+    archived_at = archived_at or datetime.now()
+    orders = Order.__table__
+    lines = OrderLine.__table__
+
+    db.session.execute(
+        db.insert(OrderArchive.__table__).from_select(
+            ORDER_COLUMNS + ('archived_at', 'deleted_at'),
+            db.select(*(orders.c[name] for name in ORDER_COLUMNS),
+                      db.literal(archived_at, db.DateTime),
+                      db.literal(deleted_at, db.DateTime)).where(
+                orders.c.id.in_(order_ids))))
+    db.session.execute(
+        db.insert(OrderLineArchive.__table__).from_select(
+            LINE_COLUMNS,
+            db.select(*(lines.c[name] for name in LINE_COLUMNS)).where(
+                lines.c.order_id.in_(order_ids)).order_by(lines.c.id)))
+    db.session.execute(
+        db.delete(lines).where(lines.c.order_id.in_(order_ids)))
+    result = db.session.execute(
+        db.delete(orders).where(orders.c.id.in_(order_ids)))
+    return result.rowcount
+
+
+def archive_orders(before, batch_size=ARCHIVE_BATCH_SIZE, logger=None,
+                   on_batch=None):
+    """Переносит в архив заказы с датой раньше before, пачками по batch_size.
+
+    Каждая пачка — отдельная транзакция, поэтому прерванный перенос
+    можно просто запустить заново. on_batch(moved) вызывается после
+    commit каждой пачки. Возвращает число перенесённых заказов.
+    """
+    moved = 0
+    while True:
+        # Самые старые заказы берутся по индексу ix_orders_order_date
+        order_ids = db.session.scalars(
+            db.select(Order.id).where(Order.order_date < before).order_by(
+                Order.order_date, Order.id).limit(batch_size)).all()
+        if not order_ids:
+            break
+
+        try:
+            moved += move_orders(order_ids)
+            db.session.commit()
+        except Exception:
+            db.session.rollback()
+            raise
+
+        if logger:
+            logger.info(
+                f"Archived a batch of {len(order_ids)} orders. Total archived: {moved}.")
+        if on_batch:
+            on_batch(moved)
+    return moved
+
+
+def purge_deleted_orders(*criterion):
+    """Окончательно удаляет из архива удалённые пользователем заказы.
+
+    Нужна перед удалением клиента или услуги, на которые ссылаются только
+    удалённые заказы. Commit остаётся за вызывающим кодом.
+    """
+    order_ids = db.session.scalars(db.select(OrderArchive.id).where(
+        OrderArchive.deleted_at.is_not(None), *criterion)).all()
+    if not order_ids:
+        return
+    db.session.execute(db.delete(OrderLineArchive).where(
+        OrderLineArchive.order_id.in_(order_ids)))
+    db.session.execute(db.delete(OrderArchive).where(
+        OrderArchive.id.in_(order_ids)))
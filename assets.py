@@ -0,0 +1,199 @@
+"""Сборка статических файлов для отдачи с долгим кешированием.
+
+flask build-assets копирует файлы из static/ в static/dist/ под именами
+с хешем содержимого (css/main.3f2a9c1b7d4e.css), рядом кладёт сжатые
+копии текстовых файлов (.gz, .br) и уменьшенные изображения с WebP-вариантом,
+а соответствие исходных имён собранным записывает в manifest.json.
+
+Шаблоны получают адреса через asset_url(): после сборки это /assets/<имя
+с хешем>, такие ответы кешируются браузером навсегда (immutable), ведь
+при изменении файла меняется и имя. Без сборки asset_url() отдаёт обычный
+url_for('static').
+"""
+import gzip
+import hashlib
+import io
+import json
+import mimetypes
+import os
+import shutil
+
+from flask import abort, request, send_from_directory, url_for
+
+try:
+    import brotli
+except ImportError:
+    brotli = None
+
+try:
+    from PIL import Image
+except ImportError:
+    Image = None
+
+DIST_DIR = 'dist'
+MANIFEST_NAME = 'manifest.json'
+HASH_LENGTH = 12
+TEXT_EXTENSIONS = ('.css', '.js', '.svg', '.ico', '.json', '.txt', '.map')
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png')
+# Сжатые копии меньше этого размера не окупают лишний файл
+MIN_COMPRESS_BYTES = 512
+IMMUTABLE_CACHE_CONTROL = 'public, max-age={max_age}, immutable'
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()[:HASH_LENGTH]
+
+
+def hashed_name(filename, digest, extension=None):
+    root, ext = os.path.splitext(filename)
+    return f"{root}.{digest}{extension or ext}"
+
+
+def _write(path, data):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as output:
+        output.write(data)
+
+
+def _compress(path, data, entry):
+    # mtime=0: одинаковый файл при каждой сборке
+    gzipped = gzip.compress(data, compresslevel=9, mtime=0)
+    if len(gzipped) < len(data):
+        _write(path + '.gz', gzipped)
+        entry['gzip'] = True
+    if brotli is not None:
+        compressed = brotli.compress(data, quality=11)
+        if len(compressed) < len(data):
+            _write(path + '.br', compressed)
+            entry['br'] = True
+
+
+def _encode_image(image, format, **options):
+    buffer = io.BytesIO()
+    image.save(buffer, format=format, **options)
+    return buffer.getvalue()
+
+
+def _build_image(filename, data, output_dir, max_width, entry):
+    """Уменьшает изображение до max_width и добавляет WebP-вариант.
+
+    Без Pillow изображение копируется как есть.
+    """
+    if Image is None:
+        return data
+    image = Image.open(io.BytesIO(data))
+    image.load()
+    if max_width and image.width > max_width:
+        height = round(image.height * max_width / image.width)
+        image = image.resize((max_width, height), Image.LANCZOS)
+        format = 'PNG' if filename.lower().endswith('.png') else 'JPEG'
+        options = {'optimize': True} if format == 'PNG' else {'quality': 85, 'optimize': True}
+        resized = _encode_image(image.convert('RGB') if format == 'JPEG' else image,
+                                format, **options)
+        if len(resized) < len(data):
+            data = resized
+
+    webp = _encode_image(image, 'WEBP', quality=80, method=6)
+    if len(webp) < len(data):
+        name = hashed_name(filename, content_hash(webp), '.webp')
+        _write(os.path.join(output_dir, name), webp)
+        entry['webp'] = name.replace(os.sep, '/')
+    return data
+
+
+def build_assets(static_dir, image_max_width=1600, logger=None):
+    """Собирает static_dir в static_dir/dist и возвращает манифест.
+
+    Предыдущая сборка удаляется целиком; манифест записывается последним.
+    """
+    output_dir = os.path.join(static_dir, DIST_DIR)
+    if os.path.isdir(output_dir):
+        shutil.rmtree(output_dir)
+
+    manifest = {}
+    for root, dirs, files in os.walk(static_dir):
+        if os.path.abspath(root) == os.path.abspath(static_dir):
+            dirs[:] = [name for name in dirs if name != DIST_DIR]
+        dirs.sort()
+        for name in sorted(files):
+            source = os.path.join(root, name)
+            filename = os.path.relpath(source, static_dir)
+            with open(source, 'rb') as asset:
+                data = asset.read()
+
+            entry = {}
+            if name.lower().endswith(IMAGE_EXTENSIONS):
+                data = _build_image(filename, data, output_dir, image_max_width, entry)
+            target = hashed_name(filename, content_hash(data))
+            path = os.path.join(output_dir, target)
+            _write(path, data)
+            if name.lower().endswith(TEXT_EXTENSIONS) and len(data) >= MIN_COMPRESS_BYTES:
+                _compress(path, data, entry)
+
+            entry['file'] = target.replace(os.sep, '/')
+            entry['size'] = len(data)
+            manifest[filename.replace(os.sep, '/')] = entry
+
+    _write(os.path.join(output_dir, MANIFEST_NAME),
+           json.dumps(manifest, ensure_ascii=False, indent=2, sort_keys=True).encode('utf-8'))
+    if logger:
+        logger.info(f"Built {len(manifest)} static assets into {output_dir}.")
+    return manifest
+
+
+def load_manifest(static_dir):
+    path = os.path.join(static_dir, DIST_DIR, MANIFEST_NAME)
+    if not os.path.exists(path):
+        return {}
+    with open(path, 'r', encoding='utf-8') as manifest_file:
+        return json.load(manifest_file)
+
+
+def _accepts(encoding):
+    return request.accept_encodings[encoding] > 0
+
+
+def setup_assets(app):
+    """Подключает отдачу собранных файлов и asset_url() в шаблонах.
+
+    Манифест читается один раз при запуске; после новой сборки
+    приложение нужно перезапустить.
+    """
+    dist_dir = os.path.join(app.static_folder, DIST_DIR)
+    manifest = load_manifest(app.static_folder)
+    files = {entry['file']: entry for entry in manifest.values()}
+    files.update({entry['webp']: {} for entry in manifest.values() if 'webp' in entry})
+    cache_control = IMMUTABLE_CACHE_CONTROL.format(max_age=app.config['ASSETS_MAX_AGE'])
+    app.extensions['assets_manifest'] = manifest
+
+    def asset_url(filename, variant=None):
+        """Адрес статического файла: собранного, если он есть в манифесте."""
+        entry = manifest.get(filename)
+        if entry is None:
+            return url_for('static', filename=filename)
+        return url_for('asset', filename=entry.get(variant) or entry['file'])
+
+    @app.route('/assets/<path:filename>')
+    def asset(filename):
+        entry = files.get(filename)
+        if entry is None:
+            abort(404)
+
+        mimetype = mimetypes.guess_type(filename)[0]
+        encoding = None
+        if entry.get('br') and _accepts('br'):
+            encoding = 'br'
+        elif entry.get('gzip') and _accepts('gzip'):
+            encoding = 'gzip'
+        path = filename + {'br': '.br', 'gzip': '.gz'}.get(encoding, '')
+
+        response = send_from_directory(dist_dir, path, mimetype=mimetype)
+        if encoding:
+            response.headers['Content-Encoding'] = encoding
+        if entry.get('br') or entry.get('gzip'):
+            response.vary.add('Accept-Encoding')
+        response.headers['Cache-Control'] = cache_control
+        return response
+
+    app.jinja_env.globals['asset_url'] = asset_url
+    return asset_url
@@ -0,0 +1,172 @@
+import atexit
+import json
+import os
+import queue
+import re
+import threading
+from datetime import date, datetime, timezone
+from decimal import Decimal
+
+from sqlalchemy import inspect
+
+SEGMENT_PATTERN = re.compile(r'^audit-(\d{6})\.jsonl$')
+
+# Признак остановки фонового потока записи
+_STOP = object()
+
+
+def snapshot(obj, **extra):
+    """Значения столбцов объекта модели в виде словаря для журнала аудита."""
+    data = {attr.key: getattr(obj, attr.key)
+            for attr in inspect(obj).mapper.column_attrs}
+    data.update(extra)
+    return data
+
+
+def diff(before, after):
+    """Изменившиеся поля: {поле: [было, стало]}."""
+    before = before or {}
+    after = after or {}
+    return {key: [before.get(key), after.get(key)]
+            for key in sorted(before.keys() | after.keys())
+            if before.get(key) != after.get(key)}
+
+
+def _json_default(value):
+    if isinstance(value, (date, datetime)):
+        return value.isoformat()
+    if isinstance(value, Decimal):
+        return str(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+class AuditWriter:
+    """Журнал аудита только на дозапись, в JSONL-файлы (сегменты).
+
+    write() лишь кладёт запись в очередь. Фоновый поток забирает всё, что
+    накопилось, и пишет пачкой одним вызовом write, так что запрос не ждёт
+    диска. Когда сегмент превышает max_bytes, начинается следующий:
+    audit-000001.jsonl, audit-000002.jsonl и т. д.; старые сегменты
+    не удаляются и не переписываются.
+    """
+
+    def __init__(self, directory, max_bytes=10 * 1024 * 1024,
+                 batch_size=500, queue_size=10000, logger=None):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.batch_size = batch_size
+        self.logger = logger
+        # Очередь ограничена: при перегрузке запрос подождёт место в очереди,
+        # но записи аудита не будут потеряны
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread = None
+        self._file = None
+        self._segment = 0
+
+    def write(self, entity, entity_id, action, before=None, after=None,
+              request_id=None):
+        """Ставит в очередь запись об изменении сущности."""
+        self._start()
+        self._queue.put({
+            'ts': datetime.now(timezone.utc).isoformat(),
+            'request_id': request_id,
+            'entity': entity,
+            'entity_id': entity_id,
+            'action': action,
+            'changes': diff(before, after),
+        })
+
+    def flush(self):
+        """Ждёт, пока все поставленные в очередь записи окажутся в файле."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def close(self):
+        """Дописывает очередь и останавливает фоновый поток."""
+        with self._lock:
+            thread, self._thread = self._thread, None
+        if thread is None:
+            return
+        self._queue.put(_STOP)
+        thread.join()
+
+    def segments(self):
+        """Пути сегментов журнала по порядку."""
+        if not os.path.isdir(self.directory):
+            return []
+        names = sorted(name for name in os.listdir(self.directory)
+                       if SEGMENT_PATTERN.match(name))
+        return [os.path.join(self.directory, name) for name in names]
+
+    def _start(self):
+        if self._thread is not None:
+            return
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name='audit-writer', daemon=True)
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+
+            records = [record for record in batch if record is not _STOP]
+            try:
+                if records:
+                    self._write_batch(records)
+            except Exception as e:
+                if self.logger:
+                    self.logger.error(
+                        f"Failed to write {len(records)} audit records: {e}", exc_info=True)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+
+            if len(records) != len(batch):
+                if self._file is not None:
+                    self._file.close()
+                    self._file = None
+                return
+
+    def _write_batch(self, records):
+        if self._file is None:
+            self._open_segment()
+        elif self._file.tell() >= self.max_bytes:
+            self._file.close()
+            self._segment += 1
+            self._open_segment()
+
+        self._file.write(''.join(
+            json.dumps(record, ensure_ascii=False, default=_json_default) + '\n'
+            for record in records))
+        self._file.flush()
+
+    def _open_segment(self):
+        os.makedirs(self.directory, exist_ok=True)
+        if not self._segment:
+            # Продолжаем последний сегмент, оставшийся от прошлого запуска
+            existing = self.segments()
+            self._segment = int(SEGMENT_PATTERN.match(
+                os.path.basename(existing[-1])).group(1)) if existing else 1
+        path = os.path.join(self.directory, f'audit-{self._segment:06d}.jsonl')
+        self._file = open(path, 'a', encoding='utf-8')
+
+
+def setup_audit(app):
+    """Создаёт журнал аудита приложения и дописывает его при завершении."""
+    writer = AuditWriter(
+        app.config['AUDIT_DIR'],
+        max_bytes=app.config['AUDIT_SEGMENT_BYTES'],
+        batch_size=app.config['AUDIT_BATCH_SIZE'],
+        queue_size=app.config['AUDIT_QUEUE_SIZE'],
+        logger=app.logger,
+    )
+    atexit.register(writer.close)
+    return writer
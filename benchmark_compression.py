@@ -0,0 +1,47 @@
+"""Замер сжатия ответов: байты по сети и время процессора на ответ.
+
+Страницы берутся из приложения через тестовый клиент, на текущей базе.
+
+    python benchmark_compression.py [--levels 1 6 9] [--repeat 200] [пути ...]
+"""
+import argparse
+import time
+
+from app import app
+from compression import gzip_bytes
+
+DEFAULT_PATHS = ('/', '/add-order', '/list-orders', '/list-customers',
+                 '/list-services', '/health')
+
+
+def measure(data, level, repeat):
+    """(размер сжатого ответа, мс процессора на одно сжатие)."""
+    start = time.process_time()
+    for _ in range(repeat):
+        compressed = gzip_bytes(data, level)
+    return len(compressed), (time.process_time() - start) * 1000 / repeat
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Замер gzip-сжатия ответов приложения')
+    parser.add_argument('paths', nargs='*', default=DEFAULT_PATHS)
+    parser.add_argument('--levels', nargs='+', type=int, default=[1, 6, 9])
+    parser.add_argument('--repeat', type=int, default=200)
+    args = parser.parse_args(argv)
+
+    client = app.test_client()
+    header = f"{'путь':<18}{'байт':>9}" + ''.join(
+        f"{f'gzip {level}':>12}{'мс':>8}" for level in args.levels)
+    print(header)
+    print('-' * len(header))
+    for path in args.paths:
+        data = client.get(path).get_data()
+        line = f"{path:<18}{len(data):>9}"
+        for level in args.levels:
+            size, cpu_ms = measure(data, level, args.repeat)
+            line += f"{size:>12}{cpu_ms:>8.3f}"
+        print(line)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,79 @@
+import zlib
+
+from flask import request
+
+# Сжимаются только текстовые ответы приложения; статика отдаётся
+# через send_file (direct_passthrough) и сжимается при сборке
+COMPRESS_MIMETYPES = ('text/html', 'application/json', 'text/csv')
+
+
+def _gzip_stream(chunks, level):
+    """Сжимает поток по частям, не дожидаясь его конца.
+
+    После каждой части вызывается Z_SYNC_FLUSH: клиент получает данные
+    сразу, как генератор их выдал, ценой нескольких байт на часть.
+    """
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        if chunk:
+            yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+
+def gzip_bytes(data, level):
+    compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+    return compressor.compress(data) + compressor.flush()
+
+
+def compressible(response):
+    """Ответ, который может быть отдан сжатым, в зависимости от клиента."""
+    if response.status_code < 200 or response.status_code in (204, 304):
+        return False
+    if response.direct_passthrough or 'Content-Encoding' in response.headers:
+        return False
+    return response.mimetype in COMPRESS_MIMETYPES
+
+
+def compress_response(accept_encodings, response, min_size=500, level=6):
+    """Сжимает ответ gzip, если клиент это принимает.
+
+    Обычный ответ меньше min_size остаётся как есть. Потоковый ответ
+    (генератор) сжимается по мере выдачи, размер его заранее неизвестен.
+    """
+    if not compressible(response):
+        return response
+    response.vary.add('Accept-Encoding')
+    # Качество, а не наличие: "gzip;q=0" означает отказ от gzip
+    if not accept_encodings['gzip']:
+        return response
+
+    if response.is_streamed:
+        response.response = _gzip_stream(response.response, level)
+        response.headers.pop('Content-Length', None)
+    else:
+        data = response.get_data()
+        if len(data) < min_size:
+            return response
+        response.set_data(gzip_bytes(data, level))
+
+    response.headers['Content-Encoding'] = 'gzip'
+    etag, weak = response.get_etag()
+    if etag:
+        # Сжатое представление - другие байты, значит и другой ETag
+        response.set_etag(etag + '-gzip', weak)
+    return response
+
+
+def setup_compression(app):
+    """Включает сжатие ответов, если COMPRESS_ENABLED."""
+    if not app.config['COMPRESS_ENABLED']:
+        return
+
+    min_size = app.config['COMPRESS_MIN_SIZE']
+    level = app.config['COMPRESS_LEVEL']
+
+    @app.after_request
+    def compress(response):
+        return compress_response(request.accept_encodings, response, min_size, level)
@@ -1,15 +1,187 @@
+import functools
+import json
 import os
+from types import MappingProxyType
 
+CONFIG_FILE = 'config.json'
+# Прежние имена переменных окружения
+ENV_ALIASES = {'DATABASE_URL': 'SQLALCHEMY_DATABASE_URI'}
+TRUE_VALUES = ('1', 'true', 'yes', 'on')
+FALSE_VALUES = ('0', 'false', 'no', 'off')
 
-class Config:
-    SECRET_KEY = os.getenv('SECRET_KEY', 'some-secret-key-XD')
-    SQLALCHEMY_DATABASE_URI = os.getenv('DATABASE_URL', 'sqlite:///flask.db')
-    SQLALCHEMY_ENGINE_OPTIONS = {
-        'pool_pre_ping': True,
-        'pool_recycle': 600,
-    }
 
-    HOST = os.getenv('HOST', '127.0.0.1')
-    PORT = int(os.getenv('PORT', 8080))
+class ConfigError(ValueError):
+    """Ошибки настроек; перечисляет все найденные проблемы сразу."""
 
-    LOG_LEVEL = os.getenv('LOG_LEVEL', 'INFO')
+    def __init__(self, problems):
+        self.problems = problems
+        super().__init__('Invalid configuration: ' + '; '.join(problems))
+
+
+class Setting:
+    """Описание одной настройки: тип, значение по умолчанию и ограничения."""
+
+    def __init__(self, type, default, minimum=None, choices=None, maximum=None):
+        self.type = type
+        self.default = default
+        self.minimum = minimum
+        self.maximum = maximum
+        self.choices = choices
+
+    def parse_env(self, raw):
+        """Значение из строки переменной окружения."""
+        if self.type is bool:
+            value = raw.strip().lower()
+            if value in TRUE_VALUES:
+                return True
+            if value in FALSE_VALUES:
+                return False
+            raise ValueError(f"expected a boolean, got {raw!r}")
+        if self.type is dict:
+            return json.loads(raw)
+        return self.type(raw)
+
+    def validate(self, value):
+        """Приводит значение к типу настройки или выбрасывает ValueError."""
+        if self.type is float and isinstance(value, int) and not isinstance(value, bool):
+            value = float(value)
+        # bool - подкласс int, поэтому True не должен сойти за число
+        if not isinstance(value, self.type) or (
+                self.type is not bool and isinstance(value, bool)):
+            raise ValueError(
+                f"expected {self.type.__name__}, got {type(value).__name__}")
+        if self.choices is not None and value not in self.choices:
+            raise ValueError(f"must be one of {', '.join(self.choices)}")
+        if self.minimum is not None and value < self.minimum:
+            raise ValueError(f"must be at least {self.minimum}")
+        if self.maximum is not None and value > self.maximum:
+            raise ValueError(f"must be at most {self.maximum}")
+        return value
+
+
+SCHEMA = {
+    'SECRET_KEY': Setting(str, 'something-goes-wrong-use-this-key'),
+    'SQLALCHEMY_DATABASE_URI': Setting(str, 'sqlite:///flask.db'),
+    'SQLALCHEMY_TRACK_MODIFICATIONS': Setting(bool, False),
+    # Дополнительные параметры create_engine поверх DB_POOL_*
+    'SQLALCHEMY_ENGINE_OPTIONS': Setting(dict, {}),
+    'HOST': Setting(str, '127.0.0.1'),
+    'PORT': Setting(int, 8089, minimum=1),
+
+    'LOG_FILE': Setting(str, 'logs/service.log'),
+    'LOG_LEVEL': Setting(str, 'INFO', choices=(
+        'DEBUG', 'INFO', 'WARNING', 'ERROR', 'CRITICAL')),
+    'LOG_MAX_BYTES': Setting(int, 5 * 1024 * 1024, minimum=0),
+    'LOG_ROTATE_INTERVAL': Setting(int, 24 * 60 * 60, minimum=0),
+    'LOG_RETENTION_BYTES': Setting(int, 100 * 1024 * 1024, minimum=0),
+    'LOG_RETENTION_DAYS': Setting(int, 30, minimum=0),
+
+    'PER_PAGE_CUSTOMERS': Setting(int, 10, minimum=1),
+    'PER_PAGE_SERVICES': Setting(int, 8, minimum=1),
+    'PER_PAGE_ORDERS': Setting(int, 10, minimum=1),
+    # Сколько секунд показатели главной страницы берутся из кеша;
+    # изменения в этом процессе сбрасывают кеш сразу
+    'DASHBOARD_CACHE_TTL': Setting(int, 60, minimum=0),
+    # Время кеширования статических файлов браузером, секунды
+    'SEND_FILE_MAX_AGE_DEFAULT': Setting(int, 3600, minimum=0),
+    # Для собранных файлов с хешем в имени (flask build-assets)
+    'ASSETS_MAX_AGE': Setting(int, 365 * 24 * 60 * 60, minimum=0),
+    'ASSETS_IMAGE_MAX_WIDTH': Setting(int, 1600, minimum=0),
+
+    # Каталог байткода шаблонов Jinja; пустая строка отключает кеш
+    'TEMPLATE_CACHE_DIR': Setting(str, 'instance/jinja_cache'),
+    # Проверять изменения шаблонов на диске; для разработки
+    'TEMPLATES_AUTO_RELOAD': Setting(bool, False),
+
+    # Сжатие ответов HTML, JSON и CSV (gzip), выключено по умолчанию
+    'COMPRESS_ENABLED': Setting(bool, False),
+    'COMPRESS_MIN_SIZE': Setting(int, 500, minimum=0),
+    'COMPRESS_LEVEL': Setting(int, 6, minimum=1, maximum=9),
+
+    'DB_POOL_SIZE': Setting(int, 5, minimum=1),
+    'DB_MAX_OVERFLOW': Setting(int, 10, minimum=0),
+    'DB_POOL_TIMEOUT': Setting(float, 30.0, minimum=0),
+    'DB_POOL_RECYCLE': Setting(int, 600, minimum=-1),
+    'DB_PRE_PING': Setting(str, 'idle', choices=('always', 'idle', 'never')),
+    'DB_PRE_PING_IDLE_SECONDS': Setting(int, 300, minimum=0),
+
+    'ARCHIVE_AFTER_DAYS': Setting(int, 730, minimum=1),
+    'ARCHIVE_BATCH_SIZE': Setting(int, 500, minimum=1),
+
+    'AUDIT_DIR': Setting(str, 'logs/audit'),
+    'AUDIT_SEGMENT_BYTES': Setting(int, 10 * 1024 * 1024, minimum=1024),
+    'AUDIT_BATCH_SIZE': Setting(int, 500, minimum=1),
+    'AUDIT_QUEUE_SIZE': Setting(int, 10000, minimum=1),
+
+    # Сколько секунд повторная отправка заказа с тем же ключом не создаёт новый
+    'IDEMPOTENCY_TTL_SECONDS': Setting(int, 24 * 60 * 60, minimum=1),
+
+    # События заказов (SSE): сколько событий ждёт отставшего подписчика,
+    # и как часто отправляется пустое сообщение, чтобы соединение не закрылось
+    'EVENTS_BUFFER_SIZE': Setting(int, 100, minimum=1),
+    'EVENTS_HEARTBEAT_SECONDS': Setting(float, 15.0, minimum=1),
+
+    # Поиск дубликатов клиентов (flask dedup-customers): минимальная оценка
+    # пары для очереди проверки и предельный размер блока сравнения
+    'DEDUP_MIN_SCORE': Setting(float, 0.85, minimum=0, maximum=1),
+    'DEDUP_BATCH_SIZE': Setting(int, 5000, minimum=1),
+    'DEDUP_MAX_BLOCK_SIZE': Setting(int, 50, minimum=2),
+
+    'JOB_WORKERS': Setting(int, 2, minimum=1),
+    'JOB_POLL_INTERVAL': Setting(float, 1.0, minimum=0.05),
+    # Выполняемая задача без отчёта о прогрессе дольше этого срока
+    # возвращается в очередь
+    'JOB_STALE_SECONDS': Setting(int, 600, minimum=1),
+}
+
+
+def load_settings(path=CONFIG_FILE, env=None):
+    """Настройки приложения: значения по умолчанию, затем файл, затем окружение.
+
+    Файл необязателен, но неизвестные ключи в нём считаются ошибкой (чаще
+    всего это опечатка). Из окружения берутся только известные настройки.
+    Возвращает неизменяемый словарь.
+    """
+    env = os.environ if env is None else env
+    values = {name: setting.default for name, setting in SCHEMA.items()}
+    problems = []
+
+    if path and os.path.exists(path):
+        with open(path, 'r') as config_file:
+            try:
+                file_values = json.load(config_file)
+            except ValueError as e:
+                raise ConfigError([f"{path}: {e}"])
+        for name, value in file_values.items():
+            if name not in SCHEMA:
+                problems.append(f"{path}: unknown setting {name}")
+            else:
+                values[name] = value
+
+    for env_name, raw in env.items():
+        name = ENV_ALIASES.get(env_name, env_name)
+        if name not in SCHEMA:
+            continue
+        try:
+            values[name] = SCHEMA[name].parse_env(raw)
+        except ValueError as e:
+            problems.append(f"environment {env_name}: {e}")
+
+    for name, setting in SCHEMA.items():
+        try:
+            values[name] = setting.validate(values[name])
+        except ValueError as e:
+            problems.append(f"{name}: {e}")
+
+    if problems:
+        raise ConfigError(problems)
+
+    values['SQLALCHEMY_ENGINE_OPTIONS'] = MappingProxyType(
+        dict(values['SQLALCHEMY_ENGINE_OPTIONS']))
+    return MappingProxyType(values)
+
+
+@functools.lru_cache(maxsize=None)
+def get_settings(path=CONFIG_FILE):
+    """Настройки, загруженные и проверенные один раз за процесс."""
+    return load_settings(path)
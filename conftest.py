@@ -0,0 +1,2 @@
+# Тестовая база должна быть настроена до того, как модули тестов импортируют app
+import testing  # noqa: F401
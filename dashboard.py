@@ -0,0 +1,123 @@
+"""Показатели главной страницы."""
+import threading
+import time
+from datetime import date, datetime, timedelta
+
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from models import db, Customer, Order, OrderLine, Service
+from validation import kopecks_to_rubles
+
+# Изменение этих моделей делает показатели устаревшими
+TRACKED_MODELS = (Customer, Service, Order, OrderLine)
+TRACKED_TABLES = frozenset(model.__table__ for model in TRACKED_MODELS)
+TOP_SERVICES_LIMIT = 5
+
+
+def compute_kpis(today=None):
+    """Считает показатели за день, месяц и неделю.
+
+    Все запросы ограничены диапазоном дат по индексам orders.order_date
+    и customers.created_at, так что таблицы целиком не читаются.
+    """
+    today = today or date.today()
+    month_start = today.replace(day=1)
+    week_start = today - timedelta(days=today.weekday())
+
+    def orders_between(start):
+        count, total = db.session.query(
+            db.func.count(Order.id),
+            db.func.coalesce(db.func.sum(Order.total_kopecks), 0),
+        ).filter(Order.order_date >= start, Order.order_date <= today).one()
+        return {'orders': count, 'revenue': kopecks_to_rubles(total)}
+
+    revenue = db.func.sum(OrderLine.quantity * OrderLine.price_kopecks).label('revenue')
+    quantity = db.func.sum(OrderLine.quantity).label('quantity')
+    top_services = db.session.query(
+        Service.id, Service.service_name, quantity, revenue).join(
+        OrderLine, OrderLine.service_id == Service.id).join(
+        Order, Order.id == OrderLine.order_id).filter(
+        Order.order_date >= month_start, Order.order_date <= today).group_by(
+        Service.id).order_by(revenue.desc(), Service.id).limit(
+        TOP_SERVICES_LIMIT).all()
+
+    new_customers = db.session.query(db.func.count(Customer.id)).filter(
+        Customer.created_at >= datetime.combine(week_start, datetime.min.time())
+    ).scalar()
+
+    return {
+        'date': today,
+        'computed_at': datetime.now(),
+        'today': orders_between(today),
+        'month': orders_between(month_start),
+        'new_customers_week': new_customers,
+        'top_services': [
+            {'id': service_id, 'service_name': name, 'quantity': quantity,
+             'revenue': kopecks_to_rubles(revenue)}
+            for service_id, name, quantity, revenue in top_services],
+    }
+
+
+class KpiStore:
+    """Последние посчитанные показатели.
+
+    Показатели пересчитываются при первом запросе после того, как
+    истёк ttl, сменилась дата или изменились заказы, клиенты или услуги
+    (invalidate вызывается после commit таких изменений в этом процессе).
+    Изменения из других процессов видны не позже чем через ttl секунд.
+    """
+
+    def __init__(self, ttl, compute=compute_kpis, clock=time.monotonic):
+        self.ttl = ttl
+        self.compute = compute
+        self.clock = clock
+        self._lock = threading.Lock()
+        self._value = None
+        self._expires_at = 0
+
+    def get(self):
+        # Под блокировкой: одновременные запросы не пересчитывают
+        # показатели каждый сам
+        with self._lock:
+            if (self._value is None or self.clock() >= self._expires_at
+                    or self._value['date'] != date.today()):
+                self._value = self.compute()
+                self._expires_at = self.clock() + self.ttl
+            return self._value
+
+    def invalidate(self):
+        with self._lock:
+            self._expires_at = 0
+
+
+def setup_dashboard(app):
+    """Создаёт хранилище показателей и сбрасывает его после commit,
+    в котором менялись отслеживаемые модели."""
+    store = KpiStore(app.config['DASHBOARD_CACHE_TTL'])
+    app.extensions['dashboard'] = store
+
+    @event.listens_for(Session, 'before_flush')
+    def _mark_changes(session, flush_context, instances):
+        if any(isinstance(obj, TRACKED_MODELS)
+               for obj in (*session.new, *session.dirty, *session.deleted)):
+            session.info['kpi_changed'] = True
+
+    @event.listens_for(Session, 'do_orm_execute')
+    def _mark_statements(state):
+        # INSERT/UPDATE/DELETE запросом (move_orders, массовое удаление)
+        # идут мимо flush
+        if ((state.is_insert or state.is_update or state.is_delete)
+                and state.statement.table in TRACKED_TABLES):
+            state.session.info['kpi_changed'] = True
+
+    @event.listens_for(Session, 'after_commit')
+    def _invalidate(session):
+        if session.info.pop('kpi_changed', False):
+            store.invalidate()
+
+    @event.listens_for(Session, 'after_rollback')
+    def _forget_changes(session):
+        session.info.pop('kpi_changed', None)
+
+    return store
@@ -0,0 +1,180 @@
+import threading
+import time
+
+from sqlalchemy import event, exc
+from sqlalchemy.pool import QueuePool
+
+# Стратегии проверки соединения перед выдачей из пула:
+# always - SELECT 1 при каждой выдаче (pool_pre_ping SQLAlchemy),
+# idle - только если соединение простаивало дольше DB_PRE_PING_IDLE_SECONDS,
+# never - без проверки
+PRE_PING_STRATEGIES = ('always', 'idle', 'never')
+POOL_SIZE_OPTIONS = ('pool_size', 'max_overflow', 'pool_timeout')
+
+
+class PoolMetrics:
+    """Счётчики пула соединений, обновляются событиями пула."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        with self._lock:
+            self.connects = 0
+            self.checkouts = 0
+            self.checkins = 0
+            self.invalidations = 0
+            self.timeouts = 0
+            self.in_use = 0
+            self.in_use_peak = 0
+            self.overflow_peak = 0
+            self.wait_count = 0
+            self.wait_total = 0.0
+            self.wait_max = 0.0
+            self.pings = 0
+            self.failed_pings = 0
+
+    def add(self, name, value=1):
+        with self._lock:
+            setattr(self, name, getattr(self, name) + value)
+
+    def observe_wait(self, seconds):
+        with self._lock:
+            self.wait_count += 1
+            self.wait_total += seconds
+            self.wait_max = max(self.wait_max, seconds)
+
+    def checkout(self, pool_size):
+        with self._lock:
+            self.checkouts += 1
+            self.in_use += 1
+            self.in_use_peak = max(self.in_use_peak, self.in_use)
+            if pool_size is not None:
+                self.overflow_peak = max(self.overflow_peak,
+                                         self.in_use - pool_size)
+
+    def checkin(self):
+        with self._lock:
+            self.checkins += 1
+            self.in_use = max(self.in_use - 1, 0)
+
+    def snapshot(self, pool=None):
+        """Текущее состояние для /metrics и /health."""
+        with self._lock:
+            data = {
+                'connects': self.connects,
+                'checkouts': self.checkouts,
+                'checkins': self.checkins,
+                'invalidations': self.invalidations,
+                'timeouts': self.timeouts,
+                'in_use': self.in_use,
+                'in_use_peak': self.in_use_peak,
+                'overflow_peak': self.overflow_peak,
+                'checkout_wait': {
+                    'count': self.wait_count,
+                    'avg_ms': round(self.wait_total / self.wait_count * 1000, 3)
+                    if self.wait_count else 0,
+                    'max_ms': round(self.wait_max * 1000, 3),
+                },
+                'pre_ping': {'pings': self.pings, 'failed': self.failed_pings},
+            }
+        if isinstance(pool, QueuePool):
+            data.update({
+                'pool_size': pool.size(),
+                'checked_in': pool.checkedin(),
+                'overflow': max(pool.overflow(), 0),
+                'max_overflow': pool._max_overflow,
+            })
+        return data
+
+
+pool_metrics = PoolMetrics()
+
+
+class TimedQueuePool(QueuePool):
+    """QueuePool, который замеряет ожидание свободного соединения.
+
+    События пула срабатывают уже после выдачи соединения, поэтому время
+    ожидания снимается здесь.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        except exc.TimeoutError:
+            pool_metrics.add('timeouts')
+            raise
+        finally:
+            pool_metrics.observe_wait(time.perf_counter() - start)
+
+
+def engine_options(config):
+    """Параметры create_engine из настроек DB_POOL_*, DB_PRE_PING и
+    SQLALCHEMY_ENGINE_OPTIONS (последние имеют приоритет)."""
+    options = {
+        'pool_size': config.get('DB_POOL_SIZE', 5),
+        'max_overflow': config.get('DB_MAX_OVERFLOW', 10),
+        'pool_timeout': config.get('DB_POOL_TIMEOUT', 30),
+        'pool_recycle': config.get('DB_POOL_RECYCLE', 600),
+    }
+    options.update(config.get('SQLALCHEMY_ENGINE_OPTIONS') or {})
+    strategy = config.get('DB_PRE_PING', 'idle')
+    if strategy not in PRE_PING_STRATEGIES:
+        raise ValueError(
+            f"DB_PRE_PING must be one of {', '.join(PRE_PING_STRATEGIES)}, got {strategy!r}")
+    options['pool_pre_ping'] = strategy == 'always'
+
+    uri = config.get('SQLALCHEMY_DATABASE_URI', '')
+    if uri.startswith('sqlite') and (':memory:' in uri or uri.rstrip('/') == 'sqlite:'):
+        # База в памяти живёт в одном соединении, размер пула к ней неприменим
+        for name in POOL_SIZE_OPTIONS:
+            options.pop(name, None)
+        return options
+
+    options.setdefault('poolclass', TimedQueuePool)
+    return options
+
+
+def register_pool_events(engine, config):
+    """Подключает счётчики и проверку простаивавших соединений к пулу."""
+    pool = engine.pool
+    pool_size = pool.size() if isinstance(pool, QueuePool) else None
+    ping_idle = (config.get('DB_PRE_PING', 'idle') == 'idle')
+    idle_seconds = config.get('DB_PRE_PING_IDLE_SECONDS', 300)
+
+    @event.listens_for(pool, 'connect')
+    def on_connect(dbapi_connection, connection_record):
+        pool_metrics.add('connects')
+
+    @event.listens_for(pool, 'checkout')
+    def on_checkout(dbapi_connection, connection_record, connection_proxy):
+        if ping_idle:
+            _ping_if_idle(dbapi_connection, connection_record, idle_seconds)
+        pool_metrics.checkout(pool_size)
+
+    @event.listens_for(pool, 'checkin')
+    def on_checkin(dbapi_connection, connection_record):
+        connection_record.info['checked_in_at'] = time.monotonic()
+        pool_metrics.checkin()
+
+    @event.listens_for(pool, 'invalidate')
+    def on_invalidate(dbapi_connection, connection_record, exception):
+        pool_metrics.add('invalidations')
+
+
+def _ping_if_idle(dbapi_connection, connection_record, idle_seconds):
+    checked_in_at = connection_record.info.get('checked_in_at')
+    if checked_in_at is None or time.monotonic() - checked_in_at < idle_seconds:
+        return
+
+    pool_metrics.add('pings')
+    try:
+        cursor = dbapi_connection.cursor()
+        cursor.execute('SELECT 1')
+        cursor.close()
+    except Exception as e:
+        pool_metrics.add('failed_pings')
+        # Пул выбросит это соединение и выдаст новое
+        raise exc.DisconnectionError(f"Idle connection failed pre-ping: {e}")
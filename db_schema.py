@@ -0,0 +1,71 @@
+"""Создание схемы базы и её связь с миграциями Alembic."""
+import os
+
+from alembic import command
+from sqlalchemy import column, inspect, table
+
+# Базовая ревизия схемы: с неё начинается цепочка миграций
+BASELINE_REVISION = '824231915883'
+# Одинаковые ревизии "Initial migration", объединённые в базовую
+SQUASHED_REVISIONS = (
+    '31395e3ad18f', '94d6034442fd', 'f1b1de6a2f94', '28f7289c8be0',
+    'ff791f3a80f8', '5a8af9284599', '4dfb8bb8bfc4', 'e1fa9c32e03f',
+    'ff97532a00e1', 'ac32419fe13c', '9462b7c8b441', '3c88fcc3d95d',
+)
+MIGRATIONS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'migrations')
+
+_alembic_version = table('alembic_version', column('version_num'))
+
+
+class SchemaExistsError(RuntimeError):
+    """В базе уже есть таблицы; её нужно обновлять миграциями."""
+
+
+def stamp_squashed(connection):
+    """Переводит базу с удалённой ревизии на базовую.
+
+    Схема этих ревизий совпадает с базовой, меняется только отметка
+    в alembic_version. Возвращает True, если отметка изменена.
+    """
+    if not inspect(connection).has_table('alembic_version'):
+        return False
+    result = connection.execute(
+        _alembic_version.update().where(
+            _alembic_version.c.version_num.in_(SQUASHED_REVISIONS)).values(
+            version_num=BASELINE_REVISION))
+    return bool(result.rowcount)
+
+
+def alembic_config(app, connection=None):
+    """Настройки Alembic приложения.
+
+    С connection миграции выполняются в этом соединении, а не в db.engine,
+    и commit остаётся за вызывающим кодом.
+    """
+    config = app.extensions['migrate'].migrate.get_config(MIGRATIONS_DIR)
+    if connection is not None:
+        config.attributes['connection'] = connection
+    return config
+
+
+def current_revision(connection):
+    if not inspect(connection).has_table('alembic_version'):
+        return None
+    return connection.execute(_alembic_version.select()).scalar()
+
+
+def bootstrap_schema(app, metadata, connection):
+    """Создаёт схему из моделей одним create_all и помечает её последней
+    ревизией, не проходя цепочку миграций.
+
+    Подходит только для пустой базы: новое окружение, тестовая база.
+    Вызывается в контексте приложения.
+    """
+    existing = [name for name in inspect(connection).get_table_names()
+                if name != 'alembic_version']
+    if existing:
+        raise SchemaExistsError(
+            f"Database already has tables: {', '.join(sorted(existing))}")
+    metadata.create_all(connection)
+    command.stamp(alembic_config(app, connection), 'head')
+    return current_revision(connection)
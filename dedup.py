@@ -0,0 +1,274 @@
+"""Поиск клиентов-дубликатов.
+
+Сравнивать все пары клиентов нельзя: на миллионе клиентов это 5 * 10^11
+сравнений. Поэтому клиенты сначала раскладываются по блокам (blocking):
+у каждого клиента есть несколько ключей, и сравниваются только клиенты
+с общим ключом. Ключи:
+
+- phone: последние 7 цифр телефона (опечатка в коде оператора);
+- email: email после нормализации;
+- name: слова имени в алфавитном порядке ("Иван Иванов" и "Иванов Иван");
+- name_prefix: первые 4 буквы каждого слова имени (окончания и
+  сокращения отчества).
+
+Каждый ключ обрабатывается отдельным проходом по таблице пачками по id,
+в памяти лежит только словарь ключ -> id одного прохода. Блоки больше
+max_block_size (распространённые имена) пропускаются: пар в них слишком
+много, а общий ключ там почти ничего не значит. Так работа растёт
+примерно линейно с числом клиентов.
+
+Найденные пары оцениваются по сходству имени и компании с бонусом за
+совпавшие email и телефон и попадают в очередь проверки
+(DuplicateCandidate); клиентов объединяет оператор.
+"""
+import itertools
+import re
+from datetime import datetime
+from difflib import SequenceMatcher
+
+try:
+    from rapidfuzz import fuzz
+except ImportError:
+    fuzz = None
+
+from models import db, chunked, Customer, DuplicateCandidate
+from validation import PHONE_CLEAN_PATTERN
+
+BLOCKING_KEYS = ('phone', 'email', 'name', 'name_prefix')
+PHONE_KEY_DIGITS = 7
+NAME_PREFIX_LENGTH = 4
+MAX_BLOCK_SIZE = 50
+BATCH_SIZE = 5000
+
+# Прибавка к оценке за точное совпадение email или телефона
+EXACT_MATCH_BONUS = 0.25
+# Доля сходства компаний в оценке, если компания указана у обоих
+COMPANY_WEIGHT = 0.2
+
+WORD_SEPARATOR_PATTERN = re.compile(r'[\W_]+')
+COMPANY_FORMS = frozenset((
+    'ооо', 'оао', 'зао', 'пао', 'ао', 'ип', 'нко', 'llc', 'ltd', 'inc'))
+EMAIL_DOMAIN_ALIASES = {
+    'googlemail.com': 'gmail.com',
+    'ya.ru': 'yandex.ru',
+    'yandex.com': 'yandex.ru',
+    'yandex.by': 'yandex.ru',
+    'yandex.kz': 'yandex.ru',
+}
+
+
+def phone_digits(phone):
+    """Последние 10 цифр номера или None; очистка как в is_valid_phone."""
+    digits = PHONE_CLEAN_PATTERN.sub('', phone or '').lstrip('+')
+    return digits[-10:] if len(digits) >= 10 else None
+
+
+def normalize_email(email):
+    """Email в нижнем регистре, без метки после "+" и с основным доменом
+    вместо псевдонима; для Gmail без точек в имени."""
+    email = (email or '').strip().lower()
+    local, at, domain = email.rpartition('@')
+    if not at or not local or not domain:
+        return None
+    domain = EMAIL_DOMAIN_ALIASES.get(domain, domain)
+    local = local.split('+', 1)[0]
+    if domain == 'gmail.com':
+        local = local.replace('.', '')
+    return f'{local}@{domain}'
+
+
+def name_words(text):
+    text = (text or '').lower().replace('ё', 'е')
+    return sorted(word for word in WORD_SEPARATOR_PATTERN.split(text) if word)
+
+
+def normalize_name(text):
+    """Слова имени в нижнем регистре, в алфавитном порядке, через пробел."""
+    return ' '.join(name_words(text))
+
+
+def normalize_company(text):
+    """Название компании без организационно-правовой формы (ООО, ИП...)."""
+    return ' '.join(word for word in name_words(text)
+                    if word not in COMPANY_FORMS)
+
+
+def blocking_key(kind, name=None, phone_number=None, email=None):
+    """Ключ блока клиента для ключа kind или None, если данных нет."""
+    if kind == 'phone':
+        digits = phone_digits(phone_number)
+        return digits[-PHONE_KEY_DIGITS:] if digits else None
+    if kind == 'email':
+        return normalize_email(email)
+    if kind == 'name':
+        return normalize_name(name) or None
+    if kind == 'name_prefix':
+        return ' '.join(word[:NAME_PREFIX_LENGTH]
+                        for word in name_words(name)) or None
+    raise ValueError(f"Unknown blocking key: {kind}")
+
+
+# Столбцы клиента, нужные для каждого ключа
+_KEY_COLUMNS = {
+    'phone': ('phone_number',),
+    'email': ('email',),
+    'name': ('name',),
+    'name_prefix': ('name',),
+}
+
+
+def similarity(a, b):
+    """Сходство строк от 0 до 1; rapidfuzz, если установлен."""
+    if not a or not b:
+        return 0.0
+    if a == b:
+        return 1.0
+    if fuzz is not None:
+        return fuzz.ratio(a, b) / 100
+    return SequenceMatcher(None, a, b).ratio()
+
+
+def match_record(customer):
+    """Нормализованные поля клиента для оценки пары."""
+    return {
+        'name': normalize_name(customer.name),
+        'company': normalize_company(customer.company),
+        'email': normalize_email(customer.email),
+        'phone': phone_digits(customer.phone_number),
+    }
+
+
+def score_pair(a, b):
+    """Оценка пары от 0 до 1 и её обоснование."""
+    name = similarity(a['name'], b['name'])
+    reasons = {'name': round(name, 3)}
+    score = name
+    if a['company'] and b['company']:
+        company = similarity(a['company'], b['company'])
+        reasons['company'] = round(company, 3)
+        score = (1 - COMPANY_WEIGHT) * name + COMPANY_WEIGHT * company
+    for field in ('email', 'phone'):
+        if a[field] and a[field] == b[field]:
+            reasons[field] = True
+            score += EXACT_MATCH_BONUS
+    return round(min(score, 1.0), 3), reasons
+
+
+def _iter_customers(columns, batch_size):
+    """Клиенты пачками по возрастанию id, без загрузки объектов в сессию."""
+    last_id = 0
+    while True:
+        rows = db.session.execute(
+            db.select(Customer.id, *(getattr(Customer, name) for name in columns))
+            .where(Customer.id > last_id).order_by(Customer.id).limit(batch_size)).all()
+        if not rows:
+            return
+        yield rows
+        last_id = rows[-1].id
+
+
+def candidate_pairs(batch_size=BATCH_SIZE, max_block_size=MAX_BLOCK_SIZE,
+                    on_progress=None):
+    """Пары (меньший id, больший id) клиентов с общим ключом блока.
+
+    on_progress(обработано, всего) вызывается после каждой пачки.
+    Возвращает пары, число пропущенных слишком больших блоков и число
+    обработанных записей (клиентов, умноженное на число ключей).
+    """
+    customers = db.session.scalar(db.select(db.func.count(Customer.id)))
+    total = customers * len(BLOCKING_KEYS)
+    done = 0
+    pairs = set()
+    skipped_blocks = 0
+
+    for kind in BLOCKING_KEYS:
+        blocks = {}
+        for rows in _iter_customers(_KEY_COLUMNS[kind], batch_size):
+            for row in rows:
+                key = blocking_key(kind, **{name: getattr(row, name)
+                                            for name in _KEY_COLUMNS[kind]})
+                if key is not None:
+                    blocks.setdefault(key, []).append(row.id)
+            done += len(rows)
+            if on_progress:
+                on_progress(done, total)
+
+        for ids in blocks.values():
+            if len(ids) > max_block_size:
+                skipped_blocks += 1
+            elif len(ids) > 1:
+                pairs.update(itertools.combinations(ids, 2))
+    return pairs, skipped_blocks, done
+
+
+def find_duplicates(min_score, batch_size=BATCH_SIZE,
+                    max_block_size=MAX_BLOCK_SIZE, on_progress=None):
+    """Пары клиентов с оценкой не ниже min_score.
+
+    Возвращает список (customer_id, duplicate_id, score, reasons) по
+    убыванию оценки и статистику поиска. Пары, которые оператор уже
+    проверил, не возвращаются.
+    """
+    pairs, skipped_blocks, processed = candidate_pairs(
+        batch_size, max_block_size, on_progress)
+    pairs -= reviewed_pairs()
+
+    by_customer = {}
+    for pair in sorted(pairs):
+        by_customer.setdefault(pair[0], []).append(pair[1])
+
+    # Пачка - клиенты с меньшим id пары вместе со всеми их парами:
+    # обе стороны пары должны быть загружены одновременно
+    duplicates = []
+    scored = 0
+    for chunk in chunked(by_customer):
+        ids = set(chunk)
+        for customer_id in chunk:
+            ids.update(by_customer[customer_id])
+        records = {}
+        for ids_chunk in chunked(ids):
+            for row in db.session.execute(db.select(
+                    Customer.id, Customer.name, Customer.company,
+                    Customer.email, Customer.phone_number).where(
+                    Customer.id.in_(ids_chunk))):
+                records[row.id] = match_record(row)
+
+        for customer_id in chunk:
+            for duplicate_id in by_customer[customer_id]:
+                if customer_id not in records or duplicate_id not in records:
+                    continue
+                score, reasons = score_pair(records[customer_id], records[duplicate_id])
+                if score >= min_score:
+                    duplicates.append((customer_id, duplicate_id, score, reasons))
+            scored += len(by_customer[customer_id])
+        if on_progress:
+            on_progress(processed + scored, processed + len(pairs))
+
+    duplicates.sort(key=lambda duplicate: (-duplicate[2], duplicate[0], duplicate[1]))
+    return duplicates, {'pairs': len(pairs), 'skipped_blocks': skipped_blocks}
+
+
+def reviewed_pairs():
+    """Пары, которые оператор уже объединил или отклонил."""
+    candidates = DuplicateCandidate.__table__
+    return set(map(tuple, db.session.execute(
+        db.select(candidates.c.customer_id, candidates.c.duplicate_id).where(
+            candidates.c.status != 'pending'))))
+
+
+def save_candidates(duplicates, job_id=None):
+    """Заменяет непроверенную часть очереди найденными парами.
+
+    Проверенные пары остаются как есть. Commit остаётся за вызывающим кодом.
+    Возвращает число пар в очереди.
+    """
+    candidates = DuplicateCandidate.__table__
+    db.session.execute(db.delete(candidates).where(candidates.c.status == 'pending'))
+    now = datetime.now()
+    for chunk in chunked(duplicates):
+        db.session.execute(db.insert(candidates), [
+            {'customer_id': customer_id, 'duplicate_id': duplicate_id,
+             'score': score, 'reasons': reasons, 'status': 'pending',
+             'job_id': job_id, 'created_at': now}
+            for customer_id, duplicate_id, score, reasons in chunk])
+    return len(duplicates)
@@ -0,0 +1,128 @@
+"""Рассылка событий об изменениях открытым страницам (Server-Sent Events)."""
+import json
+import threading
+from collections import deque, namedtuple
+
+Event = namedtuple('Event', 'id type data')
+
+# Подписчик отстал или пропустил события: странице нужно перезагрузиться
+RELOAD = Event(None, 'reload', {})
+
+
+class Subscription:
+    """Очередь событий одного подписчика, не больше maxsize штук.
+
+    Если подписчик не успевает забирать события и очередь переполнена,
+    она очищается и в ней остаётся одно событие reload: продолжать
+    с пропусками нельзя, страница перечитывает список целиком.
+    Публикующий запрос при этом никогда не ждёт подписчика.
+    """
+
+    def __init__(self, maxsize):
+        self.maxsize = maxsize
+        self._events = deque()
+        self._condition = threading.Condition()
+        self.closed = False
+
+    def put(self, event):
+        with self._condition:
+            if self._events and self._events[0] is RELOAD:
+                return
+            if len(self._events) >= self.maxsize:
+                self._events.clear()
+                event = RELOAD
+            self._events.append(event)
+            self._condition.notify()
+
+    def get(self, timeout=None):
+        """Следующее событие или None, если за timeout секунд их не было."""
+        with self._condition:
+            if not self._events and not self.closed:
+                self._condition.wait(timeout)
+            return self._events.popleft() if self._events else None
+
+    def close(self):
+        with self._condition:
+            self.closed = True
+            self._condition.notify_all()
+
+
+class EventBroker:
+    """Публикация и подписка внутри процесса.
+
+    Подписчики получают только события этого процесса. Последние
+    history_size событий хранятся, чтобы переподключившийся клиент
+    (заголовок Last-Event-ID) получил пропущенное.
+    """
+
+    def __init__(self, buffer_size=100, history_size=100):
+        self.buffer_size = buffer_size
+        self._lock = threading.Lock()
+        self._last_id = 0
+        self._history = deque(maxlen=history_size)
+        self._subscribers = set()
+
+    def subscribe(self, last_event_id=None):
+        subscription = Subscription(self.buffer_size)
+        with self._lock:
+            if last_event_id is not None:
+                # История хранит события с номерами подряд до _last_id
+                if (last_event_id > self._last_id or
+                        last_event_id < self._last_id - len(self._history)):
+                    # Пропущенное уже вытеснено из истории или процесс
+                    # перезапущен и номера начались заново
+                    subscription.put(RELOAD)
+                else:
+                    for event in self._history:
+                        if event.id > last_event_id:
+                            subscription.put(event)
+            self._subscribers.add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            self._subscribers.discard(subscription)
+        subscription.close()
+
+    def publish(self, type, data):
+        with self._lock:
+            self._last_id += 1
+            event = Event(self._last_id, type, data)
+            self._history.append(event)
+            subscribers = list(self._subscribers)
+        for subscription in subscribers:
+            subscription.put(event)
+        return event
+
+    @property
+    def subscriber_count(self):
+        with self._lock:
+            return len(self._subscribers)
+
+
+def format_event(event):
+    """Событие в формате text/event-stream."""
+    lines = []
+    if event.id is not None:
+        lines.append(f'id: {event.id}')
+    lines.append(f'event: {event.type}')
+    lines.append('data: ' + json.dumps(event.data, ensure_ascii=False))
+    return '\n'.join(lines) + '\n\n'
+
+
+def stream(broker, subscription, heartbeat, retry_ms=5000):
+    """Тело ответа text/event-stream для подписки.
+
+    Раз в heartbeat секунд без событий отправляется комментарий, чтобы
+    прокси не закрывали простаивающее соединение. Подписка снимается,
+    когда клиент отключается (генератор закрывается сервером).
+    """
+    try:
+        yield f'retry: {retry_ms}\n\n'
+        while not subscription.closed:
+            event = subscription.get(timeout=heartbeat)
+            yield ': keepalive\n\n' if event is None else format_event(event)
+            if event is RELOAD:
+                return
+    finally:
+        broker.unsubscribe(subscription)
@@ -0,0 +1,63 @@
+import hashlib
+import re
+from datetime import datetime, timedelta
+
+from models import db, IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+FORM_FIELD = 'idempotency_key'
+KEY_PATTERN = re.compile(r'^[A-Za-z0-9_\-:.]{8,128}$')
+
+
+class IdempotencyConflict(Exception):
+    """Ключ уже использован для запроса с другими данными."""
+
+
+def request_key(request):
+    """Ключ из заголовка Idempotency-Key (API) или скрытого поля формы.
+
+    Пустой или некорректный ключ равносилен его отсутствию.
+    """
+    key = request.headers.get(HEADER) or request.form.get(FORM_FIELD)
+    if key and KEY_PATTERN.match(key):
+        return key
+    return None
+
+
+def request_hash(form):
+    """Отпечаток полей запроса без самого ключа, не зависящий от их порядка."""
+    digest = hashlib.sha256()
+    for name, value in sorted(form.items(multi=True)):
+        if name != FORM_FIELD:
+            digest.update(f"{name}={value}\n".encode('utf-8'))
+    return digest.hexdigest()
+
+
+def find_result(endpoint, key, fingerprint, now=None):
+    """id сущности, созданной ранее по этому ключу, или None.
+
+    Один SELECT по первичному ключу; просроченный ключ не учитывается.
+    """
+    now = now or datetime.now()
+    record = db.session.get(IdempotencyKey, (endpoint, key))
+    if record is None or record.expires_at <= now:
+        return None
+    if record.request_hash != fingerprint:
+        raise IdempotencyConflict(key)
+    return record.entity_id
+
+
+def remember(endpoint, key, fingerprint, entity_id, ttl, now=None):
+    """Записывает результат в той же транзакции, что и сама сущность.
+
+    Повтор, пришедший одновременно с оригиналом, упадёт на первичном
+    ключе при commit, и вызывающий код вернёт уже сохранённый результат.
+    Заодно удаляет просроченные ключи (по индексу expires_at).
+    """
+    now = now or datetime.now()
+    db.session.execute(db.delete(IdempotencyKey).where(
+        IdempotencyKey.expires_at <= now))
+    db.session.add(IdempotencyKey(
+        endpoint=endpoint, key=key, request_hash=fingerprint,
+        entity_id=entity_id, created_at=now,
+        expires_at=now + timedelta(seconds=ttl)))
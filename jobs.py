@@ -0,0 +1,245 @@
+"""Фоновые задачи на SQLite, без внешнего брокера.
+
+Задачи лежат в таблице jobs. Процессы-обработчики (flask jobs-worker)
+забирают их по одной условным UPDATE, поэтому одну задачу не возьмут
+два процесса. Обработчик задачи получает JobContext: через него он
+сообщает прогресс и узнаёт об отмене.
+"""
+import inspect
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from datetime import datetime, timedelta
+
+from archive import archive_orders
+from dedup import find_duplicates, save_candidates
+from models import db, Job, Order, JOB_FINISHED_STATUSES
+
+# Обработчики задач по типу: kind -> функция(context, **params)
+HANDLERS = {}
+
+
+class JobCancelled(Exception):
+    """Задачу отменили; обработчик прерывается на ближайшем отчёте о прогрессе."""
+
+
+def job_handler(kind):
+    """Регистрирует функцию как обработчик задач типа kind."""
+    def register(func):
+        HANDLERS[kind] = func
+        return func
+    return register
+
+
+def check_params(kind, params):
+    """Проверяет, что обработчик kind примет params; иначе ValueError.
+
+    Ошибка видна при постановке в очередь, а не позже в воркере.
+    """
+    if kind not in HANDLERS:
+        raise ValueError(f"Unknown job kind: {kind}")
+    try:
+        inspect.signature(HANDLERS[kind]).bind(None, **params)
+    except TypeError as e:
+        raise ValueError(f"Invalid parameters for job {kind}: {e}")
+
+
+def enqueue(kind, /, **params):
+    """Ставит задачу в очередь. params должны сериализоваться в JSON."""
+    check_params(kind, params)
+    job = Job(kind=kind, params=params, status='queued',
+              created_at=datetime.now())
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+def cancel(job_id):
+    """Отменяет задачу. Задача из очереди отменяется сразу, выполняемая -
+    когда её обработчик в следующий раз сообщит о прогрессе.
+
+    Возвращает задачу или None, если её нет.
+    """
+    jobs = Job.__table__
+    result = db.session.execute(
+        db.update(jobs).where(jobs.c.id == job_id, jobs.c.status == 'queued').values(
+            status='cancelled', cancel_requested=True, finished_at=datetime.now()))
+    if not result.rowcount:
+        db.session.execute(
+            db.update(jobs).where(jobs.c.id == job_id, jobs.c.status == 'running').values(
+                cancel_requested=True))
+    db.session.commit()
+    return db.session.get(Job, job_id, populate_existing=True)
+
+
+class JobContext:
+    """То, что обработчик знает о своей задаче."""
+
+    def __init__(self, job_id):
+        self.job_id = job_id
+
+    def progress(self, done, total=None):
+        """Сохраняет прогресс и проверяет отмену.
+
+        Вызывать между шагами, после commit своей работы: при отмене
+        выбрасывается JobCancelled.
+        """
+        values = {'progress': done, 'heartbeat_at': datetime.now()}
+        if total is not None:
+            values['total'] = total
+        jobs = Job.__table__
+        db.session.execute(
+            db.update(jobs).where(jobs.c.id == self.job_id).values(**values))
+        cancelled = db.session.scalar(
+            db.select(jobs.c.cancel_requested).where(jobs.c.id == self.job_id))
+        db.session.commit()
+        if cancelled:
+            raise JobCancelled(self.job_id)
+
+
+def claim_next(worker):
+    """Забирает самую старую задачу из очереди или возвращает None."""
+    jobs = Job.__table__
+    while True:
+        job_id = db.session.scalar(
+            db.select(jobs.c.id).where(jobs.c.status == 'queued').order_by(
+                jobs.c.id).limit(1))
+        if job_id is None:
+            db.session.commit()
+            return None
+        now = datetime.now()
+        # Задачу мог забрать другой процесс между SELECT и UPDATE
+        result = db.session.execute(
+            db.update(jobs).where(jobs.c.id == job_id, jobs.c.status == 'queued').values(
+                status='running', worker=worker, started_at=now, heartbeat_at=now))
+        db.session.commit()
+        if result.rowcount:
+            return db.session.get(Job, job_id, populate_existing=True)
+
+
+def requeue_stale(stale_seconds):
+    """Возвращает в очередь задачи, обработчик которых давно не сообщал
+    о прогрессе (процесс упал или был убит). Возвращает их число."""
+    jobs = Job.__table__
+    cutoff = datetime.now() - timedelta(seconds=stale_seconds)
+    result = db.session.execute(
+        db.update(jobs).where(jobs.c.status == 'running',
+                              jobs.c.heartbeat_at < cutoff).values(
+            status='queued', worker=None, started_at=None))
+    db.session.commit()
+    return result.rowcount
+
+
+def run_job(job, logger=None):
+    """Выполняет забранную задачу и сохраняет итог."""
+    job_id, kind, params = job.id, job.kind, dict(job.params or {})
+    handler = HANDLERS.get(kind)
+    if logger:
+        logger.info(f"Job started. ID: {job_id}, Kind: {kind}")
+
+    values = {}
+    try:
+        if handler is None:
+            raise ValueError(f"Unknown job kind: {kind}")
+        values = {'status': 'done', 'result': handler(JobContext(job_id), **params)}
+    except JobCancelled:
+        db.session.rollback()
+        values = {'status': 'cancelled'}
+    except Exception as e:
+        db.session.rollback()
+        values = {'status': 'failed', 'error': str(e)}
+        if logger:
+            logger.error(f"Job failed. ID: {job_id}, Kind: {kind}. Error: {e}", exc_info=True)
+
+    jobs = Job.__table__
+    db.session.execute(
+        db.update(jobs).where(jobs.c.id == job_id,
+                              jobs.c.status.not_in(JOB_FINISHED_STATUSES)).values(
+            finished_at=datetime.now(), **values))
+    db.session.commit()
+    if logger:
+        logger.info(f"Job finished. ID: {job_id}, Kind: {kind}, Status: {values['status']}")
+    return values['status']
+
+
+def work(app, worker=None, poll_interval=1.0, once=False, should_stop=None):
+    """Цикл обработчика: забирает и выполняет задачи, пока не попросят
+    остановиться. С once=True выходит, когда очередь опустела."""
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    processed = 0
+    with app.app_context():
+        requeued = requeue_stale(app.config['JOB_STALE_SECONDS'])
+        if requeued:
+            app.logger.warning(f"Requeued {requeued} stale jobs.")
+        while not (should_stop and should_stop()):
+            job = claim_next(worker)
+            if job is None:
+                if once:
+                    break
+                time.sleep(poll_interval)
+                continue
+            run_job(job, app.logger)
+            processed += 1
+            db.session.remove()
+    return processed
+
+
+def _worker_process(number, poll_interval):
+    # Приложение импортируется заново в дочернем процессе (spawn):
+    # у каждого обработчика свой пул соединений
+    from app import app
+
+    stopping = []
+    # Текущая задача дорабатывается, затем процесс завершается
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, lambda *args: stopping.append(True))
+    work(app, worker=f"{socket.gethostname()}:{os.getpid()}:{number}",
+         poll_interval=poll_interval, should_stop=lambda: bool(stopping))
+
+
+def run_workers(processes, poll_interval=1.0):
+    """Запускает processes процессов-обработчиков и ждёт их завершения."""
+    context = multiprocessing.get_context('spawn')
+    workers = [context.Process(target=_worker_process, args=(number, poll_interval),
+                               name=f'jobs-worker-{number}')
+               for number in range(1, processes + 1)]
+    for process in workers:
+        process.start()
+
+    def stop(signum, frame):
+        # Ctrl+C из терминала дочерние процессы получают и сами, но сигнал
+        # могли послать только родителю
+        for process in workers:
+            if process.is_alive():
+                os.kill(process.pid, signal.SIGTERM)
+
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        signal.signal(signum, stop)
+    for process in workers:
+        process.join()
+
+
+@job_handler('archive_orders')
+def archive_orders_job(context, before, batch_size):
+    """Перенос старых заказов в архив с прогрессом по пачкам."""
+    cutoff = datetime.strptime(before, '%Y-%m-%d').date()
+    total = db.session.scalar(
+        db.select(db.func.count()).select_from(Order).where(Order.order_date < cutoff))
+    context.progress(0, total)
+    moved = archive_orders(cutoff, batch_size=batch_size,
+                           on_batch=lambda moved: context.progress(moved))
+    return {'moved': moved}
+
+
+@job_handler('dedup_customers')
+def dedup_customers_job(context, min_score, batch_size, max_block_size):
+    """Поиск дубликатов клиентов; найденные пары заменяют непроверенную
+    часть очереди проверки."""
+    duplicates, stats = find_duplicates(
+        min_score, batch_size=batch_size, max_block_size=max_block_size,
+        on_progress=context.progress)
+    save_candidates(duplicates, job_id=context.job_id)
+    db.session.commit()
+    return dict(stats, candidates=len(duplicates))
@@ -0,0 +1,334 @@
+"""Анализ журналов logs/service.log*.
+
+Файлы читаются построчно, от самого старого (service.log.10) к текущему,
+в том числе сжатые .gz. Строки начала операции ("Start creating order")
+сопоставляются со строками успеха или отказа, чтобы оценить длительность
+операций, а предупреждения считаются по типам. Память не зависит от
+объёма журналов: длительности собираются в гистограмму с фиксированными
+границами, очереди незавершённых операций ограничены.
+
+    python log_analytics.py [--json] [пути или каталоги ...]
+"""
+import argparse
+import gzip
+import json
+import os
+import re
+import sys
+from collections import Counter, deque
+from datetime import datetime
+
+from logger_config import SEGMENT_SUFFIX_PATTERN
+
+LOG_DIR = 'logs'
+LOG_NAME = 'service.log'
+
+LINE_PATTERN = re.compile(
+    r'^(\d{4}-\d{2}-\d{2} \d{2}:\d{2}:\d{2},\d{3}) ([A-Z]+): (.*?)(?: \[in .*\])?\s*$')
+START_PATTERN = re.compile(r'^Start (creating|editing) (customer|service|order)\b')
+SUCCESS_PATTERN = re.compile(
+    r'^(Customer|Service|Order) successfully (created|updated)\b')
+ERROR_PATTERN = re.compile(
+    r'^(?:Error creating (\w+)|(\w+) modification error)\b', re.IGNORECASE)
+ATTEMPT_PATTERN = re.compile(
+    r'^Attempt to (create|send|edit) (?:an? )?(client|customer|service|order)\b')
+WARNING_TYPE_PATTERN = re.compile(
+    r'^Attempt to \w+ (?:an? )?\w+(?: \d+)? (?:with )?(?:an? )?(.*)$')
+RESTART_MESSAGE = 'The logger is configured'
+
+ACTIONS = {
+    'creating': 'create', 'created': 'create', 'create': 'create',
+    'editing': 'update', 'updated': 'update', 'send': 'update',
+    'edit': 'update', 'modification': 'update',
+}
+ENTITIES = {'client': 'customer'}
+
+# Верхние границы корзин гистограммы длительностей, мс
+LATENCY_BUCKETS_MS = (1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000,
+                      10000, 30000, 60000, float('inf'))
+# Старт без завершения дольше этого времени считается потерянным
+MAX_PENDING_SECONDS = 300
+# Ограничения, которые держат память постоянной
+MAX_PENDING_PER_OPERATION = 1000
+MAX_WARNING_TYPES = 1000
+OTHER_WARNING_TYPE = '(прочие)'
+
+
+def log_files(directory=LOG_DIR, name=LOG_NAME):
+    """Файлы журнала в хронологическом порядке.
+
+    Сначала нумерованные файлы прежнего RotatingFileHandler (больший номер
+    старше: service.log.10 ... service.log.1), затем сегменты с временем
+    ротации (service.log.20261019-134501), затем текущий service.log.
+    Сжатые файлы (.gz) учитываются так же.
+    """
+    pattern = re.compile(
+        r'^' + re.escape(name) +
+        r'(?:\.(\d+)|\.(' + SEGMENT_SUFFIX_PATTERN + r'))?(?:\.gz)?$')
+    files = []
+    for entry in os.listdir(directory):
+        match = pattern.match(entry)
+        if not match:
+            continue
+        number, suffix = match.group(1), match.group(2)
+        if number:
+            key = (0, -int(number), '')
+        elif suffix:
+            key = (1, 0, suffix[:15], int(suffix[16:] or 0))
+        else:
+            key = (2, 0, '')
+        files.append((key, entry))
+    return [os.path.join(directory, entry) for _, entry in sorted(files)]
+
+
+def read_lines(paths):
+    """Построчно читает файлы по очереди, не загружая их целиком."""
+    for path in paths:
+        opener = gzip.open if path.endswith('.gz') else open
+        with opener(path, 'rt', encoding='utf-8', errors='replace') as log_file:
+            yield from log_file
+
+
+def parse_line(line):
+    """(время, уровень, сообщение) или None для строк трассировки и мусора."""
+    match = LINE_PATTERN.match(line)
+    if not match:
+        return None
+    timestamp = datetime.strptime(match.group(1), '%Y-%m-%d %H:%M:%S,%f')
+    return timestamp, match.group(2), match.group(3)
+
+
+def warning_type(message):
+    """Тип предупреждения: текст без числовых значений и подробностей."""
+    message = message.split('. ', 1)[0].rstrip('. ')
+    match = WARNING_TYPE_PATTERN.match(message)
+    if match:
+        message = match.group(1)
+    return re.sub(r'\d+', 'N', message)
+
+
+class LatencyHistogram:
+    """Длительности операций с постоянным расходом памяти."""
+
+    def __init__(self):
+        self.counts = [0] * len(LATENCY_BUCKETS_MS)
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+
+    def add(self, ms):
+        for index, bound in enumerate(LATENCY_BUCKETS_MS):
+            if ms <= bound:
+                self.counts[index] += 1
+                break
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+
+    def percentile(self, percent):
+        """Верхняя граница корзины, в которую попадает перцентиль."""
+        if not self.count:
+            return None
+        threshold = self.count * percent / 100
+        seen = 0
+        for bound, count in zip(LATENCY_BUCKETS_MS, self.counts):
+            seen += count
+            if seen >= threshold:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def as_dict(self):
+        return {
+            'count': self.count,
+            'mean_ms': round(self.total_ms / self.count, 1) if self.count else None,
+            'p50_ms': self.percentile(50),
+            'p95_ms': self.percentile(95),
+            'max_ms': round(self.max_ms, 1) if self.count else None,
+        }
+
+
+class OperationStats:
+
+    def __init__(self):
+        self.started = 0
+        self.succeeded = 0
+        self.rejected = 0
+        self.errors = 0
+        self.unmatched = 0
+        self.latency = LatencyHistogram()
+
+    def as_dict(self):
+        return {
+            'started': self.started,
+            'succeeded': self.succeeded,
+            'rejected': self.rejected,
+            'errors': self.errors,
+            'unmatched': self.unmatched,
+            'latency': self.latency.as_dict(),
+        }
+
+
+class LogAnalyzer:
+    """Накопительная статистика по потоку строк журнала."""
+
+    def __init__(self):
+        self.lines = 0
+        self.unparsed = 0
+        self.levels = Counter()
+        self.warnings = Counter()
+        self.operations = {}
+        self._pending = {}
+
+    def feed(self, line):
+        self.lines += 1
+        parsed = parse_line(line)
+        if parsed is None:
+            self.unparsed += 1
+            return
+        timestamp, level, message = parsed
+        self.levels[level] += 1
+
+        if message.startswith(RESTART_MESSAGE):
+            # После перезапуска приложения старые старты уже не завершатся
+            for key, pending in self._pending.items():
+                self._operation(key).unmatched += len(pending)
+                pending.clear()
+            return
+
+        match = START_PATTERN.match(message)
+        if match:
+            key = (ACTIONS[match.group(1)], match.group(2))
+            self._operation(key).started += 1
+            pending = self._pending.setdefault(
+                key, deque(maxlen=MAX_PENDING_PER_OPERATION))
+            if len(pending) == pending.maxlen:
+                self._operation(key).unmatched += 1
+            pending.append(timestamp)
+            return
+
+        match = SUCCESS_PATTERN.match(message)
+        if match:
+            key = (ACTIONS[match.group(2)], match.group(1).lower())
+            # Старые версии писали "Service successfully created" и при
+            # создании клиента: без ожидающей услуги это был клиент
+            if key == ('create', 'service') and not self._pending.get(key):
+                key = ('create', 'customer')
+            self._finish(key, timestamp, 'succeeded')
+            return
+
+        if level == 'ERROR':
+            match = ERROR_PATTERN.match(message)
+            if match:
+                if match.group(1):
+                    key = ('create', match.group(1).lower())
+                else:
+                    key = ('update', match.group(2).lower())
+                self._finish(key, timestamp, 'errors')
+            return
+
+        if level == 'WARNING':
+            self._count_warning(warning_type(message))
+            match = ATTEMPT_PATTERN.match(message)
+            if match:
+                entity = ENTITIES.get(match.group(2), match.group(2))
+                self._finish((ACTIONS[match.group(1)], entity), timestamp,
+                             'rejected')
+
+    def _operation(self, key):
+        if key not in self.operations:
+            self.operations[key] = OperationStats()
+        return self.operations[key]
+
+    def _finish(self, key, timestamp, outcome):
+        stats = self._operation(key)
+        pending = self._pending.get(key)
+        # Отбрасываем старты, для которых завершение так и не было записано
+        while pending and (timestamp - pending[0]).total_seconds() > MAX_PENDING_SECONDS:
+            pending.popleft()
+            stats.unmatched += 1
+        if not pending:
+            return
+
+        started_at = pending.popleft()
+        setattr(stats, outcome, getattr(stats, outcome) + 1)
+        if outcome == 'succeeded':
+            stats.latency.add(
+                (timestamp - started_at).total_seconds() * 1000)
+
+    def _count_warning(self, kind):
+        if kind not in self.warnings and len(self.warnings) >= MAX_WARNING_TYPES:
+            kind = OTHER_WARNING_TYPE
+        self.warnings[kind] += 1
+
+    def report(self):
+        operations = {}
+        for key in sorted(self.operations):
+            stats = self.operations[key]
+            pending = self._pending.get(key)
+            result = stats.as_dict()
+            result['unmatched'] += len(pending) if pending else 0
+            operations[' '.join(key)] = result
+        return {
+            'lines': self.lines,
+            'unparsed': self.unparsed,
+            'levels': dict(self.levels),
+            'operations': operations,
+            'warnings': dict(self.warnings.most_common()),
+        }
+
+
+def analyze(paths):
+    analyzer = LogAnalyzer()
+    for line in read_lines(paths):
+        analyzer.feed(line)
+    return analyzer.report()
+
+
+def format_report(report, files):
+    lines = [
+        f"Файлов: {len(files)}, строк: {report['lines']}, "
+        f"не разобрано: {report['unparsed']}",
+        'Уровни: ' + ', '.join(
+            f"{level} {count}" for level, count in sorted(report['levels'].items())),
+        '',
+        'Операции:',
+    ]
+    for name, stats in report['operations'].items():
+        latency = stats['latency']
+        line = (f"  {name}: начато {stats['started']}, успешно {stats['succeeded']}, "
+                f"отклонено {stats['rejected']}, ошибок {stats['errors']}, "
+                f"без пары {stats['unmatched']}")
+        if latency['count']:
+            line += (f"; длительность, мс: среднее {latency['mean_ms']}, "
+                     f"p50 <= {latency['p50_ms']}, p95 <= {latency['p95_ms']}, "
+                     f"макс. {latency['max_ms']}")
+        lines.append(line)
+
+    lines += ['', 'Предупреждения по типам:']
+    lines += [f"  {count:>6}  {kind}" for kind, count in report['warnings'].items()]
+    return '\n'.join(lines)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Сводка по журналам service.log, включая ротированные и .gz')
+    parser.add_argument('paths', nargs='*', default=[LOG_DIR],
+                        help='файлы журнала или каталоги с service.log*')
+    parser.add_argument('--json', action='store_true',
+                        help='вывести сводку в формате JSON')
+    args = parser.parse_args(argv)
+
+    files = []
+    for path in args.paths:
+        files.extend(log_files(path) if os.path.isdir(path) else [path])
+
+    report = analyze(files)
+    if args.json:
+        json.dump(report, sys.stdout, ensure_ascii=False, indent=2)
+        sys.stdout.write('\n')
+    else:
+        print(format_report(report, files))
+
+
+if __name__ == '__main__':
+    main()
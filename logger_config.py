@@ -1,15 +1,179 @@
 import os
+import gzip
+import queue
+import re
+import shutil
+import sys
+import threading
+import time
 import logging
-from logging.handlers import RotatingFileHandler
+from datetime import datetime
+from logging.handlers import BaseRotatingHandler
+
+# Суффикс ротированного сегмента: время ротации и, при совпадении, счётчик
+SEGMENT_SUFFIX_FORMAT = '%Y%m%d-%H%M%S'
+SEGMENT_SUFFIX_PATTERN = r'\d{8}-\d{6}(?:-\d+)?'
+# Номер сегмента, оставшегося от RotatingFileHandler (service.log.1 - новее .2)
+LEGACY_SUFFIX_PATTERN = r'\d+'
+
+
+class CompressingRotatingFileHandler(BaseRotatingHandler):
+    """Файловый журнал с ротацией по размеру и/или времени.
+
+    При ротации текущий файл только переименовывается в сегмент
+    service.log.<время>, это одна быстрая операция в потоке запроса.
+    Сжатие сегмента в .gz и удаление старых сегментов по суммарному
+    размеру и возрасту выполняет фоновый поток.
+    """
+
+    def __init__(self, filename, max_bytes=0, rotate_interval=0,
+                 retention_bytes=0, retention_days=0, encoding='utf-8'):
+        super().__init__(filename, 'a', encoding=encoding, delay=False)
+        self.max_bytes = max_bytes
+        self.rotate_interval = rotate_interval
+        self.retention_bytes = retention_bytes
+        self.retention_days = retention_days
+
+        self.segment_pattern = re.compile(
+            r'^' + re.escape(os.path.basename(self.baseFilename)) +
+            r'\.(' + SEGMENT_SUFFIX_PATTERN + '|' + LEGACY_SUFFIX_PATTERN + r')(\.gz)?$')
+        self.rollover_at = self._next_rollover(
+            os.stat(self.baseFilename).st_mtime)
+
+        self._queue = queue.Queue()
+        self._worker = threading.Thread(
+            target=self._run, name='log-compressor', daemon=True)
+        self._worker.start()
+        # Сегменты, не сжатые до перезапуска, и старые файлы по политике хранения
+        for path in self.segments():
+            if not path.endswith('.gz'):
+                self._queue.put(path)
+        self._queue.put(None)
+
+    def _next_rollover(self, start):
+        if not self.rotate_interval:
+            return None
+        return start + self.rotate_interval
+
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        if self.rollover_at is not None and time.time() >= self.rollover_at:
+            if self.stream.tell() > 0:
+                return True
+            # Пустой файл не ротируем, просто переносим срок
+            self.rollover_at = self._next_rollover(time.time())
+        if self.max_bytes > 0:
+            message = f"{self.format(record)}\n"
+            if self.stream.tell() + len(message.encode(self.encoding or 'utf-8')) >= self.max_bytes:
+                return self.stream.tell() > 0
+        return False
+
+    def doRollover(self):
+        if self.stream:
+            self.stream.close()
+            self.stream = None
+
+        suffix = datetime.now().strftime(SEGMENT_SUFFIX_FORMAT)
+        segment = f"{self.baseFilename}.{suffix}"
+        counter = 0
+        while os.path.exists(segment) or os.path.exists(segment + '.gz'):
+            counter += 1
+            segment = f"{self.baseFilename}.{suffix}-{counter}"
+        os.rename(self.baseFilename, segment)
+
+        self.stream = self._open()
+        self.rollover_at = self._next_rollover(time.time())
+        self._queue.put(segment)
+
+    def segments(self):
+        """Ротированные сегменты журнала, от старых к новым.
+
+        Нумерованные сегменты прежнего RotatingFileHandler считаются
+        старше всех остальных и тоже попадают под политику хранения.
+        """
+        directory = os.path.dirname(self.baseFilename)
+        matches = []
+        for name in os.listdir(directory):
+            match = self.segment_pattern.match(name)
+            if match:
+                matches.append((match.group(1), name))
+        return [os.path.join(directory, name) for _, name in sorted(
+            matches, key=lambda item: _segment_sort_key(item[0]))]
+
+    def flush_background(self):
+        """Ждёт завершения фонового сжатия и очистки."""
+        self._queue.join()
+
+    def close(self):
+        # Даём фоновому потоку дожать уже ротированные сегменты
+        if getattr(self, '_worker', None) is not None and self._worker.is_alive():
+            self._queue.join()
+        super().close()
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            try:
+                if path is not None:
+                    self._compress(path)
+                self._apply_retention()
+            except Exception as e:
+                # Писать в этот же журнал нельзя: ошибка обслуживания файла
+                # могла бы повторяться бесконечно
+                print(f"Log maintenance failed: {e}", file=sys.stderr)
+            finally:
+                self._queue.task_done()
+
+    def _compress(self, path):
+        if not os.path.exists(path):
+            return
+        tmp_path = f"{path}.gz.tmp"
+        with open(path, 'rb') as source, gzip.open(tmp_path, 'wb') as target:
+            shutil.copyfileobj(source, target)
+        # Время сжатого сегмента равно времени исходного: по нему считается возраст
+        stat = os.stat(path)
+        os.utime(tmp_path, (stat.st_atime, stat.st_mtime))
+        os.replace(tmp_path, f"{path}.gz")
+        os.remove(path)
+
+    def _apply_retention(self):
+        segments = self.segments()
+        if self.retention_days:
+            cutoff = time.time() - self.retention_days * 86400
+            for path in list(segments):
+                if os.path.getmtime(path) < cutoff:
+                    os.remove(path)
+                    segments.remove(path)
+        if self.retention_bytes:
+            sizes = [os.path.getsize(path) for path in segments]
+            total = sum(sizes)
+            for path, size in zip(segments, sizes):
+                if total <= self.retention_bytes:
+                    break
+                os.remove(path)
+                total -= size
+
+
+def _segment_sort_key(suffix):
+    if suffix.isdigit():
+        # Старый нумерованный сегмент: больший номер старше
+        return 0, -int(suffix), 0
+    # 20261019-134501 и 20261019-134501-2: сначала время, затем счётчик
+    stamp, _, counter = suffix[:15], suffix[15:16], suffix[16:]
+    return 1, stamp, int(counter or 0)
 
 
 def setup_logger(app):
-    os.makedirs('logs', exist_ok=True)
+    log_file = app.config['LOG_FILE']
+    os.makedirs(os.path.dirname(log_file) or '.', exist_ok=True)
 
-    handler = RotatingFileHandler(
-        'logs/service.log',
-        maxBytes=100000,
-        backupCount=10
+    handler = CompressingRotatingFileHandler(
+        log_file,
+        max_bytes=app.config['LOG_MAX_BYTES'],
+        rotate_interval=app.config['LOG_ROTATE_INTERVAL'],
+        retention_bytes=app.config['LOG_RETENTION_BYTES'],
+        retention_days=app.config['LOG_RETENTION_DAYS']
     )
 
     formatter = logging.Formatter(
@@ -5,13 +5,16 @@ from flask import current_app
 
 from alembic import context
 
+from db_schema import stamp_squashed
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
 
 # Interpret the config file for Python logging.
 # This line sets up loggers basically.
-fileConfig(config.config_file_name)
+# Loggers of the running application (tests, bootstrap) stay enabled.
+fileConfig(config.config_file_name, disable_existing_loggers=False)
 logger = logging.getLogger('alembic.env')
 
 
@@ -94,17 +97,39 @@ def run_migrations_online():
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
 
-    connectable = get_engine()
+    # Соединение может передать вызывающий код (db_schema.alembic_config),
+    # например, чтобы мигрировать отдельную тестовую базу; commit тогда
+    # остаётся за ним
+    connection = config.attributes.get('connection')
+    if connection is not None:
+        restamp_squashed(connection)
+        run_migrations(connection, conf_args)
+        return
+
+    with get_engine().connect() as connection:
+        restamp_squashed(connection)
+        # Иначе Alembic примет начатую проверкой транзакцию за внешнюю
+        # и не зафиксирует миграции
+        connection.commit()
+        run_migrations(connection, conf_args)
+
 
-    with connectable.connect() as connection:
-        context.configure(
-            connection=connection,
-            target_metadata=get_metadata(),
-            **conf_args
-        )
+def restamp_squashed(connection):
+    # Базы, помеченные ревизиями, которые объединены в базовую,
+    # переводятся на неё до поиска текущей ревизии
+    if stamp_squashed(connection):
+        logger.info('Restamped a squashed initial revision as the baseline.')
 
-        with context.begin_transaction():
-            context.run_migrations()
+
+def run_migrations(connection, conf_args):
+    context.configure(
+        connection=connection,
+        target_metadata=get_metadata(),
+        **conf_args
+    )
+
+    with context.begin_transaction():
+        context.run_migrations()
 
 
 if context.is_offline_mode():
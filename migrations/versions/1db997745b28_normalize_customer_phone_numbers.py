@@ -0,0 +1,87 @@
+"""Normalize customer phone numbers
+
+Revision ID: 1db997745b28
+Revises: 824231915883
+Create Date: 2026-10-19 10:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+import re
+
+
+# revision identifiers, used by Alembic.
+revision = '1db997745b28'
+down_revision = '824231915883'
+branch_labels = None
+depends_on = None
+
+naming_convention = {
+    'uq': 'uq_%(table_name)s_%(column_0_name)s',
+}
+
+PHONE_PATTERN = re.compile(r'^(\+7|7|8)?[489][0-9]{9}$')
+
+
+def normalize_phone(phone):
+    # Копия validation.normalize_phone: миграция не должна зависеть
+    # от текущей версии кода приложения
+    phone_clean = re.sub(r'[^\d+]', '', phone or '')
+    if not PHONE_PATTERN.match(phone_clean):
+        return phone
+    return '+7' + re.sub(r'[^\d]', '', phone_clean)[-10:]
+
+
+def upgrade():
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('phone_normalized', sa.String(length=12), nullable=True))
+
+    bind = op.get_bind()
+    rows = bind.execute(
+        sa.text('SELECT id, phone_number FROM customers')).fetchall()
+
+    seen = {}
+    duplicates = []
+    for customer_id, phone_number in rows:
+        phone_normalized = normalize_phone(phone_number)
+        if phone_normalized in seen:
+            duplicates.append((seen[phone_normalized], customer_id))
+        seen[phone_normalized] = customer_id
+
+    if duplicates:
+        raise RuntimeError(
+            'Customers with the same phone number after normalization '
+            f'must be merged before upgrading: {duplicates}')
+
+    if rows:
+        bind.execute(
+            sa.text('UPDATE customers SET phone_normalized = :phone WHERE id = :id'),
+            [{'id': customer_id, 'phone': phone}
+             for phone, customer_id in seen.items()])
+
+    with op.batch_alter_table('customers', schema=None,
+                              naming_convention=naming_convention) as batch_op:
+        batch_op.drop_constraint(
+            'uq_customers_phone_number', type_='unique')
+        batch_op.alter_column('phone_number',
+                              existing_type=sa.String(length=11),
+                              type_=sa.String(length=20),
+                              existing_nullable=False)
+        batch_op.alter_column('phone_normalized',
+                              existing_type=sa.String(length=12),
+                              nullable=False)
+        batch_op.create_index(batch_op.f('ix_customers_phone_normalized'),
+                              ['phone_normalized'], unique=True)
+
+
+def downgrade():
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_customers_phone_normalized'))
+        batch_op.alter_column('phone_number',
+                              existing_type=sa.String(length=20),
+                              type_=sa.String(length=11),
+                              existing_nullable=False)
+        batch_op.create_unique_constraint(
+            'uq_customers_phone_number', ['phone_number'])
+        batch_op.drop_column('phone_normalized')
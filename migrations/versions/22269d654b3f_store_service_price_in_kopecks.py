@@ -0,0 +1,44 @@
+"""Store service price in kopecks
+
+Revision ID: 22269d654b3f
+Revises: 1db997745b28
+Create Date: 2026-10-19 11:03:27.540193
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '22269d654b3f'
+down_revision = '1db997745b28'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('services', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('price_kopecks', sa.BigInteger(), nullable=True))
+
+    op.execute(
+        'UPDATE services SET price_kopecks = CAST(ROUND(price * 100) AS INTEGER)')
+
+    with op.batch_alter_table('services', schema=None) as batch_op:
+        batch_op.alter_column('price_kopecks',
+                              existing_type=sa.BigInteger(),
+                              nullable=False)
+        batch_op.drop_column('price')
+
+
+def downgrade():
+    with op.batch_alter_table('services', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('price', sa.Float(), nullable=True))
+
+    op.execute('UPDATE services SET price = price_kopecks / 100.0')
+
+    with op.batch_alter_table('services', schema=None) as batch_op:
+        batch_op.alter_column('price',
+                              existing_type=sa.Float(),
+                              nullable=False)
+        batch_op.drop_column('price_kopecks')
@@ -0,0 +1,26 @@
+"""Index orders by customer and date
+
+Revision ID: 2f7ce70a8150
+Revises: 22269d654b3f
+Create Date: 2026-10-19 11:41:08.915364
+
+"""
+from alembic import op
+
+
+# revision identifiers, used by Alembic.
+revision = '2f7ce70a8150'
+down_revision = '22269d654b3f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_customer_id_order_date',
+                              ['customer_id', 'order_date'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_customer_id_order_date')
@@ -1,55 +0,0 @@
-"""Initial migration
-
-Revision ID: 3c88fcc3d95d
-Revises: 9462b7c8b441
-Create Date: 2025-10-27 20:24:41.501578
-
-"""
-from alembic import op
-import sqlalchemy as sa
-
-
-# revision identifiers, used by Alembic.
-revision = '3c88fcc3d95d'
-down_revision = '9462b7c8b441'
-branch_labels = None
-depends_on = None
-
-
-def upgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.create_table('customers',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('name', sa.String(length=125), nullable=False),
-    sa.Column('date_of_birth', sa.Date(), nullable=True),
-    sa.Column('phone_number', sa.String(length=11), nullable=False),
-    sa.Column('email', sa.String(length=100), nullable=True),
-    sa.Column('company', sa.String(length=100), nullable=True),
-    sa.PrimaryKeyConstraint('id'),
-    sa.UniqueConstraint('phone_number')
-    )
-    op.create_table('services',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('service_name', sa.String(length=125), nullable=False),
-    sa.Column('description', sa.Text(length=1000), nullable=True),
-    sa.Column('price', sa.Float(), nullable=False),
-    sa.PrimaryKeyConstraint('id')
-    )
-    op.create_table('orders',
-    sa.Column('id', sa.Integer(), nullable=False),
-    sa.Column('customer_id', sa.Integer(), nullable=False),
-    sa.Column('service_id', sa.Integer(), nullable=False),
-    sa.Column('order_date', sa.Date(), nullable=False),
-    sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
-    sa.ForeignKeyConstraint(['service_id'], ['services.id'], ),
-    sa.PrimaryKeyConstraint('id')
-    )
-    # ### end Alembic commands ###
-
-
-def downgrade():
-    # ### commands auto generated by Alembic - please adjust! ###
-    op.drop_table('orders')
-    op.drop_table('services')
-    op.drop_table('customers')
-    # ### end Alembic commands ###
@@ -0,0 +1,70 @@
+"""Add orders archive
+
+Revision ID: 688027bef2ff
+Revises: fefbc254e669
+Create Date: 2026-10-19 14:02:17.640528
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '688027bef2ff'
+down_revision = 'fefbc254e669'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('orders_archive',
+    sa.Column('id', sa.Integer(), autoincrement=False, nullable=False),
+    sa.Column('customer_id', sa.Integer(), nullable=False),
+    sa.Column('order_date', sa.Date(), nullable=False),
+    sa.Column('total_kopecks', sa.BigInteger(), nullable=False),
+    sa.Column('archived_at', sa.DateTime(), nullable=False),
+    sa.Column('deleted_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['customer_id'], ['customers.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.create_index('ix_orders_archive_customer_id_order_date',
+                              ['customer_id', 'order_date'], unique=False)
+
+    op.create_table('order_lines_archive',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('service_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('price_kopecks', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders_archive.id'], ),
+    sa.ForeignKeyConstraint(['service_id'], ['services.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_lines_archive', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_lines_archive_order_id'),
+                              ['order_id'], unique=False)
+        batch_op.create_index('ix_order_lines_archive_service_id_order_id',
+                              ['service_id', 'order_id'], unique=False)
+
+    # AUTOINCREMENT: id перенесённого в архив заказа не выдаётся повторно
+    with op.batch_alter_table('orders', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': True}) as batch_op:
+        pass
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None, recreate='always',
+                              table_kwargs={'sqlite_autoincrement': False}) as batch_op:
+        pass
+
+    with op.batch_alter_table('order_lines_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_lines_archive_service_id_order_id')
+        batch_op.drop_index(batch_op.f('ix_order_lines_archive_order_id'))
+
+    op.drop_table('order_lines_archive')
+
+    with op.batch_alter_table('orders_archive', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_archive_customer_id_order_date')
+
+    op.drop_table('orders_archive')
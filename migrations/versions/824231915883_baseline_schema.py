@@ -1,9 +1,16 @@
-"""Initial migration
+"""Baseline schema
 
 Revision ID: 824231915883
-Revises: 3c88fcc3d95d
+Revises:
 Create Date: 2025-10-27 20:47:27.775393
 
+Заменяет цепочку из 13 одинаковых ревизий "Initial migration"
+(31395e3ad18f ... 824231915883), каждая из которых заново создавала
+customers, services и orders. Идентификатор последней из них сохранён,
+поэтому базы на этой ревизии и новее обновляются как прежде; базы,
+помеченные одной из удалённых ревизий, переводятся на неё автоматически
+(см. db_schema.SQUASHED_REVISIONS).
+
 """
 from alembic import op
 import sqlalchemy as sa
@@ -11,7 +18,7 @@ import sqlalchemy as sa
 
 # revision identifiers, used by Alembic.
 revision = '824231915883'
-down_revision = '3c88fcc3d95d'
+down_revision = None
 branch_labels = None
 depends_on = None
 
@@ -0,0 +1,73 @@
+"""Split orders into order lines
+
+Revision ID: c0e0df879c1f
+Revises: 2f7ce70a8150
+Create Date: 2026-10-19 12:27:52.104736
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c0e0df879c1f'
+down_revision = '2f7ce70a8150'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_lines',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('service_id', sa.Integer(), nullable=False),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('price_kopecks', sa.BigInteger(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['service_id'], ['services.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    with op.batch_alter_table('order_lines', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_order_lines_order_id'),
+                              ['order_id'], unique=False)
+        batch_op.create_index('ix_order_lines_service_id_order_id',
+                              ['service_id', 'order_id'], unique=False)
+
+    # Каждый существующий заказ становится заказом из одной строки
+    # по текущей цене услуги
+    op.execute(
+        'INSERT INTO order_lines (order_id, service_id, quantity, price_kopecks) '
+        'SELECT orders.id, orders.service_id, 1, '
+        'COALESCE(services.price_kopecks, 0) '
+        'FROM orders LEFT JOIN services ON services.id = orders.service_id '
+        'ORDER BY orders.id')
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('service_id')
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('service_id', sa.Integer(), nullable=True))
+
+    # Заказ из нескольких строк сохраняет только первую услугу
+    op.execute(
+        'UPDATE orders SET service_id = ('
+        'SELECT order_lines.service_id FROM order_lines '
+        'WHERE order_lines.order_id = orders.id '
+        'ORDER BY order_lines.id LIMIT 1)')
+    op.execute('DELETE FROM orders WHERE service_id IS NULL')
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.alter_column('service_id',
+                              existing_type=sa.Integer(),
+                              nullable=False)
+        batch_op.create_foreign_key('fk_orders_service_id_services',
+                                    'services', ['service_id'], ['id'])
+
+    with op.batch_alter_table('order_lines', schema=None) as batch_op:
+        batch_op.drop_index('ix_order_lines_service_id_order_id')
+        batch_op.drop_index(batch_op.f('ix_order_lines_order_id'))
+
+    op.drop_table('order_lines')
@@ -0,0 +1,53 @@
+"""Store order totals and index order list filters
+
+Revision ID: fefbc254e669
+Revises: c0e0df879c1f
+Create Date: 2026-10-19 13:05:41.283915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fefbc254e669'
+down_revision = 'c0e0df879c1f'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.add_column(
+            sa.Column('total_kopecks', sa.BigInteger(), nullable=True))
+
+    op.execute(
+        'UPDATE orders SET total_kopecks = ('
+        'SELECT COALESCE(SUM(order_lines.quantity * order_lines.price_kopecks), 0) '
+        'FROM order_lines WHERE order_lines.order_id = orders.id)')
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.alter_column('total_kopecks',
+                              existing_type=sa.BigInteger(),
+                              nullable=False)
+        batch_op.create_index(batch_op.f('ix_orders_order_date'),
+                              ['order_date'], unique=False)
+        batch_op.create_index(batch_op.f('ix_orders_total_kopecks'),
+                              ['total_kopecks'], unique=False)
+        batch_op.create_index('ix_orders_customer_id_total_kopecks',
+                              ['customer_id', 'total_kopecks'], unique=False)
+
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_customers_name'),
+                              ['name'], unique=False)
+
+
+def downgrade():
+    with op.batch_alter_table('customers', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_customers_name'))
+
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_index('ix_orders_customer_id_total_kopecks')
+        batch_op.drop_index(batch_op.f('ix_orders_total_kopecks'))
+        batch_op.drop_index(batch_op.f('ix_orders_order_date'))
+        batch_op.drop_column('total_kopecks')
@@ -1,17 +1,164 @@
+from datetime import datetime
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy.ext.hybrid import hybrid_property
+from sqlalchemy.orm import Session, validates
+from sqlalchemy.orm.attributes import flag_modified
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import Join, UnaryExpression
+from sqlalchemy.sql.operators import custom_op
+from sqlalchemy.sql.util import ClauseAdapter
+from validation import normalize_phone, parse_price, kopecks_to_rubles
 db = SQLAlchemy()
 
+# Ограничение SQLite на число параметров в одном запросе
+LOOKUP_CHUNK = 500
+
+
+def chunked(values, size=LOOKUP_CHUNK):
+    values = list(values)
+    for start in range(0, len(values), size):
+        yield values[start:start + size]
+
 
 class Customer(db.Model):
     __tablename__ = 'customers'
 
     id = db.Column(db.Integer, primary_key=True)
-    name = db.Column(db.String(125), nullable=False)
+    name = db.Column(db.String(125), nullable=False, index=True)
     date_of_birth = db.Column(db.Date)
-    phone_number = db.Column(
-        db.String(11), nullable=False, unique=True)
+    phone_number = db.Column(db.String(20), nullable=False)
+    # Номер в формате E.164 (+7XXXXXXXXXX), по нему проверяется уникальность
+    phone_normalized = db.Column(
+        db.String(12), nullable=False, unique=True, index=True)
     email = db.Column(db.String(100))
     company = db.Column(db.String(100))
+    # У клиентов, добавленных до появления столбца, не заполнено
+    created_at = db.Column(db.DateTime, default=datetime.now, index=True)
+    # Номер версии строки; UPDATE и DELETE через ORM проверяют его и
+    # увеличивают (оптимистическая блокировка)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+
+    @validates('phone_number')
+    def _sync_phone_normalized(self, key, phone_number):
+        self.phone_normalized = normalize_phone(phone_number) or phone_number
+        return phone_number
+
+    @classmethod
+    def find_by_phone(cls, phone_number, exclude_id=None):
+        """Ищет клиента по номеру телефона в любом допустимом формате."""
+        phone_normalized = normalize_phone(phone_number) or phone_number
+        query = cls.query.filter(cls.phone_normalized == phone_normalized)
+        if exclude_id is not None:
+            query = query.filter(cls.id != exclude_id)
+        return query.first()
+
+    @classmethod
+    def existing_phones(cls, phone_numbers):
+        """Возвращает множество уже занятых номеров (в формате E.164).
+
+        Для массовой загрузки: вместо запроса на каждую строку выполняется
+        по одному индексному запросу IN на пачку номеров.
+        """
+        normalized = {normalize_phone(phone) or phone for phone in phone_numbers}
+        normalized = sorted(phone for phone in normalized if phone)
+
+        existing = set()
+        for chunk in chunked(normalized):
+            rows = db.session.query(cls.phone_normalized).filter(
+                cls.phone_normalized.in_(chunk))
+            existing.update(row[0] for row in rows)
+        return existing
+
+    @classmethod
+    def referenced_ids(cls, ids):
+        """id клиентов из ids, у которых есть заказы (текущие или
+        неудалённые архивные).
+
+        Для каждого клиента выполняется проверка EXISTS по индексу
+        (customer_id, order_date): достаточно найти первый заказ, пересчитывать
+        все не нужно.
+        """
+        referenced = set()
+        for chunk in chunked(ids):
+            referenced.update(db.session.scalars(db.select(cls.id).where(
+                cls.id.in_(chunk),
+                db.or_(
+                    db.exists().where(Order.customer_id == cls.id),
+                    db.exists().where(OrderArchive.customer_id == cls.id,
+                                      OrderArchive.deleted_at.is_(None))))))
+        return referenced
+
+    @classmethod
+    def merge(cls, survivor_id, duplicate_ids):
+        """Переносит заказы клиентов duplicate_ids на survivor_id и удаляет
+        дубликаты.
+
+        Заказы переназначаются одним UPDATE на пачку id (и так же архивные),
+        без загрузки в сессию; версия заказов увеличивается. Пары дубликатов
+        в очереди проверки с участием удалённых клиентов закрываются.
+        Возвращает число перенесённых заказов. Commit остаётся за
+        вызывающим кодом.
+        """
+        duplicate_ids = sorted(set(duplicate_ids) - {survivor_id})
+        candidates = DuplicateCandidate.__table__
+        moved = 0
+        for chunk in chunked(duplicate_ids):
+            db.session.execute(
+                db.update(candidates).where(
+                    candidates.c.status == 'pending',
+                    db.or_(candidates.c.customer_id.in_(chunk),
+                           candidates.c.duplicate_id.in_(chunk))).values(
+                    status='merged', reviewed_at=datetime.now()))
+            moved += db.session.execute(
+                db.update(Order).where(Order.customer_id.in_(chunk)).values(
+                    customer_id=survivor_id, version=Order.version + 1),
+                execution_options={'synchronize_session': False}).rowcount
+            moved += db.session.execute(
+                db.update(OrderArchive).where(
+                    OrderArchive.customer_id.in_(chunk)).values(
+                    customer_id=survivor_id),
+                execution_options={'synchronize_session': False}).rowcount
+            db.session.execute(
+                db.delete(cls).where(cls.id.in_(chunk)),
+                execution_options={'synchronize_session': False})
+        return moved
+
+    def order_summary(self, include_archive=False):
+        """Сводка по заказам клиента.
+
+        Всё считается агрегатными запросами по индексу
+        (customer_id, order_date), без обхода self.orders в Python.
+        С include_archive учитываются и архивные заказы.
+        """
+        orders = report_orders(include_archive)
+        lines = report_order_lines(include_archive)
+
+        orders_count, first_order_date, last_order_date, spend_kopecks = \
+            db.session.query(
+                db.func.count(orders.c.id),
+                db.func.min(orders.c.order_date),
+                db.func.max(orders.c.order_date),
+                db.func.coalesce(db.func.sum(orders.c.total_kopecks), 0),
+            ).select_from(orders).filter(
+                orders.c.customer_id == self.id).one()
+
+        quantity = db.func.sum(lines.c.quantity).label('quantity')
+        top_service = db.session.query(Service, quantity).join(
+            lines, lines.c.service_id == Service.id).join(
+            orders, lines.c.order_id == orders.c.id).filter(
+            orders.c.customer_id == self.id).group_by(Service.id).order_by(
+            quantity.desc(), Service.id).first()
+
+        return {
+            'orders_count': orders_count,
+            'lifetime_spend': kopecks_to_rubles(spend_kopecks),
+            'first_order_date': first_order_date,
+            'last_order_date': last_order_date,
+            'top_service': top_service[0] if top_service else None,
+            'top_service_quantity': top_service[1] if top_service else 0,
+        }
 
     def __repr__(self):
         return f'<Customer {self.name} {self.phone_number}>'
@@ -23,18 +170,460 @@ class Service(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     service_name = db.Column(db.String(125), nullable=False)
     description = db.Column(db.Text(1000))
-    price = db.Column(db.Float(), nullable=False, default='0')
+    # Стоимость хранится в копейках: суммы считаются в SQL точно, без float
+    price_kopecks = db.Column(db.BigInteger(), nullable=False, default=0)
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+
+    @classmethod
+    def referenced_ids(cls, ids):
+        """id услуг из ids, которые есть в заказах (текущих или
+        неудалённых архивных). EXISTS по индексу (service_id, order_id).
+        """
+        referenced = set()
+        for chunk in chunked(ids):
+            referenced.update(db.session.scalars(db.select(cls.id).where(
+                cls.id.in_(chunk),
+                db.or_(
+                    db.exists().where(OrderLine.service_id == cls.id),
+                    db.exists().where(
+                        OrderLineArchive.service_id == cls.id,
+                        OrderArchive.id == OrderLineArchive.order_id,
+                        OrderArchive.deleted_at.is_(None))))))
+        return referenced
+
+    @property
+    def price(self):
+        """Стоимость в рублях (Decimal с двумя знаками)."""
+        return kopecks_to_rubles(self.price_kopecks)
+
+    @price.setter
+    def price(self, value):
+        self.price_kopecks = parse_price(value)
+
+
+# Поддерживаемые сортировки списка заказов
+ORDER_SORTS = ('date', 'price', 'customer')
+
+
+class _OrderedJoin(Join):
+    """Внутреннее соединение, порядок таблиц в котором задаётся явно.
+
+    В SQLite CROSS JOIN с условием ON работает как обычный JOIN, но
+    планировщик не переставляет таблицы: левая всегда во внешнем цикле.
+    """
+    inherit_cache = True
+
+
+@compiles(_OrderedJoin, 'sqlite')
+def _compile_ordered_join(join, compiler, **kw):
+    kw['asfrom'] = True
+    return (join.left._compiler_dispatch(compiler, **kw) +
+            ' CROSS JOIN ' +
+            join.right._compiler_dispatch(compiler, **kw) +
+            ' ON ' + join.onclause._compiler_dispatch(compiler, **kw))
+
+
+def _no_index(column):
+    """Выражение +column: SQLite не использует индекс по такому столбцу."""
+    return UnaryExpression(column, operator=custom_op('+'), type_=column.type)
 
 
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        db.Index('ix_orders_customer_id_order_date',
+                 'customer_id', 'order_date'),
+        db.Index('ix_orders_customer_id_total_kopecks',
+                 'customer_id', 'total_kopecks'),
+        # id заказа переходит в orders_archive и не должен выдаваться повторно
+        {'sqlite_autoincrement': True},
+    )
 
     id = db.Column(db.Integer, primary_key=True)
     customer_id = db.Column(db.Integer, db.ForeignKey(
         'customers.id'), nullable=False)
+    order_date = db.Column(db.Date, nullable=False, index=True)
+    # Сумма строк заказа в копейках, поддерживается _update_order_totals
+    total_kopecks = db.Column(db.BigInteger(), nullable=False, default=0,
+                              index=True)
+    # Растёт и при изменении одних только строк заказа
+    version = db.Column(db.Integer, nullable=False, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+
+    customer = db.relationship('Customer', backref='orders')
+    lines = db.relationship('OrderLine', back_populates='order',
+                            cascade='all, delete-orphan',
+                            order_by='OrderLine.id')
+
+    @property
+    def total(self):
+        """Сумма заказа в рублях (по строкам заказа)."""
+        return kopecks_to_rubles(self.total_kopecks)
+
+    @hybrid_property
+    def service_id(self):
+        """Услуга первой строки заказа.
+
+        Оставлено для заказов из одной услуги: Order(service_id=...)
+        создаёт одну строку с количеством 1 по текущей цене услуги.
+        """
+        return self.lines[0].service_id if self.lines else None
+
+    @service_id.inplace.setter
+    def _service_id_setter(self, service_id):
+        self.lines = [OrderLine.for_service(service_id)]
+
+    @service_id.inplace.expression
+    @classmethod
+    def _service_id_expression(cls):
+        return db.select(OrderLine.service_id).where(
+            OrderLine.order_id == cls.id
+        ).order_by(OrderLine.id).limit(1).correlate_except(
+            OrderLine).scalar_subquery()
+
+    @property
+    def service(self):
+        return self.lines[0].service if self.lines else None
+
+    @classmethod
+    def search(cls, date_from=None, date_to=None, customer_id=None,
+               service_id=None, price_min=None, price_max=None,
+               sort='date', descending=True):
+        """Запрос списка заказов с фильтрами и сортировкой.
+
+        Цены передаются в копейках. Каждое сочетание обслуживает один индекс:
+        выбирается индекс под сортировку (с customer_id впереди, если задан
+        клиент), а фильтры по остальным столбцам заказа оборачиваются в
+        унарный плюс, чтобы SQLite не взял их индекс и не сортировал
+        результат во временном B-дереве.
+        """
+        if sort not in ORDER_SORTS:
+            raise ValueError(sort)
+        # У одного клиента сортировка по имени совпадает с сортировкой по дате
+        if customer_id is not None and sort == 'customer':
+            sort = 'date'
+
+        # Столбцы, ограничения по которым может использовать индекс сортировки
+        if sort == 'price':
+            indexed = {'total_kopecks'}
+        else:
+            indexed = {'order_date'}
+
+        def column(name):
+            col = getattr(cls, name)
+            return col if name in indexed else _no_index(col)
+
+        query = cls.query
+        if sort == 'customer':
+            # Внешний цикл по индексу имени клиента, заказы клиента берутся
+            # по индексу (customer_id, order_date) уже в нужном порядке
+            query = query.select_from(_OrderedJoin(
+                Customer, cls, cls.customer_id == Customer.id))
+        if customer_id is not None:
+            query = query.filter(cls.customer_id == customer_id)
+        if date_from is not None:
+            query = query.filter(column('order_date') >= date_from)
+        if date_to is not None:
+            query = query.filter(column('order_date') <= date_to)
+        if price_min is not None:
+            query = query.filter(column('total_kopecks') >= price_min)
+        if price_max is not None:
+            query = query.filter(column('total_kopecks') <= price_max)
+        if service_id is not None:
+            query = query.filter(db.exists().where(
+                OrderLine.service_id == service_id,
+                OrderLine.order_id == cls.id))
+
+        if sort == 'customer':
+            keys = [Customer.name, Customer.id, cls.order_date, cls.id]
+        elif sort == 'price':
+            keys = [cls.total_kopecks, cls.id]
+        else:
+            keys = [cls.order_date, cls.id]
+        return query.order_by(
+            *(key.desc() if descending else key.asc() for key in keys))
+
+    @classmethod
+    def total_revenue(cls, *criterion, include_archive=False):
+        """Сумма заказов в рублях, считается одним запросом SUM в SQL.
+
+        Условия задаются по столбцам Order; с include_archive они
+        применяются и к архивным заказам.
+        """
+        orders = report_orders(include_archive)
+        if orders is not cls.__table__:
+            adapter = ClauseAdapter(orders)
+            criterion = [adapter.traverse(clause) for clause in criterion]
+        total = db.session.query(
+            db.func.coalesce(db.func.sum(orders.c.total_kopecks), 0)
+        ).select_from(orders).filter(*criterion).scalar()
+        return kopecks_to_rubles(total)
+
+
+class OrderLine(db.Model):
+    __tablename__ = 'order_lines'
+    __table_args__ = (
+        db.Index('ix_order_lines_service_id_order_id',
+                 'service_id', 'order_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey(
+        'orders.id'), nullable=False, index=True)
     service_id = db.Column(db.Integer, db.ForeignKey(
         'services.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    # Цена за единицу на момент оформления заказа, в копейках
+    price_kopecks = db.Column(db.BigInteger(), nullable=False, default=0)
+
+    order = db.relationship('Order', back_populates='lines')
+    service = db.relationship('Service', backref='order_lines')
+
+    @hybrid_property
+    def amount_kopecks(self):
+        return self.quantity * self.price_kopecks
+
+    @property
+    def price(self):
+        return kopecks_to_rubles(self.price_kopecks)
+
+    @property
+    def amount(self):
+        return kopecks_to_rubles(self.amount_kopecks)
+
+    @classmethod
+    def for_service(cls, service_id, quantity=1, price_kopecks=None):
+        """Строка заказа по текущей цене услуги, если цена не передана."""
+        if price_kopecks is None:
+            service = db.session.get(Service, service_id)
+            price_kopecks = service.price_kopecks if service else 0
+        return cls(service_id=service_id, quantity=quantity,
+                   price_kopecks=price_kopecks)
+
+
+class OrderArchive(db.Model):
+    """Заказ, перенесённый из orders: устаревший или удалённый пользователем.
+
+    id совпадает с id исходного заказа.
+    """
+    __tablename__ = 'orders_archive'
+    __table_args__ = (
+        db.Index('ix_orders_archive_customer_id_order_date',
+                 'customer_id', 'order_date'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True, autoincrement=False)
+    customer_id = db.Column(db.Integer, db.ForeignKey(
+        'customers.id'), nullable=False)
     order_date = db.Column(db.Date, nullable=False)
+    total_kopecks = db.Column(db.BigInteger(), nullable=False, default=0)
+    archived_at = db.Column(db.DateTime, nullable=False)
+    # Заполняется при удалении заказа; такие заказы не попадают в отчёты
+    deleted_at = db.Column(db.DateTime)
 
-    customer = db.relationship('Customer', backref='orders')
-    service = db.relationship('Service', backref='orders')
+    customer = db.relationship('Customer')
+    lines = db.relationship('OrderLineArchive', back_populates='order',
+                            cascade='all, delete-orphan',
+                            order_by='OrderLineArchive.id')
+
+    @property
+    def total(self):
+        return kopecks_to_rubles(self.total_kopecks)
+
+
+class OrderLineArchive(db.Model):
+    __tablename__ = 'order_lines_archive'
+    __table_args__ = (
+        db.Index('ix_order_lines_archive_service_id_order_id',
+                 'service_id', 'order_id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey(
+        'orders_archive.id'), nullable=False, index=True)
+    service_id = db.Column(db.Integer, db.ForeignKey(
+        'services.id'), nullable=False)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    price_kopecks = db.Column(db.BigInteger(), nullable=False, default=0)
+
+    order = db.relationship('OrderArchive', back_populates='lines')
+    service = db.relationship('Service')
+
+
+class IdempotencyKey(db.Model):
+    """Ключ идемпотентности: результат уже выполненной отправки формы или
+    запроса API. Хранится до expires_at.
+    """
+    __tablename__ = 'idempotency_keys'
+
+    endpoint = db.Column(db.String(64), primary_key=True)
+    key = db.Column(db.String(128), primary_key=True)
+    # SHA-256 полей запроса: тот же ключ с другими данными - ошибка клиента
+    request_hash = db.Column(db.String(64), nullable=False)
+    entity_id = db.Column(db.Integer, nullable=False)
+    created_at = db.Column(db.DateTime, nullable=False)
+    expires_at = db.Column(db.DateTime, nullable=False, index=True)
+
+
+JOB_STATUSES = ('queued', 'running', 'done', 'failed', 'cancelled')
+JOB_FINISHED_STATUSES = ('done', 'failed', 'cancelled')
+
+
+class Job(db.Model):
+    """Фоновая задача: выгрузка, импорт, отчёт, перенос в архив.
+
+    Выполняется процессом-обработчиком (flask jobs-worker), а не
+    обработчиком запроса. Состояние и прогресс хранятся в самой таблице.
+    """
+    __tablename__ = 'jobs'
+    __table_args__ = (
+        # Очередь: следующая задача берётся по (status, id)
+        db.Index('ix_jobs_status_id', 'status', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(64), nullable=False)
+    params = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(16), nullable=False, default='queued')
+    progress = db.Column(db.Integer, nullable=False, default=0)
+    # Объём работы, если он известен заранее
+    total = db.Column(db.Integer)
+    result = db.Column(db.JSON)
+    error = db.Column(db.Text)
+    cancel_requested = db.Column(db.Boolean, nullable=False, default=False)
+    worker = db.Column(db.String(64))
+    created_at = db.Column(db.DateTime, nullable=False)
+    started_at = db.Column(db.DateTime)
+    finished_at = db.Column(db.DateTime)
+    # Обновляется при каждом отчёте о прогрессе; по нему находят задачи
+    # упавших обработчиков
+    heartbeat_at = db.Column(db.DateTime)
+
+    @property
+    def finished(self):
+        return self.status in JOB_FINISHED_STATUSES
+
+    def as_dict(self):
+        return {
+            'id': self.id,
+            'kind': self.kind,
+            'params': self.params,
+            'status': self.status,
+            'progress': self.progress,
+            'total': self.total,
+            'percent': round(self.progress * 100 / self.total, 1)
+            if self.total else None,
+            'result': self.result,
+            'error': self.error,
+            'cancel_requested': self.cancel_requested,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'started_at': self.started_at.isoformat() if self.started_at else None,
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None,
+        }
+
+
+DUPLICATE_STATUSES = ('pending', 'merged', 'dismissed')
+
+
+class DuplicateCandidate(db.Model):
+    """Пара клиентов, похожих на дубликаты, в очереди на проверку.
+
+    Пары находит задача dedup_customers; оператор объединяет клиентов
+    или отмечает пару как разных людей. customer_id всегда меньше
+    duplicate_id. Ссылки на клиентов без внешнего ключа: после
+    объединения или удаления клиента строка остаётся в истории.
+    """
+    __tablename__ = 'duplicate_candidates'
+    __table_args__ = (
+        db.UniqueConstraint('customer_id', 'duplicate_id'),
+        # Очередь проверки: сначала самые похожие пары
+        db.Index('ix_duplicate_candidates_status_score', 'status', 'score'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    customer_id = db.Column(db.Integer, nullable=False)
+    duplicate_id = db.Column(db.Integer, nullable=False, index=True)
+    score = db.Column(db.Float, nullable=False)
+    # Чем пара похожа: сходство имён и компаний, совпавшие email и телефон
+    reasons = db.Column(db.JSON, nullable=False, default=dict)
+    status = db.Column(db.String(16), nullable=False, default='pending')
+    job_id = db.Column(db.Integer)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.now)
+    reviewed_at = db.Column(db.DateTime)
+
+    customer = db.relationship(
+        'Customer', primaryjoin='foreign(DuplicateCandidate.customer_id) == Customer.id',
+        viewonly=True)
+    duplicate = db.relationship(
+        'Customer', primaryjoin='foreign(DuplicateCandidate.duplicate_id) == Customer.id',
+        viewonly=True)
+
+
+def report_orders(include_archive=False):
+    """Источник заказов для отчётов.
+
+    Без include_archive это сама таблица orders, иначе UNION ALL с
+    неудалёнными заказами из архива. Столбцы: id, customer_id,
+    order_date, total_kopecks.
+    """
+    orders = Order.__table__
+    if not include_archive:
+        return orders
+    columns = ('id', 'customer_id', 'order_date', 'total_kopecks')
+    archive = OrderArchive.__table__
+    return db.union_all(
+        db.select(*(orders.c[name] for name in columns)),
+        db.select(*(archive.c[name] for name in columns)).where(
+            archive.c.deleted_at.is_(None)),
+    ).subquery('report_orders')
+
+
+def report_order_lines(include_archive=False):
+    """Источник строк заказов для отчётов, по тем же правилам, что и
+    report_orders. Столбцы: order_id, service_id, quantity, price_kopecks.
+    """
+    lines = OrderLine.__table__
+    if not include_archive:
+        return lines
+    columns = ('order_id', 'service_id', 'quantity', 'price_kopecks')
+    archive = OrderLineArchive.__table__
+    archive_orders = OrderArchive.__table__
+    return db.union_all(
+        db.select(*(lines.c[name] for name in columns)),
+        db.select(*(archive.c[name] for name in columns)).join(
+            archive_orders, archive_orders.c.id == archive.c.order_id).where(
+            archive_orders.c.deleted_at.is_(None)),
+    ).subquery('report_order_lines')
+
+
+@db.event.listens_for(Session, 'before_flush')
+def _update_order_totals(session, flush_context, instances):
+    """Пересчитывает orders.total_kopecks для заказов с изменёнными строками.
+
+    Сумма хранится в шапке заказа, чтобы фильтр и сортировка по сумме
+    в списке заказов шли по индексу. Массовые UPDATE в обход ORM должны
+    обновлять total_kopecks сами.
+
+    Заказ с изменёнными строками сохраняется с новой версией, даже если
+    сумма не изменилась.
+    """
+    orders = set()
+    dirty = [obj for obj in session.dirty if session.is_modified(obj)]
+    for obj in list(session.new) + dirty + list(session.deleted):
+        if isinstance(obj, Order):
+            orders.add(obj)
+        elif isinstance(obj, OrderLine) and obj.order is not None:
+            orders.add(obj.order)
+
+    for order in orders:
+        if order in session.deleted:
+            continue
+        order.total_kopecks = sum(
+            (line.quantity if line.quantity is not None else 1) *
+            (line.price_kopecks or 0)
+            for line in order.lines if line not in session.deleted)
+        if order not in session.new:
+            flag_modified(order, 'total_kopecks')
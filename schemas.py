@@ -0,0 +1,294 @@
+from collections import namedtuple
+from models import db, chunked, Customer, Service
+from validation import (ReferenceDates, is_empty_field,
+                        normalize_phone, validate_phones,
+                        validate_birth_dates, validate_order_dates,
+                        validate_prices, REQUIRED, INVALID_PHONE,
+                        BIRTH_DATE_MESSAGES, ORDER_DATE_MESSAGES,
+                        PRICE_MESSAGES, INVALID_DATE, FUTURE_DATE,
+                        TOO_EARLY_DATE, UNDERAGE, INVALID_PRICE,
+                        NEGATIVE_PRICE)
+
+
+# Коды ошибок, которые проверяются по базе данных
+NOT_FOUND = 'not_found'
+ALREADY_EXISTS = 'already_exists'
+INVALID_QUANTITY = 'invalid_quantity'
+
+MAX_QUANTITY = 10000
+
+FieldError = namedtuple('FieldError', 'field code message log_message')
+
+
+class Field:
+    """Поле формы: проверка одного значения и столбца значений.
+
+    messages и log_messages сопоставляют код ошибки с текстом для
+    пользователя и с фрагментом строки журнала. instance_id - id
+    редактируемой записи (None при создании).
+    """
+    messages = {}
+    log_messages = {}
+
+    def __init__(self, name, label=None, required=True, messages=None,
+                 log_messages=None):
+        self.name = name
+        self.required = required
+        self.messages = dict(self.messages)
+        self.log_messages = dict(self.log_messages)
+        if label:
+            self.messages.setdefault(
+                REQUIRED, f"Поле \"{label}\" обязательно для заполнения")
+        self.log_messages.setdefault(
+            REQUIRED, f"an empty {name.replace('_', ' ')} field")
+        self.messages.update(messages or {})
+        self.log_messages.update(log_messages or {})
+
+    def check(self, value, refs, instance_id=None):
+        if self.required and is_empty_field(value):
+            return REQUIRED
+        return None
+
+    def check_many(self, values, refs):
+        return [self.check(value, refs) for value in values]
+
+    def error(self, code):
+        return FieldError(self.name, code, self.messages[code],
+                          self.log_messages[code])
+
+
+class PhoneField(Field):
+    messages = {
+        INVALID_PHONE: "Неверный формат номера телефона. Используйте российский формат",
+        ALREADY_EXISTS: "Клиент с таким номером телефона уже существует",
+    }
+    log_messages = {
+        INVALID_PHONE: "an invalid phone number format",
+        ALREADY_EXISTS: "an existing phone number in the database",
+    }
+
+    def check(self, value, refs, instance_id=None):
+        return validate_phones([value])[0]
+
+    def check_many(self, values, refs):
+        return validate_phones(values)
+
+
+class UniquePhoneField(PhoneField):
+    """Номер телефона, который не должен совпадать с номером другого клиента.
+
+    Сравнение идёт по нормализованному номеру через индекс phone_normalized.
+    """
+
+    def check(self, value, refs, instance_id=None):
+        code = super().check(value, refs)
+        if code is None and Customer.find_by_phone(value, exclude_id=instance_id):
+            return ALREADY_EXISTS
+        return code
+
+    def check_many(self, values, refs):
+        codes = super().check_many(values, refs)
+        existing = Customer.existing_phones(
+            value for value, code in zip(values, codes) if code is None)
+
+        seen = set()
+        for index, (value, code) in enumerate(zip(values, codes)):
+            if code is not None:
+                continue
+            phone = normalize_phone(value)
+            if phone in existing or phone in seen:
+                codes[index] = ALREADY_EXISTS
+            seen.add(phone)
+        return codes
+
+
+class BirthDateField(Field):
+    messages = BIRTH_DATE_MESSAGES
+    log_messages = {
+        REQUIRED: "an empty date of birth",
+        INVALID_DATE: "an invalid date of birth. Message: invalid format",
+        FUTURE_DATE: "an invalid date of birth. Message: future date",
+        TOO_EARLY_DATE: "an invalid date of birth. Message: too early",
+        UNDERAGE: "an invalid date of birth. Message: underage",
+    }
+
+    def check(self, value, refs, instance_id=None):
+        return validate_birth_dates([value], today=refs.today)[0]
+
+    def check_many(self, values, refs):
+        return validate_birth_dates(values, today=refs.today)
+
+
+class OrderDateField(Field):
+    messages = ORDER_DATE_MESSAGES
+    log_messages = {
+        INVALID_DATE: "invalid date of order. Message: invalid format",
+        FUTURE_DATE: "invalid date of order. Message: future date",
+    }
+
+    def __init__(self, name, **kwargs):
+        super().__init__(name, required=False, **kwargs)
+
+    def check(self, value, refs, instance_id=None):
+        return validate_order_dates([value], today=refs.today)[0]
+
+    def check_many(self, values, refs):
+        return validate_order_dates(values, today=refs.today)
+
+
+class PriceField(Field):
+    messages = PRICE_MESSAGES
+    log_messages = {
+        INVALID_PRICE: "an invalid price format",
+        NEGATIVE_PRICE: "a negative price",
+    }
+
+    def check(self, value, refs, instance_id=None):
+        return validate_prices([value])[0]
+
+    def check_many(self, values, refs):
+        return validate_prices(values)
+
+
+class QuantityField(Field):
+    """Количество в строке заказа: целое от 1 до MAX_QUANTITY, по умолчанию 1."""
+    messages = {
+        INVALID_QUANTITY: f"Количество должно быть целым числом от 1 до {MAX_QUANTITY}",
+    }
+    log_messages = {
+        INVALID_QUANTITY: "an invalid quantity",
+    }
+
+    def __init__(self, name, **kwargs):
+        super().__init__(name, required=False, **kwargs)
+
+    def check(self, value, refs, instance_id=None):
+        if is_empty_field(value):
+            return None
+        try:
+            quantity = int(value)
+        except (TypeError, ValueError):
+            return INVALID_QUANTITY
+        if not 1 <= quantity <= MAX_QUANTITY:
+            return INVALID_QUANTITY
+        return None
+
+
+class ReferenceField(Field):
+    """Идентификатор существующей записи модели model."""
+
+    def __init__(self, name, model, **kwargs):
+        super().__init__(name, **kwargs)
+        self.model = model
+        self.log_messages.setdefault(
+            NOT_FOUND, f"non-existent {model.__name__.lower()}")
+
+    @staticmethod
+    def _as_id(value):
+        try:
+            return int(value)
+        except (TypeError, ValueError):
+            return None
+
+    def check(self, value, refs, instance_id=None):
+        code = super().check(value, refs)
+        if code is not None:
+            return code
+        record_id = self._as_id(value)
+        if record_id is None or db.session.get(self.model, record_id) is None:
+            return NOT_FOUND
+        return None
+
+    def check_many(self, values, refs):
+        codes = super().check_many(values, refs)
+        ids = sorted({self._as_id(value) for value, code in zip(values, codes)
+                      if code is None} - {None})
+
+        existing = set()
+        for chunk in chunked(ids):
+            rows = db.session.query(self.model.id).filter(
+                self.model.id.in_(chunk))
+            existing.update(row[0] for row in rows)
+
+        return [code if code is not None
+                else None if self._as_id(value) in existing
+                else NOT_FOUND
+                for value, code in zip(values, codes)]
+
+
+class Schema:
+    """Набор полей формы, проверяемых за один проход.
+
+    Одна и та же схема используется для HTML-форм (request.form), JSON
+    (request.get_json()) и массовой загрузки (validate_many).
+    """
+    fields = ()
+
+    def validate(self, data, instance_id=None, refs=None):
+        """Проверяет одну запись и возвращает список всех ошибок."""
+        refs = refs or ReferenceDates()
+        errors = []
+        for field in self.fields:
+            code = field.check(data.get(field.name), refs,
+                               instance_id=instance_id)
+            if code is not None:
+                errors.append(field.error(code))
+        return errors
+
+    def validate_many(self, rows, today=None):
+        """Проверяет пачку записей по столбцам.
+
+        Возвращает список ошибок для каждой строки в исходном порядке.
+        """
+        refs = ReferenceDates(today)
+        errors = [[] for _ in rows]
+        for field in self.fields:
+            values = [row.get(field.name) for row in rows]
+            for row_errors, code in zip(errors, field.check_many(values, refs)):
+                if code is not None:
+                    row_errors.append(field.error(code))
+        return errors
+
+
+class CustomerSchema(Schema):
+    fields = (
+        Field('name', label='ФИО'),
+        UniquePhoneField('phone_number', label='Номер телефона'),
+        BirthDateField('date_of_birth'),
+        Field('email', required=False),
+        Field('company', required=False),
+    )
+
+
+class ServiceSchema(Schema):
+    fields = (
+        Field('service_name', label='Название услуги'),
+        Field('description', label='Описание услуги'),
+        PriceField('price', label='Стоимость услуги'),
+    )
+
+
+class OrderSchema(Schema):
+    fields = (
+        ReferenceField('customer_id', Customer, messages={
+            REQUIRED: "Пожалуйста, выберите клиента",
+            NOT_FOUND: "Выбранный клиент не существует в базе данных",
+        }),
+        OrderDateField('order_date'),
+    )
+
+
+class OrderLineSchema(Schema):
+    fields = (
+        ReferenceField('service_id', Service, messages={
+            REQUIRED: "Пожалуйста, выберите услугу",
+            NOT_FOUND: "Выбранная услуга не существует в базе данных",
+        }),
+        QuantityField('quantity'),
+    )
+
+
+customer_schema = CustomerSchema()
+service_schema = ServiceSchema()
+order_schema = OrderSchema()
+order_line_schema = OrderLineSchema()
@@ -0,0 +1,35 @@
+import os
+
+from jinja2 import FileSystemBytecodeCache
+
+
+def setup_template_cache(app):
+    """Хранит скомпилированные шаблоны Jinja на диске.
+
+    Новый процесс берёт готовый байткод вместо компиляции каждого шаблона
+    при первом запросе. Запись в кеше сверяется с исходником по контрольной
+    сумме, поэтому изменённый шаблон просто перекомпилируется. Пустой
+    TEMPLATE_CACHE_DIR отключает кеш.
+
+    Без TEMPLATES_AUTO_RELOAD Jinja не проверяет время изменения файла
+    шаблона при каждом рендеринге.
+    """
+    app.jinja_env.auto_reload = app.config['TEMPLATES_AUTO_RELOAD']
+    directory = app.config['TEMPLATE_CACHE_DIR']
+    if not directory:
+        return None
+    os.makedirs(directory, exist_ok=True)
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache(directory)
+    return app.jinja_env.bytecode_cache
+
+
+def precompile_templates(app):
+    """Компилирует все шаблоны приложения (и наполняет кеш байткода).
+
+    Возвращает имена шаблонов; ошибка синтаксиса в любом из них
+    выбрасывается сразу, то есть при сборке, а не на первом запросе.
+    """
+    names = sorted(app.jinja_env.list_templates(extensions=['html']))
+    for name in names:
+        app.jinja_env.get_template(name)
+    return names
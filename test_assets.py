@@ -0,0 +1,145 @@
+import gzip
+import os
+import random
+import shutil
+import tempfile
+import unittest
+from flask import Flask, render_template_string
+import assets
+from assets import build_assets, content_hash, setup_assets
+
+CSS = '.header_img { max-height: 50px; }\n' * 40
+
+
+class TestAssets(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.static = os.path.join(self.tmp.name, 'static')
+        os.makedirs(os.path.join(self.static, 'css'))
+        os.makedirs(os.path.join(self.static, 'img'))
+        with open(os.path.join(self.static, 'css', 'main.css'), 'w') as css:
+            css.write(CSS)
+        shutil.copy(os.path.join('static', 'img', 'edit_pen.png'),
+                    os.path.join(self.static, 'img', 'edit_pen.png'))
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_png(self, name, width, height):
+        # Градиент с шумом: PNG сжимает его плохо, как фотографию
+        noise = random.Random(0)
+        image = assets.Image.new('RGB', (width, height))
+        image.putdata([(x * 255 // width, y * 255 // height, noise.randrange(256))
+                       for y in range(height) for x in range(width)])
+        image.save(os.path.join(self.static, 'img', name), format='PNG')
+
+    def make_app(self):
+        app = Flask(__name__, static_folder=self.static)
+        app.config['ASSETS_MAX_AGE'] = 31536000
+        setup_assets(app)
+        return app
+
+    def test_build_assets(self):
+        manifest = build_assets(self.static)
+
+        entry = manifest['css/main.css']
+        self.assertEqual(entry['file'],
+                         f"css/main.{content_hash(CSS.encode())}.css")
+        self.assertTrue(entry['gzip'])
+        dist = os.path.join(self.static, 'dist')
+        with gzip.open(os.path.join(dist, entry['file'] + '.gz'), 'rt') as compressed:
+            self.assertEqual(compressed.read(), CSS)
+        self.assertIn('img/edit_pen.png', manifest)
+        self.assertTrue(os.path.exists(os.path.join(dist, 'manifest.json')))
+
+        # Повторная сборка не собирает саму себя
+        self.assertEqual(build_assets(self.static).keys(), manifest.keys())
+
+    def test_serve_built_assets(self):
+        manifest = build_assets(self.static)
+        app = self.make_app()
+        client = app.test_client()
+
+        with app.test_request_context():
+            url = render_template_string("{{ asset_url('css/main.css') }}")
+        self.assertEqual(url, '/assets/' + manifest['css/main.css']['file'])
+
+        response = client.get(url, headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.headers['Cache-Control'],
+                         'public, max-age=31536000, immutable')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(gzip.decompress(response.data).decode(), CSS)
+        response.close()
+
+        response = client.get(url)
+        self.assertNotIn('Content-Encoding', response.headers)
+        self.assertEqual(response.get_data(as_text=True), CSS)
+        response.close()
+
+        # q=0 запрещает кодировку
+        response = client.get(url, headers={'Accept-Encoding': 'gzip;q=0'})
+        self.assertNotIn('Content-Encoding', response.headers)
+        response.close()
+
+        self.assertEqual(client.get('/assets/css/main.css').status_code, 404)
+        self.assertEqual(client.get('/assets/manifest.json').status_code, 404)
+
+    @unittest.skipIf(assets.Image is None, "Pillow не установлен")
+    def test_build_images(self):
+        self.write_png('banner.png', 400, 100)
+        with open(os.path.join(self.static, 'img', 'banner.png'), 'rb') as original:
+            original_size = len(original.read())
+
+        manifest = build_assets(self.static, image_max_width=200)
+
+        entry = manifest['img/banner.png']
+        dist = os.path.join(self.static, 'dist')
+        self.assertLess(entry['size'], original_size)
+        with assets.Image.open(os.path.join(dist, entry['file'])) as resized:
+            self.assertEqual(resized.size, (200, 50))
+        self.assertRegex(entry['webp'], r'^img/banner\.[0-9a-f]{12}\.webp$')
+        with assets.Image.open(os.path.join(dist, entry['webp'])) as webp:
+            self.assertEqual((webp.format, webp.size), ('WEBP', (200, 50)))
+        # Изображения не сжимаются повторно
+        self.assertNotIn('gzip', entry)
+
+        app = self.make_app()
+        with app.test_request_context():
+            html = render_template_string(
+                "{% from 'macros.html' import picture %}"
+                "{{ picture('img/banner.png', 'header_img', 'Баннер') }}")
+            self.assertIn(f'<source srcset="/assets/{entry["webp"]}" type="image/webp">', html)
+            self.assertIn(f'<img class="header_img" src="/assets/{entry["file"]}" alt="Баннер">', html)
+            # Без WebP-варианта остаётся только img
+            self.assertNotIn('<source', render_template_string(
+                "{% from 'macros.html' import picture %}"
+                "{{ picture('css/main.css', '', '') }}"))
+
+        response = app.test_client().get(f'/assets/{entry["webp"]}')
+        self.assertEqual(response.mimetype, 'image/webp')
+        response.close()
+
+    @unittest.skipIf(assets.brotli is None, "brotli не установлен")
+    def test_build_brotli(self):
+        entry = build_assets(self.static)['css/main.css']
+        self.assertTrue(entry['br'])
+        app = self.make_app()
+        response = app.test_client().get(f'/assets/{entry["file"]}',
+                                         headers={'Accept-Encoding': 'gzip, br'})
+        self.assertEqual(response.headers['Content-Encoding'], 'br')
+        self.assertEqual(assets.brotli.decompress(response.data).decode(), CSS)
+        response.close()
+
+    def test_fallback_without_build(self):
+        app = self.make_app()
+        with app.test_request_context():
+            self.assertEqual(
+                render_template_string("{{ asset_url('css/main.css') }}"),
+                '/static/css/main.css')
+
+
+if __name__ == '__main__':
+    unittest.main()
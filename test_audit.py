@@ -0,0 +1,68 @@
+import json
+import os
+import tempfile
+import unittest
+from datetime import date
+from decimal import Decimal
+from audit import AuditWriter, diff
+
+
+class TestAudit(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.writer = AuditWriter(self.tmp.name, max_bytes=300)
+
+    def tearDown(self):
+        self.writer.close()
+        self.tmp.cleanup()
+
+    def read_records(self):
+        records = []
+        for path in self.writer.segments():
+            with open(path, encoding='utf-8') as segment:
+                records.extend(json.loads(line) for line in segment)
+        return records
+
+    def test_diff(self):
+        self.assertEqual(
+            diff({'name': 'Иван', 'price': 1}, {'name': 'Пётр', 'price': 1}),
+            {'name': ['Иван', 'Пётр']})
+        self.assertEqual(diff(None, {'id': 1}), {'id': [None, 1]})
+        self.assertEqual(diff({'id': 1}, None), {'id': [1, None]})
+
+    def test_write_and_rollover(self):
+        for number in range(10):
+            self.writer.write('service', number, 'update',
+                              before={'price': Decimal('1.50')},
+                              after={'price': Decimal('2.00'),
+                                     'date': date(2024, 1, number + 1)},
+                              request_id='req-1')
+            # Сегмент переключается между пачками, поэтому ждём каждую
+            self.writer.flush()
+
+        records = self.read_records()
+        self.assertEqual([record['entity_id'] for record in records],
+                         list(range(10)))
+        self.assertEqual(records[0]['changes'], {
+            'date': [None, '2024-01-01'], 'price': ['1.50', '2.00']})
+        self.assertEqual(records[0]['request_id'], 'req-1')
+        self.assertGreater(len(self.writer.segments()), 1)
+
+    def test_continue_last_segment(self):
+        self.writer.write('customer', 1, 'create', after={'id': 1})
+        self.writer.close()
+
+        writer = AuditWriter(self.tmp.name, max_bytes=300)
+        writer.write('customer', 1, 'delete', before={'id': 1})
+        writer.close()
+
+        self.assertEqual(
+            [os.path.basename(path) for path in writer.segments()],
+            ['audit-000001.jsonl'])
+        self.assertEqual([record['action'] for record in self.read_records()],
+                         ['create', 'delete'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import gzip
+import unittest
+import zlib
+from flask import Flask, Response, jsonify, send_file
+from compression import setup_compression
+
+PAGE = '<p>Реклама в соцсетях</p>\n' * 100
+
+
+def make_app(**config):
+    app = Flask(__name__)
+    app.config.update(dict(COMPRESS_ENABLED=True, COMPRESS_MIN_SIZE=500,
+                           COMPRESS_LEVEL=6), **config)
+    setup_compression(app)
+
+    @app.route('/page')
+    def page():
+        return PAGE
+
+    @app.route('/small')
+    def small():
+        return '<p>ok</p>'
+
+    @app.route('/json')
+    def json_view():
+        return jsonify(items=[{'id': i, 'name': 'Иванов'} for i in range(100)])
+
+    @app.route('/export')
+    def export():
+        def rows():
+            yield 'id;name\n'
+            for i in range(200):
+                yield f'{i};Иванов\n'
+        return Response(rows(), mimetype='text/csv')
+
+    @app.route('/file')
+    def file():
+        return send_file(__file__, mimetype='text/html')
+
+    return app
+
+
+class TestCompression(unittest.TestCase):
+
+    def setUp(self):
+        self.client = make_app().test_client()
+
+    def get(self, path, encoding='gzip, deflate'):
+        return self.client.get(path, headers={'Accept-Encoding': encoding})
+
+    def test_compresses_html_and_json(self):
+        response = self.get('/page')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn('Accept-Encoding', response.headers['Vary'])
+        self.assertEqual(int(response.headers['Content-Length']), len(response.data))
+        self.assertEqual(gzip.decompress(response.data).decode(), PAGE)
+
+        response = self.get('/json')
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertIn(b'"items"', gzip.decompress(response.data))
+
+    def test_passes_through(self):
+        for path, encoding in (('/page', ''), ('/page', 'gzip;q=0, br'),
+                               ('/small', 'gzip'), ('/file', 'gzip')):
+            with self.subTest(path=path, encoding=encoding):
+                response = self.get(path, encoding)
+                self.assertNotIn('Content-Encoding', response.headers)
+                response.close()
+
+        self.assertEqual(self.get('/page', '').get_data(as_text=True), PAGE)
+
+    def test_streamed_response_is_compressed_in_chunks(self):
+        response = self.client.get('/export', buffered=False,
+                                   headers={'Accept-Encoding': 'gzip'})
+        self.assertEqual(response.headers['Content-Encoding'], 'gzip')
+        self.assertNotIn('Content-Length', response.headers)
+
+        # Каждая часть распаковывается сразу, без ожидания конца потока
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        chunks = iter(response.response)
+        self.assertEqual(decompressor.decompress(next(chunks)), 'id;name\n'.encode())
+        rest = b''.join(decompressor.decompress(chunk) for chunk in chunks)
+        self.assertTrue(rest.decode().endswith('199;Иванов\n'))
+        response.close()
+
+    def test_disabled_by_default(self):
+        client = make_app(COMPRESS_ENABLED=False).test_client()
+        response = client.get('/page', headers={'Accept-Encoding': 'gzip'})
+        self.assertNotIn('Content-Encoding', response.headers)
+
+
+if __name__ == '__main__':
+    unittest.main()
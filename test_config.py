@@ -0,0 +1,79 @@
+import json
+import os
+import tempfile
+import unittest
+from config import ConfigError, load_settings
+
+
+class TestConfig(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'config.json')
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_config(self, data):
+        with open(self.path, 'w') as config_file:
+            json.dump(data, config_file)
+
+    def test_defaults_without_file(self):
+        settings = load_settings(self.path, env={})
+
+        self.assertEqual(settings['PER_PAGE_ORDERS'], 10)
+        self.assertEqual(settings['HOST'], '127.0.0.1')
+        self.assertEqual(settings['LOG_LEVEL'], 'INFO')
+
+    def test_layers(self):
+        self.write_config({'PER_PAGE_ORDERS': 20, 'PORT': 9000})
+
+        settings = load_settings(self.path, env={
+            'PORT': '9100',
+            'DB_POOL_TIMEOUT': '2.5',
+            'SQLALCHEMY_TRACK_MODIFICATIONS': 'no',
+            'DATABASE_URL': 'sqlite:///other.db',
+            'PATH': '/usr/bin',
+        })
+
+        self.assertEqual(settings['PER_PAGE_ORDERS'], 20)
+        self.assertEqual(settings['PORT'], 9100)
+        self.assertEqual(settings['DB_POOL_TIMEOUT'], 2.5)
+        self.assertIs(settings['SQLALCHEMY_TRACK_MODIFICATIONS'], False)
+        self.assertEqual(settings['SQLALCHEMY_DATABASE_URI'], 'sqlite:///other.db')
+        self.assertNotIn('PATH', settings)
+
+    def test_frozen(self):
+        settings = load_settings(self.path, env={})
+
+        with self.assertRaises(TypeError):
+            settings['PER_PAGE_ORDERS'] = 100
+        with self.assertRaises(TypeError):
+            settings['SQLALCHEMY_ENGINE_OPTIONS']['echo'] = True
+
+    def test_reports_all_problems(self):
+        self.write_config({
+            'PER_PAGE_ORDRES': 10,
+            'PER_PAGE_ORDERS': 0,
+            'LOG_LEVEL': 'LOUD',
+            'DB_POOL_SIZE': True,
+            'COMPRESS_LEVEL': 12,
+        })
+
+        with self.assertRaises(ConfigError) as context:
+            load_settings(self.path, env={'PORT': 'eighty'})
+
+        problems = ' '.join(context.exception.problems)
+        self.assertEqual(len(context.exception.problems), 6)
+        for name in ('PER_PAGE_ORDRES', 'PER_PAGE_ORDERS', 'LOG_LEVEL',
+                     'DB_POOL_SIZE', 'COMPRESS_LEVEL', 'PORT'):
+            self.assertIn(name, problems)
+
+    def test_repository_config_is_valid(self):
+        settings = load_settings('config.json', env={})
+
+        self.assertEqual(settings['PORT'], 8089)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,25 +1,15 @@
 import unittest
 from datetime import datetime
-from app import app, db, Customer, Order
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+import json
+from sqlalchemy.orm.exc import StaleDataError
+from testing import DatabaseTestCase
+from app import app, db, Customer, Order, OrderArchive, Service, audit_writer
+from archive import archive_orders
 
 
-class TestCustomer(unittest.TestCase):
-
-    def setUp(self):
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-        self.client = app.test_client()
-
-        with app.app_context():
-            db.create_all()
-
-    def tearDown(self):
-        with app.app_context():
-            db.session.remove()
-            db.drop_all()
-            db.engine.dispose()
+class TestCustomer(DatabaseTestCase):
 
     def test_health_check(self):
         response = self.client.get('/health')
@@ -59,6 +49,17 @@ class TestCustomer(unittest.TestCase):
         self.assertIn('ФИО', response_text)
         self.assertIn('обязательно для заполнения', response_text)
 
+    def test_add_customer_date_with_spaces(self):
+        response = self.client.post('/add-customer', data={
+            'name': 'Иванов Иван Иванович', 'date_of_birth': ' 1990-01-01',
+            'phone_number': '79001234567'
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Некорректный формат даты', response.data.decode('utf-8'))
+        with app.app_context():
+            self.assertEqual(Customer.query.count(), 0)
+
     def test_add_customer_empty_phone(self):
         response = self.client.post('/add-customer', data={
             'name': 'Иванов Иван Иванович',
@@ -105,6 +106,20 @@ class TestCustomer(unittest.TestCase):
         self.assertIn("Клиент должен быть совершеннолетним (18 лет)".encode(
             'utf-8'), response.data)
 
+    def test_add_customer_reports_all_errors(self):
+        response = self.client.post('/add-customer', data={
+            'name': '',
+            'date_of_birth': '2100-01-01',
+            'phone_number': '123'
+        }, follow_redirects=True)
+
+        self.assertEqual(response.status_code, 200)
+        response_text = response.data.decode('utf-8')
+        self.assertIn('ФИО', response_text)
+        self.assertIn(
+            "Неверный формат номера телефона. Используйте российский формат", response_text)
+        self.assertIn("Дата рождения не может быть в будущем", response_text)
+
     def test_add_customer_existing_phone(self):
         with app.app_context():
             customer_existing_phone = Customer(
@@ -151,6 +166,89 @@ class TestCustomer(unittest.TestCase):
             self.assertEqual(updated_customer.name, 'Иванов Иван Петрович')
             self.assertEqual(updated_customer.phone_number, '79007654321')
 
+    def test_update_customer_version_conflict(self):
+        with app.app_context():
+            customer = Customer(name='Иванов Иван Иванович',
+                                date_of_birth=datetime(1990, 1, 1).date(),
+                                phone_number='79001234567')
+            db.session.add(customer)
+            db.session.commit()
+            customer_id = customer.id
+            self.assertEqual(customer.version, 1)
+
+        form = {'name': 'Иванов Иван Петрович', 'date_of_birth': '1990-01-01',
+                'phone_number': '79001234567', 'version': '1'}
+        first = self.client.post(f'/update-customer/{customer_id}', data=form)
+        # Второй оператор открыл форму до первого сохранения
+        second = self.client.post(f'/update-customer/{customer_id}', data=dict(
+            form, name='Иванов Иван Сидорович'))
+
+        self.assertEqual(first.status_code, 302)
+        self.assertEqual(second.status_code, 409)
+        html = second.data.decode('utf-8')
+        self.assertIn('Эту запись уже изменил другой пользователь', html)
+        self.assertIn('name="version" value="2"', html)
+
+        with app.app_context():
+            customer = db.session.get(Customer, customer_id)
+            self.assertEqual((customer.name, customer.version),
+                             ('Иванов Иван Петрович', 2))
+
+    def test_concurrent_update_is_detected(self):
+        with app.app_context():
+            customer = Customer(name='Иванов Иван Иванович',
+                                phone_number='79001234567')
+            db.session.add(customer)
+            db.session.commit()
+
+            self.assertEqual(customer.version, 1)
+            # Другая транзакция сохранила запись после загрузки объекта
+            db.session.execute(text(
+                "UPDATE customers SET version = version + 1 WHERE id = :id"),
+                {'id': customer.id})
+            customer.name = 'Иванов Иван Петрович'
+            with self.assertRaises(StaleDataError):
+                db.session.commit()
+
+    def test_update_customer_deleted_concurrently(self):
+        with app.app_context():
+            customer = Customer(name='Иванов Иван Иванович',
+                                date_of_birth=datetime(1990, 1, 1).date(),
+                                phone_number='79001234567')
+            db.session.add(customer)
+            db.session.commit()
+            customer_id = customer.id
+
+        deleted = []
+
+        def delete_customer(session):
+            session.execute(text("DELETE FROM customers WHERE id = :id"), {'id': customer_id})
+
+        # Другой оператор удалил клиента между загрузкой и UPDATE. Удаление
+        # повторяется после отката: в тестах откат отменяет и его
+        def delete_before_update(session, flush_context, instances):
+            if not deleted:
+                deleted.append(customer_id)
+                delete_customer(session)
+
+        def delete_after_rollback(session, previous_transaction):
+            if deleted and previous_transaction.parent is None:
+                delete_customer(session)
+
+        for name, listener in (('before_flush', delete_before_update),
+                               ('after_soft_rollback', delete_after_rollback)):
+            event.listen(Session, name, listener)
+            self.addCleanup(event.remove, Session, name, listener)
+
+        response = self.client.post(f'/update-customer/{customer_id}', data={
+            'name': 'Иванов Иван Петрович', 'date_of_birth': '1990-01-01',
+            'phone_number': '79001234567', 'version': '1'}, follow_redirects=True)
+
+        self.assertEqual(deleted, [customer_id])
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.request.path, '/list-customers')
+        self.assertIn('Эту запись уже удалил другой пользователь', response.data.decode('utf-8'))
+
     def test_update_customer_existing_phone(self):
         with app.app_context():
             customer1 = Customer(
@@ -180,6 +278,47 @@ class TestCustomer(unittest.TestCase):
         self.assertIn(
             "Клиент с таким номером телефона уже существует".encode('utf-8'), response.data)
 
+    def test_add_customer_existing_phone_other_format(self):
+        with app.app_context():
+            customer_existing_phone = Customer(
+                name='Петров Петр Петрович',
+                date_of_birth=datetime.strptime(
+                    '1985-05-05', '%Y-%m-%d').date(),
+                phone_number='+79001234567'
+            )
+            db.session.add(customer_existing_phone)
+            db.session.commit()
+
+        response = self.client.post('/add-customer', data={
+            'name': 'Иванов Иван Иванович',
+            'date_of_birth': '1990-01-01',
+            'phone_number': '8 (900) 123-45-67'
+        }, follow_redirects=True)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            "Клиент с таким номером телефона уже существует".encode('utf-8'), response.data)
+
+        with app.app_context():
+            self.assertEqual(Customer.query.count(), 1)
+
+    def test_add_customer_phone_normalized(self):
+        response = self.client.post('/add-customer', data={
+            'name': 'Иванов Иван Иванович', 'date_of_birth': '1990-01-01',
+            'phone_number': '+7 (900) 123-45-67'
+        })
+
+        self.assertEqual(response.status_code, 302)
+
+        with app.app_context():
+            customer = Customer.query.first()
+            self.assertEqual(customer.phone_number, '+7 (900) 123-45-67')
+            self.assertEqual(customer.phone_normalized, '+79001234567')
+            self.assertEqual(Customer.find_by_phone('89001234567'), customer)
+            self.assertEqual(
+                Customer.existing_phones(['79001234567', '79007654321']),
+                {'+79001234567'})
+
     def test_delete_customer_success(self):
         with app.app_context():
             customer = Customer(
@@ -221,14 +360,12 @@ class TestCustomer(unittest.TestCase):
             db.session.commit()
 
             customer_id = customer.id
-            orders_count = Order.query.filter_by(
-                customer_id=customer_id).count()
 
         response = self.client.get(
             f'/delete-customer/{customer_id}', follow_redirects=True)
 
         self.assertEqual(response.status_code, 200)
-        self.assertIn(f"Невозможно удалить клиента. У этого клиента есть оформленные заказы: {orders_count}".encode(
+        self.assertIn("Невозможно удалить клиента. У этого клиента есть оформленные заказы".encode(
             'utf-8'), response.data)
 
         with app.app_context():
@@ -236,5 +373,249 @@ class TestCustomer(unittest.TestCase):
             self.assertIsNotNone(customer_still_exists)
 
 
+    def create_customers(self, count):
+        customers = [Customer(name=f'Клиент {i}', phone_number=f'7900000000{i}')
+                     for i in range(count)]
+        db.session.add_all(customers)
+        db.session.flush()
+        return [customer.id for customer in customers]
+
+    def test_referenced_ids(self):
+        with app.app_context():
+            current, archived, deleted, free = self.create_customers(4)
+            service = Service(service_name='Услуга', description='', price=100)
+            db.session.add(service)
+            db.session.flush()
+            for customer_id in (current, archived, deleted):
+                db.session.add(Order(customer_id=customer_id, service_id=service.id,
+                                     order_date=datetime(2020, 1, 1).date()))
+            db.session.commit()
+            archive_orders(datetime(2021, 1, 1).date(), batch_size=10)
+            db.session.add(Order(customer_id=current, service_id=service.id,
+                                 order_date=datetime.now().date()))
+            # Удалённые пользователем заказы не мешают удалить клиента
+            db.session.execute(db.update(OrderArchive).where(
+                OrderArchive.customer_id == deleted).values(deleted_at=datetime.now()))
+            db.session.commit()
+
+            self.assertEqual(Customer.referenced_ids([current, archived, deleted, free]),
+                             {current, archived})
+
+            # Проверка идёт по индексам, без полного просмотра заказов
+            statement = db.select(Customer.id).where(Customer.id.in_([current]), db.or_(
+                db.exists().where(Order.customer_id == Customer.id),
+                db.exists().where(OrderArchive.customer_id == Customer.id,
+                                  OrderArchive.deleted_at.is_(None)))).compile(
+                db.engine, compile_kwargs={'literal_binds': True})
+            plan = [row[-1] for row in db.session.execute(
+                text(f"EXPLAIN QUERY PLAN {statement}"))]
+            self.assertFalse([step for step in plan if step.startswith('SCAN')
+                              and 'INDEX' not in step], plan)
+
+    def test_delete_selected_customers(self):
+        with app.app_context():
+            ids = self.create_customers(3)
+            service = Service(service_name='Услуга', description='', price=100)
+            db.session.add(service)
+            db.session.flush()
+            db.session.add(Order(customer_id=ids[0], service_id=service.id,
+                                 order_date=datetime.now().date()))
+            db.session.commit()
+
+        response = self.client.post('/delete-customers', data={
+            'ids': [str(customer_id) for customer_id in ids] + ['999999']},
+            follow_redirects=True)
+
+        html = response.data.decode('utf-8')
+        self.assertIn('Удалено клиентов: 2', html)
+        self.assertIn('Не удалены клиенты с оформленными заказами: 1', html)
+        with app.app_context():
+            self.assertEqual(db.session.scalars(db.select(Customer.id).where(
+                Customer.id.in_(ids))).all(), [ids[0]])
+
+    def test_merge_customers(self):
+        with app.app_context():
+            survivor, first, second, other = self.create_customers(4)
+            service = Service(service_name='Услуга', description='', price=100)
+            db.session.add(service)
+            db.session.flush()
+            for customer_id in (first, first, second, other):
+                db.session.add(Order(customer_id=customer_id, service_id=service.id,
+                                     order_date=datetime(2020, 1, 1).date()))
+            db.session.commit()
+            archive_orders(datetime(2020, 1, 2).date(), batch_size=10)
+            db.session.add(Order(customer_id=second, service_id=service.id,
+                                 order_date=datetime.now().date()))
+            db.session.commit()
+
+        response = self.client.post('/merge-customers', data={
+            'survivor_id': str(survivor),
+            'ids': [str(survivor), str(first), str(second)]},
+            follow_redirects=True)
+
+        self.assertIn('перенесено заказов: 4', response.data.decode('utf-8'))
+        with app.app_context():
+            self.assertIsNone(db.session.get(Customer, first))
+            self.assertIsNone(db.session.get(Customer, second))
+            order = Order.query.filter_by(customer_id=survivor).one()
+            self.assertEqual(order.version, 2)
+            self.assertEqual(OrderArchive.query.filter_by(customer_id=survivor).count(), 3)
+            self.assertEqual(OrderArchive.query.filter_by(customer_id=other).count(), 1)
+
+    def test_merge_requires_survivor(self):
+        with app.app_context():
+            ids = self.create_customers(2)
+            db.session.commit()
+
+        response = self.client.post('/merge-customers', data={
+            'ids': [str(customer_id) for customer_id in ids]}, follow_redirects=True)
+
+        self.assertIn('Выберите основного клиента', response.data.decode('utf-8'))
+        with app.app_context():
+            self.assertEqual(Customer.query.filter(Customer.id.in_(ids)).count(), 2)
+
+    def test_customer_detail(self):
+        with app.app_context():
+            customer = Customer(
+                name='Иванов Иван Иванович',
+                date_of_birth=datetime.strptime(
+                    '1990-01-01', '%Y-%m-%d').date(),
+                phone_number='79001234567'
+            )
+            banner = Service(service_name='Баннер',
+                             description='Показ баннера', price='100.50')
+            post = Service(service_name='Пост',
+                           description='Пост в соцсетях', price=1000)
+            db.session.add_all([customer, banner, post])
+            db.session.commit()
+
+            db.session.add_all([
+                Order(customer_id=customer.id, service_id=banner.id,
+                      order_date=datetime(2024, 1, 10).date()),
+                Order(customer_id=customer.id, service_id=banner.id,
+                      order_date=datetime(2024, 3, 5).date()),
+                Order(customer_id=customer.id, service_id=post.id,
+                      order_date=datetime(2024, 2, 1).date()),
+            ])
+            db.session.commit()
+            customer_id = customer.id
+
+        response = self.client.get(f'/customer/{customer_id}')
+
+        self.assertEqual(response.status_code, 200)
+        response_text = response.data.decode('utf-8')
+        self.assertIn('1201.00 руб.', response_text)
+        self.assertIn('10.01.2024 — 05.03.2024', response_text)
+        self.assertIn('Баннер', response_text)
+
+        with app.app_context():
+            summary = db.session.get(Customer, customer_id).order_summary()
+            self.assertEqual(summary['orders_count'], 3)
+            self.assertEqual(summary['top_service'].service_name, 'Баннер')
+            self.assertEqual(summary['top_service_quantity'], 2)
+
+    def test_customer_summary_with_archive(self):
+        with app.app_context():
+            customer = Customer(
+                name='Иванов Иван Иванович',
+                date_of_birth=datetime.strptime(
+                    '1990-01-01', '%Y-%m-%d').date(),
+                phone_number='79001234567'
+            )
+            service = Service(service_name='Баннер',
+                              description='Показ баннера', price=100)
+            db.session.add_all([customer, service])
+            db.session.commit()
+
+            db.session.add_all([
+                Order(customer_id=customer.id, service_id=service.id,
+                      order_date=datetime(2020, 1, 10).date()),
+                Order(customer_id=customer.id, service_id=service.id,
+                      order_date=datetime(2024, 3, 5).date()),
+            ])
+            db.session.commit()
+            customer_id = customer.id
+            archive_orders(datetime(2021, 1, 1).date())
+
+            customer = db.session.get(Customer, customer_id)
+            self.assertEqual(customer.order_summary()['orders_count'], 1)
+
+            summary = customer.order_summary(include_archive=True)
+            self.assertEqual(summary['orders_count'], 2)
+            self.assertEqual(summary['lifetime_spend'], 200)
+            self.assertEqual(summary['first_order_date'],
+                             datetime(2020, 1, 10).date())
+            self.assertEqual(summary['top_service_quantity'], 2)
+
+        response = self.client.get(f'/customer/{customer_id}?archive=1')
+        self.assertIn('10.01.2020 — 05.03.2024', response.data.decode('utf-8'))
+
+    def test_delete_customer_with_deleted_orders(self):
+        with app.app_context():
+            customer = Customer(
+                name='Иванов Иван Иванович',
+                date_of_birth=datetime.strptime(
+                    '1990-01-01', '%Y-%m-%d').date(),
+                phone_number='79001234567'
+            )
+            db.session.add(customer)
+            db.session.commit()
+            order = Order(customer_id=customer.id, service_id=1,
+                          order_date=datetime.now().date())
+            db.session.add(order)
+            db.session.commit()
+            customer_id, order_id = customer.id, order.id
+
+        self.client.get(f'/delete-order/{order_id}')
+        response = self.client.get(
+            f'/delete-customer/{customer_id}', follow_redirects=True)
+
+        self.assertIn('Клиент успешно удален!', response.data.decode('utf-8'))
+
+        with app.app_context():
+            self.assertIsNone(db.session.get(Customer, customer_id))
+            self.assertIsNone(db.session.get(OrderArchive, order_id))
+
+    def test_update_customer_is_audited(self):
+        with app.app_context():
+            customer = Customer(
+                name='Иванов Иван Иванович',
+                date_of_birth=datetime.strptime(
+                    '1990-01-01', '%Y-%m-%d').date(),
+                phone_number='79001234567'
+            )
+            db.session.add(customer)
+            db.session.commit()
+            customer_id = customer.id
+
+        response = self.client.post(f'/update-customer/{customer_id}', data={
+            'name': 'Петров Петр Петрович',
+            'date_of_birth': '1990-01-01',
+            'phone_number': '79001234567',
+            'email': '',
+            'company': ''
+        }, headers={'X-Request-ID': 'test-audit-request'})
+
+        self.assertEqual(response.headers['X-Request-ID'], 'test-audit-request')
+        audit_writer.flush()
+        with open(audit_writer.segments()[-1], encoding='utf-8') as segment:
+            record = json.loads(segment.readlines()[-1])
+
+        self.assertEqual(record['request_id'], 'test-audit-request')
+        self.assertEqual((record['entity'], record['entity_id'], record['action']),
+                         ('customer', customer_id, 'update'))
+        self.assertEqual(record['changes']['name'],
+                         ['Иванов Иван Иванович', 'Петров Петр Петрович'])
+
+    def test_customer_history_uses_index(self):
+        with app.app_context():
+            plan = db.session.execute(text(
+                "EXPLAIN QUERY PLAN SELECT id FROM orders "
+                "WHERE customer_id = 1 ORDER BY order_date DESC, id DESC"
+            )).fetchall()
+
+        details = ' '.join(row[-1] for row in plan)
+        self.assertIn('ix_orders_customer_id_order_date', details)
+
 if __name__ == '__main__':
     unittest.main()
@@ -0,0 +1,112 @@
+import unittest
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+from testing import DatabaseTestCase
+from app import app, db, kpi_store, Customer, Order, OrderLine, Service
+from dashboard import KpiStore, compute_kpis
+
+TODAY = date(2026, 3, 18)  # среда
+
+
+class TestDashboard(DatabaseTestCase):
+
+    @classmethod
+    def seed(cls):
+        customer = Customer(name="Клиент", phone_number="+79500000001",
+                            created_at=datetime(2026, 3, 16, 9, 0))
+        old_customer = Customer(name="Давний клиент", phone_number="+79500000002",
+                                created_at=datetime(2026, 3, 15, 23, 59))
+        services = [Service(service_name=f"Услуга {i}", description="",
+                            price=100 * i) for i in range(1, 8)]
+        db.session.add_all([customer, old_customer, *services])
+        db.session.flush()
+
+        def order(day, *lines):
+            db.session.add(Order(customer_id=customer.id, order_date=day, lines=[
+                OrderLine.for_service(services[i].id, quantity)
+                for i, quantity in lines]))
+
+        order(TODAY, (0, 2), (6, 1))
+        order(TODAY - timedelta(days=1), (1, 1))
+        order(date(2026, 3, 1), *((i, 1) for i in range(2, 6)))
+        order(date(2026, 2, 28), (0, 100))
+        db.session.flush()
+        cls.service_ids = [service.id for service in services]
+
+    def test_compute_kpis(self):
+        with app.app_context():
+            kpis = compute_kpis(TODAY)
+
+        self.assertEqual(kpis['today'], {'orders': 1, 'revenue': Decimal('900.00')})
+        self.assertEqual(kpis['month'], {'orders': 3, 'revenue': Decimal('2900.00')})
+        self.assertEqual(kpis['new_customers_week'], 1)
+        self.assertEqual(
+            [(s['id'], s['quantity'], s['revenue']) for s in kpis['top_services']],
+            [(self.service_ids[6], 1, Decimal('700.00')),
+             (self.service_ids[5], 1, Decimal('600.00')),
+             (self.service_ids[4], 1, Decimal('500.00')),
+             (self.service_ids[3], 1, Decimal('400.00')),
+             (self.service_ids[2], 1, Decimal('300.00'))])
+
+    def test_store_refreshes_after_ttl(self):
+        now = [0]
+        calls = []
+        store = KpiStore(60, compute=lambda: calls.append(1) or {'date': date.today()},
+                         clock=lambda: now[0])
+
+        store.get()
+        now[0] = 59
+        store.get()
+        self.assertEqual(len(calls), 1)
+
+        now[0] = 60
+        store.get()
+        self.assertEqual(len(calls), 2)
+
+        store.invalidate()
+        store.get()
+        self.assertEqual(len(calls), 3)
+
+    def test_commit_invalidates_store(self):
+        with app.app_context():
+            before = kpi_store.get()
+            self.assertIs(kpi_store.get(), before)
+
+            db.session.add(Customer(name="Новый клиент", phone_number="+79500000003"))
+            db.session.commit()
+            after = kpi_store.get()
+
+        self.assertIsNot(after, before)
+        self.assertEqual(after['new_customers_week'], before['new_customers_week'] + 1)
+
+    def test_delete_order_invalidates_store(self):
+        # Удаление заказа идёт запросами мимо flush (move_orders)
+        with app.app_context():
+            customer_id = Customer.query.filter_by(phone_number="+79500000001").one().id
+            order = Order(customer_id=customer_id, order_date=date.today(), lines=[
+                OrderLine.for_service(self.service_ids[0], 1)])
+            db.session.add(order)
+            db.session.commit()
+            order_id = order.id
+            before = kpi_store.get()['today']
+
+        response = self.client.get(f'/delete-order/{order_id}')
+        self.assertEqual(response.status_code, 302)
+
+        with app.app_context():
+            after = kpi_store.get()['today']
+        self.assertEqual(after['orders'], before['orders'] - 1)
+        self.assertEqual(after['revenue'], before['revenue'] - Decimal('100.00'))
+
+    def test_index_shows_kpis(self):
+        kpi_store.invalidate()
+        response = self.client.get('/')
+        html = response.data.decode('utf-8')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Заказы сегодня', html)
+        self.assertIn('Популярные услуги месяца', html)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,93 @@
+import os
+import tempfile
+import unittest
+from sqlalchemy import create_engine, exc, text
+from app import app
+from db_pool import (engine_options, pool_metrics, register_pool_events,
+                     TimedQueuePool)
+
+
+class TestDbPool(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        pool_metrics.reset()
+
+    def tearDown(self):
+        pool_metrics.reset()
+        self.tmp.cleanup()
+
+    def make_engine(self, **config):
+        config.setdefault('SQLALCHEMY_DATABASE_URI', 'sqlite:///' + os.path.join(
+            self.tmp.name, 'pool.db'))
+        engine = create_engine(config['SQLALCHEMY_DATABASE_URI'],
+                               **engine_options(config))
+        register_pool_events(engine, config)
+        self.addCleanup(engine.dispose)
+        return engine
+
+    def test_engine_options(self):
+        options = engine_options({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///flask.db',
+            'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': 3, 'max_overflow': 1},
+            'DB_PRE_PING': 'always',
+        })
+        self.assertEqual(options['pool_size'], 3)
+        self.assertIs(options['pool_pre_ping'], True)
+        self.assertIs(options['poolclass'], TimedQueuePool)
+
+        options = engine_options({
+            'SQLALCHEMY_DATABASE_URI': 'sqlite:///:memory:',
+            'SQLALCHEMY_ENGINE_OPTIONS': {'pool_size': 3},
+        })
+        self.assertNotIn('pool_size', options)
+        self.assertIs(options['pool_pre_ping'], False)
+
+        with self.assertRaises(ValueError):
+            engine_options({'DB_PRE_PING': 'sometimes'})
+
+    def test_checkout_metrics_and_timeout(self):
+        engine = self.make_engine(SQLALCHEMY_ENGINE_OPTIONS={
+            'pool_size': 1, 'max_overflow': 1, 'pool_timeout': 0.1})
+
+        first = engine.connect()
+        second = engine.connect()
+        with self.assertRaises(exc.TimeoutError):
+            engine.connect()
+
+        snapshot = pool_metrics.snapshot(engine.pool)
+        self.assertEqual(snapshot['in_use'], 2)
+        self.assertEqual(snapshot['overflow'], 1)
+        self.assertEqual(snapshot['overflow_peak'], 1)
+        self.assertEqual(snapshot['timeouts'], 1)
+        self.assertEqual(snapshot['checkout_wait']['count'], 3)
+        self.assertGreaterEqual(snapshot['checkout_wait']['max_ms'], 100)
+
+        first.close()
+        second.close()
+        self.assertEqual(pool_metrics.snapshot()['in_use'], 0)
+
+    def test_idle_pre_ping(self):
+        engine = self.make_engine(DB_PRE_PING='idle', DB_PRE_PING_IDLE_SECONDS=0)
+
+        for _ in range(3):
+            with engine.connect() as connection:
+                connection.execute(text('SELECT 1'))
+
+        # Первая выдача - новое соединение, его проверять незачем
+        self.assertEqual(pool_metrics.snapshot()['pre_ping']['pings'], 2)
+
+    def test_metrics_endpoint(self):
+        client = app.test_client()
+
+        response = client.get('/metrics')
+
+        self.assertEqual(response.status_code, 200)
+        pool = response.get_json()['pool']
+        self.assertIn('checkout_wait', pool)
+        self.assertEqual(pool['pool_size'],
+                         app.config['SQLALCHEMY_ENGINE_OPTIONS']['pool_size'])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,69 @@
+import os
+import tempfile
+import unittest
+from alembic import command
+from alembic.autogenerate import compare_metadata
+from alembic.migration import MigrationContext
+from alembic.script import ScriptDirectory
+from sqlalchemy import create_engine, inspect, text
+from app import app, db
+from db_schema import (BASELINE_REVISION, MIGRATIONS_DIR, SchemaExistsError,
+                       alembic_config, bootstrap_schema, current_revision)
+
+
+class TestDbSchema(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.engine = create_engine(
+            'sqlite:///' + os.path.join(self.tmp.name, 'schema.db'))
+        self.context = app.app_context()
+        self.context.push()
+        self.head = ScriptDirectory.from_config(alembic_config(app)).get_current_head()
+
+    def tearDown(self):
+        self.context.pop()
+        self.engine.dispose()
+        self.tmp.cleanup()
+
+    def upgrade(self, revision='head'):
+        with self.engine.begin() as connection:
+            command.upgrade(alembic_config(app, connection), revision)
+
+    def assert_matches_models(self):
+        with self.engine.connect() as connection:
+            self.assertEqual(current_revision(connection), self.head)
+            self.assertEqual(compare_metadata(
+                MigrationContext.configure(connection), db.metadata), [])
+
+    def test_single_baseline(self):
+        script = ScriptDirectory(MIGRATIONS_DIR)
+        self.assertEqual(list(script.get_bases()), [BASELINE_REVISION])
+        self.assertEqual(len(script.get_heads()), 1)
+
+    def test_migrations_from_empty_database(self):
+        self.upgrade()
+        self.assert_matches_models()
+
+    def test_bootstrap_schema(self):
+        with self.engine.begin() as connection:
+            self.assertEqual(bootstrap_schema(app, db.metadata, connection), self.head)
+        self.assert_matches_models()
+
+        with self.engine.begin() as connection:
+            with self.assertRaises(SchemaExistsError):
+                bootstrap_schema(app, db.metadata, connection)
+
+    def test_squashed_revision_is_restamped(self):
+        self.upgrade(BASELINE_REVISION)
+        with self.engine.begin() as connection:
+            connection.execute(text(
+                "UPDATE alembic_version SET version_num = '3c88fcc3d95d'"))
+
+        self.upgrade()
+        self.assert_matches_models()
+        self.assertIn('jobs', inspect(self.engine).get_table_names())
+
+
+if __name__ == '__main__':
+    unittest.main()
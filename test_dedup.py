@@ -0,0 +1,151 @@
+import unittest
+from datetime import date
+from testing import DatabaseTestCase
+from app import app, db, Customer, Order, Service
+from dedup import (blocking_key, find_duplicates, match_record, normalize_company,
+                   normalize_email, normalize_name, phone_digits, save_candidates,
+                   score_pair)
+from jobs import work
+from models import DuplicateCandidate, Job
+
+
+class TestNormalization(unittest.TestCase):
+
+    def test_normalize(self):
+        self.assertEqual(normalize_name('Иванов  Иван-Ёлкин'), 'елкин иван иванов')
+        self.assertEqual(normalize_company('ООО "Ромашка"'), 'ромашка')
+        self.assertEqual(normalize_email(' Ivan.Petrov+shop@GoogleMail.com'), 'ivanpetrov@gmail.com')
+        self.assertEqual(normalize_email('Ivan.Petrov@ya.ru'), 'ivan.petrov@yandex.ru')
+        self.assertIsNone(normalize_email('not-an-email'))
+        self.assertEqual(phone_digits('+7 (900) 123-45-67'), '9001234567')
+        self.assertIsNone(phone_digits('12345'))
+
+    def test_blocking_key(self):
+        self.assertEqual(blocking_key('phone', phone_number='+79001234567'), '1234567')
+        self.assertEqual(blocking_key('name', name='Иван Иванов'),
+                         blocking_key('name', name='Иванов Иван'))
+        self.assertEqual(blocking_key('name_prefix', name='Иванов Иван Иванович'),
+                         blocking_key('name_prefix', name='Иванов Иван Иваныч'))
+        self.assertIsNone(blocking_key('email', email=None))
+        with self.assertRaises(ValueError):
+            blocking_key('company')
+
+    def test_score_pair(self):
+        a = match_record(Customer(name='Иванов Иван', email='ivan@mail.ru',
+                                  phone_number='+79001234567', company='ООО Ромашка'))
+        b = match_record(Customer(name='Иван Иванов', email='IVAN@mail.ru',
+                                  phone_number='+79011234567', company='Ромашка'))
+        score, reasons = score_pair(a, b)
+        self.assertEqual(score, 1.0)
+        self.assertEqual(reasons, {'name': 1.0, 'company': 1.0, 'email': True})
+
+        c = match_record(Customer(name='Петров Пётр', phone_number='+79221234567'))
+        score, reasons = score_pair(a, c)
+        self.assertLess(score, 0.85)
+        self.assertNotIn('phone', reasons)
+
+
+class TestDedup(DatabaseTestCase):
+
+    @classmethod
+    def seed(cls):
+        db.session.add_all([
+            Customer(name='Иванов Иван Иванович', phone_number='+79001234567',
+                     email='ivan@mail.ru'),
+            Customer(name='Иван Иванович Иванов', phone_number='+79011234567'),
+            Customer(name='Сидорова Анна', phone_number='+79005550000',
+                     email='anna.sidorova@gmail.com'),
+            Customer(name='Сидорова Анна Петровна', phone_number='+79115551111',
+                     email='AnnaSidorova+shop@gmail.com'),
+            Customer(name='Петров Пётр', phone_number='+79220000000'),
+        ])
+        db.session.flush()
+
+    def customer_id(self, phone_number):
+        return Customer.query.filter_by(phone_number=phone_number).one().id
+
+    def pair(self, first_phone, second_phone):
+        return tuple(sorted((self.customer_id(first_phone), self.customer_id(second_phone))))
+
+    def test_find_duplicates(self):
+        with app.app_context():
+            ivan = self.pair('+79001234567', '+79011234567')
+            anna = self.pair('+79005550000', '+79115551111')
+            duplicates, stats = find_duplicates(0.85)
+            self.assertEqual([duplicate[:2] for duplicate in duplicates], [ivan, anna])
+            self.assertEqual(duplicates[1][3]['email'], True)
+            self.assertEqual(stats['skipped_blocks'], 0)
+
+            # Блок больше max_block_size не сравнивается
+            duplicates, stats = find_duplicates(0.85, batch_size=2, max_block_size=1)
+            self.assertEqual(duplicates, [])
+            self.assertGreater(stats['skipped_blocks'], 0)
+
+    def test_reviewed_pairs_excluded(self):
+        with app.app_context():
+            duplicates, _ = find_duplicates(0.85)
+            save_candidates(duplicates)
+            first = DuplicateCandidate.query.order_by(DuplicateCandidate.score.desc(),
+                                                      DuplicateCandidate.id).first()
+            first.status = 'dismissed'
+            db.session.commit()
+
+            duplicates, _ = find_duplicates(0.85)
+            save_candidates(duplicates)
+            db.session.commit()
+            self.assertEqual(len(duplicates), 1)
+            self.assertEqual(DuplicateCandidate.query.count(), 2)
+            self.assertEqual(DuplicateCandidate.query.filter_by(status='pending').count(), 1)
+
+    def test_dedup_job(self):
+        result = app.test_cli_runner().invoke(args=['dedup-customers', '--background'])
+        self.assertIn('Задача поставлена в очередь', result.output)
+
+        with app.app_context():
+            work(app, once=True)
+            job = Job.query.one()
+            self.assertEqual(job.status, 'done')
+            self.assertEqual(job.result['candidates'], 2)
+            self.assertEqual(job.progress, job.total)
+            self.assertEqual(DuplicateCandidate.query.filter_by(job_id=job.id).count(), 2)
+
+    def test_review_dismiss_and_merge(self):
+        with app.app_context():
+            save_candidates(find_duplicates(0.85)[0])
+            db.session.commit()
+            ivan_id = self.customer_id('+79001234567')
+            duplicate_id = self.customer_id('+79011234567')
+            service = Service(service_name='Реклама', price=1000)
+            db.session.add(service)
+            db.session.flush()
+            db.session.add(Order(customer_id=duplicate_id, service_id=service.id,
+                                 order_date=date.today()))
+            db.session.commit()
+            anna = DuplicateCandidate.query.filter(
+                DuplicateCandidate.customer_id != ivan_id).one()
+
+        response = self.client.get('/duplicates')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn('Сидорова Анна Петровна', response.data.decode('utf-8'))
+
+        response = self.client.post(f'/duplicates/{anna.id}/dismiss', follow_redirects=True)
+        self.assertIn('Пара отмечена как разные клиенты', response.data.decode('utf-8'))
+        self.assertNotIn('Сидорова Анна Петровна', response.data.decode('utf-8'))
+
+        response = self.client.post('/merge-customers', data={
+            'survivor_id': ivan_id, 'ids': duplicate_id, 'from_review': '1'})
+        self.assertEqual(response.status_code, 302)
+        self.assertTrue(response.location.endswith('/duplicates'))
+
+        with app.app_context():
+            self.assertEqual(
+                sorted(DuplicateCandidate.query.with_entities(DuplicateCandidate.status)),
+                [('dismissed',), ('merged',)])
+            self.assertIsNone(db.session.get(Customer, duplicate_id))
+            self.assertEqual(Order.query.one().customer_id, ivan_id)
+
+        self.assertEqual(self.client.post('/duplicates/999999/dismiss').status_code, 404)
+
+
+if __name__ == '__main__':
+    unittest.main()
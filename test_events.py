@@ -0,0 +1,65 @@
+import unittest
+from events import RELOAD, EventBroker, format_event, stream
+
+
+class TestEvents(unittest.TestCase):
+
+    def test_publish_to_subscribers(self):
+        broker = EventBroker()
+        first, second = broker.subscribe(), broker.subscribe()
+        event = broker.publish('create', {'id': 1})
+
+        self.assertEqual(first.get(timeout=0), event)
+        self.assertEqual(second.get(timeout=0), event)
+        self.assertIsNone(first.get(timeout=0))
+
+        broker.unsubscribe(second)
+        broker.publish('delete', {'id': 1})
+        self.assertEqual(first.get(timeout=0).type, 'delete')
+        self.assertIsNone(second.get(timeout=0))
+        self.assertEqual(broker.subscriber_count, 1)
+
+    def test_overflow_replaces_buffer_with_reload(self):
+        broker = EventBroker(buffer_size=3)
+        subscription = broker.subscribe()
+        for i in range(5):
+            broker.publish('update', {'id': i})
+
+        self.assertIs(subscription.get(timeout=0), RELOAD)
+        self.assertIsNone(subscription.get(timeout=0))
+
+    def test_resume_from_last_event_id(self):
+        broker = EventBroker(history_size=3)
+        for i in range(1, 6):
+            broker.publish('update', {'id': i})
+
+        resumed = broker.subscribe(last_event_id=3)
+        self.assertEqual([resumed.get(timeout=0).id for _ in range(2)], [4, 5])
+        self.assertIsNone(resumed.get(timeout=0))
+
+        # События 2 и 3 уже вытеснены из истории
+        self.assertIs(broker.subscribe(last_event_id=1).get(timeout=0), RELOAD)
+        # Номер из прошлого запуска процесса
+        self.assertIs(broker.subscribe(last_event_id=10).get(timeout=0), RELOAD)
+        self.assertIsNone(broker.subscribe(last_event_id=5).get(timeout=0))
+
+    def test_stream(self):
+        broker = EventBroker()
+        subscription = broker.subscribe()
+        body = stream(broker, subscription, heartbeat=0.01)
+
+        self.assertEqual(next(body), 'retry: 5000\n\n')
+        self.assertEqual(next(body), ': keepalive\n\n')
+        broker.publish('create', {'id': 7, 'html': '<tr>Заказ</tr>'})
+        self.assertEqual(next(body),
+                         'id: 1\nevent: create\ndata: {"id": 7, "html": "<tr>Заказ</tr>"}\n\n')
+
+        body.close()
+        self.assertEqual(broker.subscriber_count, 0)
+
+    def test_format_reload(self):
+        self.assertEqual(format_event(RELOAD), 'event: reload\ndata: {}\n\n')
+
+
+if __name__ == '__main__':
+    unittest.main()
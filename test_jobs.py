@@ -0,0 +1,121 @@
+import unittest
+from datetime import date, datetime, timedelta
+from testing import DatabaseTestCase
+from app import app, db, Customer, Order, Service
+from jobs import claim_next, enqueue, job_handler, requeue_stale, run_job, work
+from models import Job, OrderArchive
+
+
+@job_handler('test_steps')
+def steps_job(context, steps, fail_at=None):
+    for step in range(1, steps + 1):
+        if step == fail_at:
+            raise RuntimeError('step failed')
+        context.progress(step, steps)
+    return {'steps': steps}
+
+
+class TestJobs(DatabaseTestCase):
+
+    def test_enqueue_and_status(self):
+        response = self.client.post('/jobs', json={
+            'kind': 'test_steps', 'params': {'steps': 4}})
+        self.assertEqual(response.status_code, 202)
+        job_id = response.get_json()['id']
+        self.assertTrue(response.headers['Location'].endswith(f'/jobs/{job_id}'))
+
+        self.assertEqual(self.client.get(f'/jobs/{job_id}').get_json()['status'], 'queued')
+        self.assertEqual(work(app, once=True), 1)
+
+        status = self.client.get(f'/jobs/{job_id}').get_json()
+        self.assertEqual(status['status'], 'done')
+        self.assertEqual((status['progress'], status['total'], status['percent']), (4, 4, 100.0))
+        self.assertEqual(status['result'], {'steps': 4})
+
+        listing = self.client.get('/jobs?status=done').get_json()
+        self.assertEqual([job['id'] for job in listing['jobs']], [job_id])
+
+        self.assertEqual(self.client.post('/jobs', json={'kind': 'nope'}).status_code, 400)
+        # Параметры проверяются по сигнатуре обработчика до постановки в очередь
+        for params in ({}, {'steps': 2, 'speed': 1}, {'steps': 2, 'kind': 'x'}):
+            response = self.client.post('/jobs', json={'kind': 'test_steps', 'params': params})
+            self.assertEqual(response.status_code, 400)
+            self.assertIn('test_steps', response.get_json()['error'])
+        with app.app_context():
+            self.assertEqual(Job.query.count(), 1)
+        self.assertEqual(self.client.get('/jobs/999').status_code, 404)
+
+    def test_failed_job(self):
+        with app.app_context():
+            job_id = enqueue('test_steps', steps=3, fail_at=2).id
+            work(app, once=True)
+            job = db.session.get(Job, job_id)
+            self.assertEqual((job.status, job.progress), ('failed', 1))
+            self.assertEqual(job.error, 'step failed')
+
+    def test_cancel_queued_and_running(self):
+        with app.app_context():
+            queued_id = enqueue('test_steps', steps=1).id
+            running_id = enqueue('test_steps', steps=5).id
+
+        response = self.client.post(f'/jobs/{queued_id}/cancel')
+        self.assertEqual(response.get_json()['status'], 'cancelled')
+
+        with app.app_context():
+            job = claim_next('test-worker')
+            self.assertEqual(job.id, running_id)
+            self.assertEqual(job.status, 'running')
+            self.assertIsNone(claim_next('test-worker'))
+
+        response = self.client.post(f'/jobs/{running_id}/cancel')
+        self.assertEqual(response.get_json()['status'], 'running')
+        self.assertTrue(response.get_json()['cancel_requested'])
+
+        with app.app_context():
+            # Обработчик прерывается на первом же отчёте о прогрессе
+            self.assertEqual(run_job(db.session.get(Job, running_id)), 'cancelled')
+            self.assertEqual(db.session.get(Job, running_id).progress, 1)
+
+        self.assertEqual(self.client.post('/jobs/999/cancel').status_code, 404)
+
+    def test_requeue_stale(self):
+        with app.app_context():
+            job_id = enqueue('test_steps', steps=1).id
+            claim_next('dead-worker')
+            db.session.execute(db.update(Job).where(Job.id == job_id).values(
+                heartbeat_at=datetime.now() - timedelta(hours=1)))
+            db.session.commit()
+
+            self.assertEqual(requeue_stale(60), 1)
+            self.assertEqual(work(app, once=True), 1)
+            self.assertEqual(db.session.get(Job, job_id).status, 'done')
+
+    def test_archive_orders_job(self):
+        with app.app_context():
+            customer = Customer(name="Иванов Иван Иванович", phone_number="+79500000001")
+            service = Service(service_name="Реклама в соцсетях", price=5000)
+            db.session.add_all([customer, service])
+            db.session.flush()
+            for day in range(1, 6):
+                db.session.add(Order(customer_id=customer.id, service_id=service.id,
+                                     order_date=date(1999, 1, day)))
+            db.session.commit()
+
+        result = app.test_cli_runner().invoke(args=[
+            'archive-orders', '--before', '2000-01-01', '--batch-size', '2', '--background'])
+        self.assertIn('Задача поставлена в очередь', result.output)
+
+        with app.app_context():
+            old_orders = Order.query.filter(Order.order_date < date(2000, 1, 1))
+            self.assertEqual(old_orders.count(), 5)
+            work(app, once=True)
+            job = Job.query.one()
+            self.assertEqual((job.status, job.progress, job.total), ('done', 5, 5))
+            self.assertEqual(job.result, {'moved': 5})
+            self.assertEqual(old_orders.count(), 0)
+            self.assertEqual(OrderArchive.query.filter(
+                OrderArchive.order_date < date(2000, 1, 1)).count(), 5)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,85 @@
+import gzip
+import os
+import tempfile
+import unittest
+from log_analytics import analyze, log_files, warning_type
+
+LOG_LINES = [
+    "2025-10-27 20:42:49,000 INFO: The logger is configured. Logging level: INFO [in app.py:1]",
+    "2025-10-27 20:42:49,100 INFO: Start creating order. Customer: 1, Service: 2 [in app.py:399]",
+    "2025-10-27 20:42:49,130 INFO: Order successfully created. ID: 1, Customer: 1 [in app.py:420]",
+    "2025-10-27 20:42:50,000 INFO: Start creating customer [in app.py:76]",
+    "2025-10-27 20:42:50,010 WARNING: Attempt to create a client with an invalid phone number format. [in app.py:40]",
+    "2025-10-27 20:42:50,011 WARNING: Attempt to create a customer with an empty name field. [in app.py:40]",
+    "2025-10-27 20:42:51,000 INFO: Start creating customer [in app.py:76]",
+    "2025-10-27 20:42:51,050 INFO: Service successfully created. ID: 7 [in app.py:98]",
+    "2025-10-27 20:42:52,000 INFO: Start editing customer. ID: 7. [in app.py:128]",
+    "2025-10-27 20:42:52,005 WARNING: Attempt to send a customer with an existing phone number in the database. Phone number: 79001234567 [in app.py:40]",
+    "Traceback (most recent call last):",
+]
+
+
+class TestLogAnalytics(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write_log(self, name, lines, compress=False):
+        path = os.path.join(self.tmp.name, name)
+        opener = gzip.open if compress else open
+        with opener(path, 'wt', encoding='utf-8') as log_file:
+            log_file.write('\n'.join(lines) + '\n')
+        return path
+
+    def test_log_files_order(self):
+        for name in ('service.log', 'service.log.1', 'service.log.2.gz',
+                     'service.log.10', 'other.log',
+                     'service.log.20261019-120000-1.gz',
+                     'service.log.20261019-120000.gz',
+                     'service.log.20261018-235959'):
+            self.write_log(name, [])
+
+        self.assertEqual(
+            [os.path.basename(path) for path in log_files(self.tmp.name)],
+            ['service.log.10', 'service.log.2.gz', 'service.log.1',
+             'service.log.20261018-235959', 'service.log.20261019-120000.gz',
+             'service.log.20261019-120000-1.gz', 'service.log'])
+
+    def test_warning_type(self):
+        self.assertEqual(warning_type(
+            "Attempt to create a client with an invalid phone number format."),
+            "invalid phone number format")
+        self.assertEqual(warning_type(
+            "Attempt to edit order 15 without selecting a customer"),
+            "without selecting a customer")
+
+    def test_analyze(self):
+        old = self.write_log('service.log.1.gz', LOG_LINES[:3], compress=True)
+        current = self.write_log('service.log', LOG_LINES[3:])
+
+        report = analyze([old, current])
+
+        self.assertEqual(report['lines'], len(LOG_LINES))
+        self.assertEqual(report['unparsed'], 1)
+
+        create_order = report['operations']['create order']
+        self.assertEqual(create_order['succeeded'], 1)
+        self.assertEqual(create_order['latency']['max_ms'], 30.0)
+
+        create_customer = report['operations']['create customer']
+        self.assertEqual((create_customer['started'], create_customer['succeeded'],
+                          create_customer['rejected']), (2, 1, 1))
+        self.assertEqual(report['operations']['update customer']['rejected'], 1)
+
+        self.assertEqual(report['warnings'], {
+            'invalid phone number format': 1,
+            'empty name field': 1,
+            'existing phone number in the database': 1,
+        })
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,105 @@
+import gzip
+import logging
+import os
+import tempfile
+import time
+import unittest
+from logger_config import CompressingRotatingFileHandler
+
+
+class TestCompressingRotatingFileHandler(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp.name, 'service.log')
+        self.logger = logging.getLogger(f'test-rotation-{id(self)}')
+        self.logger.propagate = False
+        self.logger.setLevel(logging.INFO)
+        self.handlers = []
+
+    def tearDown(self):
+        for handler in self.handlers:
+            self.logger.removeHandler(handler)
+            handler.close()
+        self.tmp.cleanup()
+
+    def make_handler(self, **kwargs):
+        handler = CompressingRotatingFileHandler(self.path, **kwargs)
+        self.logger.addHandler(handler)
+        self.handlers.append(handler)
+        return handler
+
+    def test_size_rollover_is_compressed(self):
+        handler = self.make_handler(max_bytes=200)
+
+        for number in range(20):
+            self.logger.info(f"Order successfully created. ID: {number}")
+        handler.flush_background()
+
+        segments = handler.segments()
+        self.assertGreater(len(segments), 1)
+        self.assertTrue(all(path.endswith('.gz') for path in segments))
+        self.assertLess(os.path.getsize(self.path), 200)
+
+        text = ''
+        for path in segments:
+            with gzip.open(path, 'rt', encoding='utf-8') as segment:
+                text += segment.read()
+        with open(self.path, encoding='utf-8') as current:
+            text += current.read()
+        self.assertEqual(text.count('successfully created'), 20)
+        self.assertIn('ID: 0\n', text.splitlines(keepends=True)[0])
+
+    def test_time_rollover(self):
+        handler = self.make_handler(rotate_interval=3600)
+
+        self.logger.info("before rotation")
+        handler.rollover_at = time.time() - 1
+        self.logger.info("after rotation")
+        handler.flush_background()
+
+        self.assertEqual(len(handler.segments()), 1)
+        with open(self.path, encoding='utf-8') as current:
+            self.assertEqual(current.read(), "after rotation\n")
+
+    def test_retention_by_bytes_and_age(self):
+        handler = self.make_handler(max_bytes=100, retention_bytes=150,
+                                    retention_days=1)
+
+        for number in range(30):
+            self.logger.info(f"Start creating order. Customer: {number}")
+        handler.flush_background()
+
+        segments = handler.segments()
+        self.assertLessEqual(sum(os.path.getsize(path) for path in segments), 150)
+
+        # Самый старый из оставшихся сегментов устарел и будет удалён
+        old_time = time.time() - 2 * 86400
+        os.utime(segments[0], (old_time, old_time))
+        handler.doRollover()
+        handler.flush_background()
+
+        self.assertNotIn(segments[0], handler.segments())
+
+    def test_legacy_numbered_segments(self):
+        # Файлы, оставшиеся от RotatingFileHandler до перехода на сегменты по времени
+        for number, size in ((2, 100), (1, 100)):
+            with open(f'{self.path}.{number}', 'w') as legacy:
+                legacy.write('x' * size)
+        handler = self.make_handler(max_bytes=100, retention_bytes=300)
+        handler.flush_background()
+
+        self.assertEqual(handler.segments(), [f'{self.path}.2.gz', f'{self.path}.1.gz'])
+        for number in range(30):
+            self.logger.info(f"Start creating order. Customer: {number}")
+        handler.flush_background()
+
+        # Старые сегменты удаляются первыми
+        segments = handler.segments()
+        self.assertNotIn(f'{self.path}.2.gz', segments)
+        self.assertNotIn(f'{self.path}.1.gz', segments)
+        self.assertLessEqual(sum(os.path.getsize(path) for path in segments), 300)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -1,22 +1,20 @@
+import itertools
 import unittest
-from datetime import datetime, timedelta
-from app import app, db, Order, Customer, Service
+from unittest import mock
+from datetime import date, datetime, timedelta
+from sqlalchemy import text
+from werkzeug.datastructures import MultiDict
+from testing import DatabaseTestCase
+from app import app, db, order_events, Order, OrderLine, OrderArchive, Customer, Service
+from archive import archive_orders
+from models import ORDER_SORTS, IdempotencyKey
+from schemas import order_schema, order_line_schema
 
 
-class TestService(unittest.TestCase):
+class TestService(DatabaseTestCase):
 
-    def setUp(self):
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-        self.client = app.test_client()
-
-        with app.app_context():
-            db.create_all()
-            self.create_test_data()
-
-    def create_test_data(self):
+    @classmethod
+    def seed(cls):
         customer1 = Customer(
             name="Иванов Иван Иванович",
             phone_number="+79500000001",
@@ -40,18 +38,12 @@ class TestService(unittest.TestCase):
         )
 
         db.session.add_all([customer1, customer2, service1, service2])
-        db.session.commit()
+        db.session.flush()
 
-        self.customer1_id = customer1.id
-        self.customer2_id = customer2.id
-        self.service1_id = service1.id
-        self.service2_id = service2.id
-
-    def tearDown(self):
-        with app.app_context():
-            db.session.remove()
-            db.drop_all()
-            db.engine.dispose()
+        cls.customer1_id = customer1.id
+        cls.customer2_id = customer2.id
+        cls.service1_id = service1.id
+        cls.service2_id = service2.id
 
     def test_health_check(self):
         response = self.client.get('/health')
@@ -77,6 +69,189 @@ class TestService(unittest.TestCase):
             self.assertEqual(order.service_id, self.service1_id)
             self.assertEqual(order.order_date, datetime.now().date())
 
+    def test_add_order_with_several_lines(self):
+        response = self.client.post('/add-order', data=MultiDict([
+            ('customer_id', str(self.customer1_id)),
+            ('service_id', str(self.service1_id)), ('quantity', '2'),
+            ('service_id', str(self.service2_id)), ('quantity', '1'),
+            ('service_id', ''), ('quantity', '1'),
+            ('order_date', datetime.now().date().strftime('%Y-%m-%d')),
+        ]))
+
+        self.assertEqual(response.status_code, 302)
+
+        with app.app_context():
+            order = Order.query.one()
+            self.assertEqual(
+                [(line.service_id, line.quantity, line.price_kopecks)
+                 for line in order.lines],
+                [(self.service1_id, 2, 500000), (self.service2_id, 1, 1000000)])
+            self.assertEqual(order.total_kopecks, 2000000)
+            self.assertEqual(Order.total_revenue(), 20000)
+
+        response = self.client.get('/list-orders')
+        self.assertIn('20000.00 руб.', response.data.decode('utf-8'))
+
+    def test_add_order_replay_with_idempotency_key(self):
+        data = {
+            'customer_id': str(self.customer1_id),
+            'service_id': str(self.service1_id),
+            'idempotency_key': 'form-key-0001',
+        }
+        first = self.client.post('/add-order', data=data)
+        replay = self.client.post('/add-order', data=data)
+        # Ключ из заголовка (API) действует так же, как поле формы
+        api_replay = self.client.post(
+            '/add-order', headers={'Idempotency-Key': 'form-key-0001'},
+            data={k: v for k, v in data.items() if k != 'idempotency_key'})
+
+        self.assertEqual(first.status_code, 302)
+        self.assertEqual(replay.status_code, 302)
+        self.assertEqual(replay.location, first.location)
+        self.assertEqual(api_replay.status_code, 302)
+
+        conflict = self.client.post('/add-order', data=dict(
+            data, service_id=str(self.service2_id)))
+        self.assertEqual(conflict.status_code, 422)
+
+        with app.app_context():
+            self.assertEqual(Order.query.count(), 1)
+
+        # Другой ключ - другой заказ
+        self.client.post('/add-order', data=dict(
+            data, idempotency_key='form-key-0002'))
+        with app.app_context():
+            self.assertEqual(Order.query.count(), 2)
+
+    def test_add_order_concurrent_reuse_with_other_data(self):
+        from idempotency import IdempotencyConflict
+        # Одновременный запрос с тем же ключом и другими данными сохранился
+        # первым: первая проверка его ещё не видела, commit падает на ключе
+        with app.app_context():
+            db.session.add(IdempotencyKey(
+                endpoint='add_order', key='form-key-0003', request_hash='other',
+                entity_id=1, created_at=datetime.now(),
+                expires_at=datetime.now() + timedelta(hours=1)))
+            db.session.commit()
+
+        with mock.patch('app.find_result',
+                        side_effect=[None, IdempotencyConflict('form-key-0003')]):
+            response = self.client.post('/add-order', data={
+                'customer_id': str(self.customer1_id),
+                'service_id': str(self.service1_id),
+                'idempotency_key': 'form-key-0003',
+            })
+
+        self.assertEqual(response.status_code, 422)
+        self.assertIn('Эта форма уже была отправлена с другими данными', response.data.decode('utf-8'))
+        with app.app_context():
+            self.assertEqual(Order.query.count(), 0)
+
+    def test_idempotency_key_expires(self):
+        from idempotency import find_result, remember, request_hash
+        with app.app_context():
+            now = datetime(2026, 1, 1, 12, 0)
+            remember('add_order', 'key-00001', 'hash', 1, ttl=60, now=now)
+            db.session.commit()
+            self.assertEqual(find_result('add_order', 'key-00001', 'hash',
+                                         now=now + timedelta(seconds=59)), 1)
+            self.assertIsNone(find_result('add_order', 'key-00001', 'hash',
+                                          now=now + timedelta(seconds=60)))
+
+            # Просроченный ключ удаляется при записи следующего
+            remember('add_order', 'key-00001', 'hash', 2, ttl=60,
+                     now=now + timedelta(seconds=120))
+            db.session.commit()
+            self.assertEqual(find_result('add_order', 'key-00001', 'hash',
+                                         now=now + timedelta(seconds=121)), 2)
+
+        self.assertEqual(request_hash(MultiDict([('a', '1'), ('b', '2')])),
+                         request_hash(MultiDict([('b', '2'), ('a', '1'),
+                                                 ('idempotency_key', 'x')])))
+
+    def test_add_order_invalid_quantity(self):
+        response = self.client.post('/add-order', data={
+            'customer_id': str(self.customer1_id),
+            'service_id': str(self.service1_id),
+            'quantity': '0',
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Количество должно быть целым числом",
+                      response.data.decode('utf-8'))
+
+        with app.app_context():
+            self.assertEqual(Order.query.count(), 0)
+
+    def test_update_order_keeps_line_price(self):
+        with app.app_context():
+            order = Order(
+                customer_id=self.customer1_id,
+                service_id=self.service1_id,
+                order_date=datetime.now().date()
+            )
+            db.session.add(order)
+            db.session.get(Service, self.service1_id).price = 7000
+            db.session.commit()
+            order_id = order.id
+
+        response = self.client.post(f'/update-order/{order_id}', data=MultiDict([
+            ('customer_id', str(self.customer1_id)),
+            ('service_id', str(self.service1_id)), ('quantity', '3'),
+            ('order_date', datetime.now().date().strftime('%Y-%m-%d')),
+        ]))
+
+        self.assertEqual(response.status_code, 302)
+
+        with app.app_context():
+            lines = OrderLine.query.filter_by(order_id=order_id).all()
+            self.assertEqual([(line.quantity, line.price_kopecks)
+                              for line in lines], [(3, 500000)])
+
+    def test_update_order_version_conflict(self):
+        with app.app_context():
+            order = Order(customer_id=self.customer1_id,
+                          service_id=self.service1_id,
+                          order_date=datetime.now().date())
+            db.session.add(order)
+            db.session.commit()
+            order_id = order.id
+            self.assertEqual(order.version, 1)
+
+        form = MultiDict([
+            ('customer_id', str(self.customer1_id)),
+            ('service_id', str(self.service1_id)), ('quantity', '2'),
+            ('version', '1'),
+        ])
+        saved = self.client.post(f'/update-order/{order_id}', data=form)
+        stale = self.client.post(f'/update-order/{order_id}', data=dict(
+            form, quantity='5'))
+
+        self.assertEqual(saved.status_code, 302)
+        self.assertEqual(stale.status_code, 409)
+        with app.app_context():
+            order = db.session.get(Order, order_id)
+            # Одно сохранение - одна новая версия
+            self.assertEqual(order.version, 2)
+            self.assertEqual(order.lines[0].quantity, 2)
+
+    def test_line_change_bumps_order_version(self):
+        with app.app_context():
+            order = Order(customer_id=self.customer1_id,
+                          service_id=self.service1_id,
+                          order_date=datetime.now().date())
+            db.session.add(order)
+            db.session.commit()
+
+            # Сумма заказа не меняется, меняется только строка
+            order.lines[0].service_id = self.service2_id
+            db.session.commit()
+            self.assertEqual(order.version, 2)
+
+            order.lines[0].quantity = 1
+            db.session.commit()
+            self.assertEqual(order.version, 2)
+
     def test_add_order_empty_customer(self):
         response = self.client.post('/add-order', data={
             'customer_id': '',
@@ -146,6 +321,32 @@ class TestService(unittest.TestCase):
         response_text = response.data.decode('utf-8')
         self.assertIn("Некорректный формат даты", response_text)
 
+    def test_validate_many_orders(self):
+        future_date = datetime.now().date() + timedelta(days=1)
+        rows = [
+            {'customer_id': str(self.customer1_id), 'order_date': ''},
+            {'customer_id': '99999',
+             'order_date': future_date.strftime('%Y-%m-%d')},
+        ]
+        lines = [
+            {'service_id': str(self.service1_id), 'quantity': '2'},
+            {'service_id': '', 'quantity': 'много'},
+        ]
+
+        with app.app_context():
+            errors = order_schema.validate_many(rows)
+            line_errors = order_line_schema.validate_many(lines)
+
+        self.assertEqual(errors[0], [])
+        self.assertEqual(
+            [(error.field, error.message) for error in errors[1]], [
+                ('customer_id', "Выбранный клиент не существует в базе данных"),
+                ('order_date', "Дата заказа не может быть в будущем"),
+            ])
+        self.assertEqual(line_errors[0], [])
+        self.assertEqual(
+            [error.field for error in line_errors[1]], ['service_id', 'quantity'])
+
     def test_update_order_success(self):
         with app.app_context():
             order = Order(
@@ -319,6 +520,175 @@ class TestService(unittest.TestCase):
             deleted_order = db.session.get(Order, order_id)
             self.assertIsNone(deleted_order)
 
+            archived_order = db.session.get(OrderArchive, order_id)
+            self.assertIsNotNone(archived_order.deleted_at)
+            self.assertEqual(len(archived_order.lines), 1)
+            self.assertEqual(Order.total_revenue(include_archive=True), 0)
+
+    def test_order_changes_are_published(self):
+        subscription = order_events.subscribe()
+        self.addCleanup(order_events.unsubscribe, subscription)
+
+        self.client.post('/add-order', data={
+            'customer_id': str(self.customer1_id),
+            'service_id': str(self.service1_id),
+        })
+        created = subscription.get(timeout=0)
+        self.assertEqual(created.type, 'create')
+        self.assertIn(f'data-order-id="{created.data["id"]}"', created.data['html'])
+        self.assertIn('Реклама в соцсетях', created.data['html'])
+        self.assertEqual(created.data['order_date'], date.today().isoformat())
+        self.assertIn(f'data-order-date="{date.today().isoformat()}"', created.data['html'])
+
+        order_id = created.data['id']
+        self.client.post(f'/update-order/{order_id}', data={
+            'customer_id': str(self.customer2_id),
+            'service_id': str(self.service2_id),
+        })
+        updated = subscription.get(timeout=0)
+        self.assertEqual((updated.type, updated.data['id']), ('update', order_id))
+        self.assertIn('Контекстная реклама', updated.data['html'])
+
+        self.client.get(f'/delete-order/{order_id}')
+        self.assertEqual(subscription.get(timeout=0).data, {'id': order_id})
+
+        # Переподключившийся клиент получает пропущенные события
+        response = self.client.get('/orders/events',
+                                   headers={'Last-Event-ID': str(updated.id)})
+        body = iter(response.response)
+        self.assertEqual(response.mimetype, 'text/event-stream')
+        self.assertEqual(next(body), b'retry: 5000\n\n')
+        self.assertIn(b'event: delete', next(body))
+        response.close()
+
+    def test_archive_orders_in_batches(self):
+        self.create_filter_orders()
+
+        with app.app_context():
+            moved = archive_orders(date(2024, 3, 1), batch_size=1)
+
+            self.assertEqual(moved, 2)
+            self.assertEqual(self.search_dates(), ['2024-03-10'])
+            self.assertEqual(OrderArchive.query.count(), 2)
+            self.assertEqual(Order.total_revenue(), 15000)
+            self.assertEqual(Order.total_revenue(include_archive=True), 30000)
+            self.assertEqual(Order.total_revenue(
+                Order.customer_id == self.customer1_id,
+                include_archive=True), 20000)
+
+            # id архивного заказа не выдаётся новому
+            order = Order(customer_id=self.customer1_id,
+                          service_id=self.service1_id,
+                          order_date=date(2024, 4, 1))
+            db.session.add(order)
+            db.session.commit()
+            self.assertIsNone(db.session.get(OrderArchive, order.id))
+
+    def test_archive_orders_command(self):
+        self.create_filter_orders()
+
+        result = app.test_cli_runner().invoke(
+            args=['archive-orders', '--before', '2024-02-01'])
+
+        self.assertIn('Перенесено в архив заказов: 1', result.output)
+        with app.app_context():
+            self.assertEqual(Order.query.count(), 2)
+
+
+    def create_filter_orders(self):
+        with app.app_context():
+            db.session.add_all([
+                Order(customer_id=self.customer1_id,
+                      service_id=self.service1_id,
+                      order_date=date(2024, 1, 10)),
+                Order(customer_id=self.customer2_id,
+                      service_id=self.service2_id,
+                      order_date=date(2024, 2, 10)),
+                Order(customer_id=self.customer1_id,
+                      lines=[OrderLine.for_service(self.service1_id, 3)],
+                      order_date=date(2024, 3, 10)),
+            ])
+            db.session.commit()
+
+    def search_dates(self, **kwargs):
+        with app.app_context():
+            return [order.order_date.strftime('%Y-%m-%d')
+                    for order in Order.search(**kwargs)]
+
+    def test_order_total_is_stored(self):
+        self.create_filter_orders()
+
+        with app.app_context():
+            order = Order.query.filter_by(order_date=date(2024, 3, 10)).one()
+            self.assertEqual(order.total_kopecks, 1500000)
+
+            order.lines[0].quantity = 2
+            db.session.commit()
+            self.assertEqual(order.total_kopecks, 1000000)
+
+    def test_search_orders_filters(self):
+        self.create_filter_orders()
+
+        self.assertEqual(self.search_dates(), [
+            '2024-03-10', '2024-02-10', '2024-01-10'])
+        self.assertEqual(self.search_dates(
+            date_from=date(2024, 2, 1), date_to=date(2024, 2, 28)),
+            ['2024-02-10'])
+        self.assertEqual(self.search_dates(customer_id=self.customer1_id),
+                         ['2024-03-10', '2024-01-10'])
+        self.assertEqual(self.search_dates(service_id=self.service2_id),
+                         ['2024-02-10'])
+        self.assertEqual(self.search_dates(price_min=1000000),
+                         ['2024-03-10', '2024-02-10'])
+        self.assertEqual(self.search_dates(price_max=1000000, sort='price',
+                                           descending=False),
+                         ['2024-01-10', '2024-02-10'])
+        self.assertEqual(self.search_dates(sort='customer', descending=False),
+                         ['2024-01-10', '2024-03-10', '2024-02-10'])
+
+    def test_list_orders_filters_from_query_string(self):
+        self.create_filter_orders()
+
+        response = self.client.get(
+            f'/list-orders?customer_id={self.customer2_id}&date_from=2024-01-01'
+            '&price_min=abc&sort=price&direction=asc')
+
+        self.assertEqual(response.status_code, 200)
+        response_text = response.data.decode('utf-8')
+        self.assertIn("10.02.2024", response_text)
+        self.assertNotIn("10.01.2024", response_text)
+        self.assertNotIn("10.03.2024", response_text)
+
+    def test_search_orders_uses_indexes(self):
+        filters = {
+            'date_from': date(2024, 1, 1),
+            'date_to': date(2024, 12, 31),
+            'customer_id': 1,
+            'service_id': 1,
+            'price_min': 100,
+            'price_max': 1000000,
+        }
+
+        with app.app_context():
+            for count in range(len(filters) + 1):
+                for names in itertools.combinations(filters, count):
+                    for sort, descending in itertools.product(
+                            ORDER_SORTS, (True, False)):
+                        query = Order.search(
+                            sort=sort, descending=descending,
+                            **{name: filters[name] for name in names})
+                        statement = query.statement.compile(
+                            db.engine, compile_kwargs={'literal_binds': True})
+                        plan = [row[-1] for row in db.session.execute(
+                            text(f"EXPLAIN QUERY PLAN {statement}"))]
+
+                        with self.subTest(filters=names, sort=sort,
+                                          descending=descending):
+                            self.assertFalse(
+                                [step for step in plan
+                                 if 'TEMP B-TREE' in step or
+                                 (step.startswith('SCAN') and 'INDEX' not in step)],
+                                plan)
 
 if __name__ == '__main__':
     unittest.main()
@@ -1,33 +1,23 @@
 import unittest
 from datetime import datetime, timedelta
+from testing import DatabaseTestCase
 from app import app, db, Order, Customer, Service
 
 
-class TestService(unittest.TestCase):
+class TestService(DatabaseTestCase):
 
-    def setUp(self):
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-        self.client = app.test_client()
-
-        with app.app_context():
-            db.create_all()
-            # Создаем тестовые данные
-            self.create_test_data()
-
-    def create_test_data(self):
+    @classmethod
+    def seed(cls):
         """Создает тестовых клиентов и услуги"""
         # Создаем тестовых клиентов
         customer1 = Customer(
             name="TEST_Клиент_1",
-            phone="+79990000001",
+            phone_number="+79990000001",
             email="test1@example.com"
         )
         customer2 = Customer(
             name="TEST_Клиент_2",
-            phone="+79990000002",
+            phone_number="+79990000002",
             email="test2@example.com"
         )
 
@@ -44,19 +34,13 @@ class TestService(unittest.TestCase):
         )
 
         db.session.add_all([customer1, customer2, service1, service2])
-        db.session.commit()
+        db.session.flush()
 
         # Сохраняем ID для использования в тестах
-        self.customer1_id = customer1.id
-        self.customer2_id = customer2.id
-        self.service1_id = service1.id
-        self.service2_id = service2.id
-
-    def tearDown(self):
-        with app.app_context():
-            db.session.remove()
-            db.drop_all()
-            db.engine.dispose()
+        cls.customer1_id = customer1.id
+        cls.customer2_id = customer2.id
+        cls.service1_id = service1.id
+        cls.service2_id = service2.id
 
     def test_health_check(self):
         response = self.client.get('/health')
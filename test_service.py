@@ -1,27 +1,11 @@
 import unittest
 from datetime import datetime
+from decimal import Decimal
+from testing import DatabaseTestCase
 from app import app, db, Service, Order
 
 
-class TestService(unittest.TestCase):
-
-    def setUp(self):
-        app.config['TESTING'] = True
-        app.config['SQLALCHEMY_DATABASE_URI'] = 'sqlite:///:memory:'
-        app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
-
-        self.client = app.test_client()
-
-        with app.app_context():
-            db.engine.dispose()
-            db.session.remove()
-            db.create_all()
-
-    def tearDown(self):
-        with app.app_context():
-            db.session.remove()
-            db.drop_all()
-            db.engine.dispose()
+class TestService(DatabaseTestCase):
 
     def test_health_check(self):
         response = self.client.get('/health')
@@ -86,6 +70,55 @@ class TestService(unittest.TestCase):
         self.assertIn('Стоимость', response_text)
         self.assertIn('обязательно для заполнения', response_text)
 
+    def test_add_service_price_with_kopecks(self):
+        response = self.client.post('/add-service', data={
+            'service_name': 'Реклама у блогера',
+            'description': 'Рекламная интеграция',
+            'price': '1 500,50'
+        })
+
+        self.assertEqual(response.status_code, 302)
+
+        with app.app_context():
+            service = Service.query.first()
+            self.assertEqual(service.price_kopecks, 150050)
+            self.assertEqual(service.price, Decimal('1500.50'))
+
+    def test_add_service_invalid_price(self):
+        response = self.client.post('/add-service', data={
+            'service_name': 'Реклама у блогера',
+            'description': 'Рекламная интеграция',
+            'price': '-100'
+        })
+
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("Стоимость не может быть отрицательной",
+                      response.data.decode('utf-8'))
+
+        with app.app_context():
+            self.assertIsNone(Service.query.first())
+
+    def test_total_revenue_is_exact(self):
+        with app.app_context():
+            service = Service(
+                service_name='Баннер',
+                description='Показ баннера',
+                price='0.10'
+            )
+            db.session.add(service)
+            db.session.commit()
+
+            db.session.add_all([
+                Order(customer_id=1, service_id=service.id,
+                      order_date=datetime.now().date())
+                for _ in range(3)
+            ])
+            db.session.commit()
+
+            self.assertEqual(Order.total_revenue(), Decimal('0.30'))
+            self.assertEqual(
+                Order.total_revenue(Order.service_id == 0), Decimal('0'))
+
     def test_update_service_success(self):
         with app.app_context():
             service = Service(
@@ -112,6 +145,25 @@ class TestService(unittest.TestCase):
                              'Рекламная СУПЕР-интеграция')
             self.assertEqual(update_service.price, 30000)
 
+    def test_update_service_version_conflict(self):
+        with app.app_context():
+            service = Service(service_name='Реклама у блогера',
+                              description='Рекламная интеграция', price=30000)
+            db.session.add(service)
+            db.session.commit()
+            service_id = service.id
+
+        form = {'service_name': 'Реклама у блогера',
+                'description': 'Рекламная интеграция', 'version': '1'}
+        self.client.post(f'/update-service/{service_id}', data=dict(form, price=35000))
+        response = self.client.post(f'/update-service/{service_id}',
+                                    data=dict(form, price=25000))
+
+        self.assertEqual(response.status_code, 409)
+        with app.app_context():
+            service = db.session.get(Service, service_id)
+            self.assertEqual((service.price, service.version), (35000, 2))
+
     def test_update_service_empty_name(self):
         with app.app_context():
             service = Service(
@@ -220,20 +272,40 @@ class TestService(unittest.TestCase):
             db.session.commit()
 
             service_id = service.id
-            orders_count = Order.query.filter_by(
-                service_id=service_id).count()
 
         response = self.client.get(
             f'/delete-service/{service_id}', follow_redirects=True)
 
         self.assertEqual(response.status_code, 200)
-        self.assertIn(f"Невозможно удалить услугу. Есть оформленные заказы с этой услугой: {orders_count}".encode(
+        self.assertIn("Невозможно удалить услугу. Есть оформленные заказы с этой услугой".encode(
             'utf-8'), response.data)
 
         with app.app_context():
             service_still_exists = db.session.get(Service, service_id)
             self.assertIsNotNone(service_still_exists)
 
+    def test_delete_selected_services(self):
+        with app.app_context():
+            services = [Service(service_name=f'Услуга {i}', description='',
+                                price=100) for i in range(3)]
+            db.session.add_all(services)
+            db.session.flush()
+            ids = [service.id for service in services]
+            db.session.add(Order(customer_id=1, service_id=ids[1],
+                                 order_date=datetime.now().date()))
+            db.session.commit()
+
+        response = self.client.post('/delete-services', data={
+            'ids': [str(service_id) for service_id in ids]}, follow_redirects=True)
+
+        html = response.data.decode('utf-8')
+        self.assertIn('Удалено услуг: 2', html)
+        self.assertIn('Не удалены услуги, которые есть в заказах: 1', html)
+        with app.app_context():
+            self.assertEqual(Service.referenced_ids(ids), {ids[1]})
+            self.assertEqual(db.session.scalars(db.select(Service.id).where(
+                Service.id.in_(ids))).all(), [ids[1]])
+
 
 if __name__ == '__main__':
     unittest.main()
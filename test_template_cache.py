@@ -0,0 +1,66 @@
+import os
+import tempfile
+import unittest
+from flask import Flask, render_template
+from jinja2 import TemplateSyntaxError
+from template_cache import precompile_templates, setup_template_cache
+
+
+class TestTemplateCache(unittest.TestCase):
+
+    def setUp(self):
+        self.tmp = tempfile.TemporaryDirectory()
+        self.templates = os.path.join(self.tmp.name, 'templates')
+        self.cache_dir = os.path.join(self.tmp.name, 'cache')
+        os.makedirs(self.templates)
+        self.write('base.html', '<title>{% block title %}{% endblock %}</title>')
+        self.write('page.html', "{% extends 'base.html' %}{% block title %}{{ name }}{% endblock %}")
+
+    def tearDown(self):
+        self.tmp.cleanup()
+
+    def write(self, name, source):
+        with open(os.path.join(self.templates, name), 'w', encoding='utf-8') as template:
+            template.write(source)
+
+    def make_app(self, **config):
+        app = Flask(__name__, template_folder=self.templates)
+        app.config.update(dict(TEMPLATE_CACHE_DIR=self.cache_dir,
+                               TEMPLATES_AUTO_RELOAD=False), **config)
+        setup_template_cache(app)
+        return app
+
+    def test_precompile_fills_cache(self):
+        app = self.make_app()
+        self.assertFalse(app.jinja_env.auto_reload)
+        self.assertEqual(precompile_templates(app), ['base.html', 'page.html'])
+        self.assertEqual(len(os.listdir(self.cache_dir)), 2)
+
+        # Новый процесс (новое приложение) рендерит из готового байткода
+        app = self.make_app()
+        with app.test_request_context():
+            self.assertEqual(render_template('page.html', name='Заказы'),
+                             '<title>Заказы</title>')
+
+    def test_changed_template_is_recompiled(self):
+        precompile_templates(self.make_app())
+        self.write('page.html', "{% extends 'base.html' %}{% block title %}[{{ name }}]{% endblock %}")
+
+        app = self.make_app()
+        with app.test_request_context():
+            self.assertEqual(render_template('page.html', name='Заказы'),
+                             '<title>[Заказы]</title>')
+
+    def test_syntax_error_fails_precompile(self):
+        self.write('broken.html', '{% if %}')
+        with self.assertRaises(TemplateSyntaxError):
+            precompile_templates(self.make_app())
+
+    def test_cache_disabled(self):
+        app = self.make_app(TEMPLATE_CACHE_DIR='', TEMPLATES_AUTO_RELOAD=True)
+        self.assertIsNone(app.jinja_env.bytecode_cache)
+        self.assertTrue(app.jinja_env.auto_reload)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,32 @@
+import unittest
+from testing import DatabaseTestCase
+from app import app, db, Customer
+
+
+class TestDatabaseTestCase(DatabaseTestCase):
+
+    @classmethod
+    def seed(cls):
+        customer = Customer(name="Общий клиент", phone_number="+79500000010")
+        db.session.add(customer)
+        db.session.flush()
+        cls.customer_id = customer.id
+
+    def test_uses_separate_database(self):
+        with app.app_context():
+            self.assertNotIn('instance', str(db.engine.url))
+            self.assertIn('ad-tests-', str(db.engine.url))
+
+    def test_1_commit_in_test(self):
+        with app.app_context():
+            db.session.add(Customer(name="Клиент теста", phone_number="+79500000011"))
+            db.session.commit()
+            self.assertEqual(Customer.query.count(), 2)
+
+    def test_2_changes_are_rolled_back(self):
+        with app.app_context():
+            self.assertEqual([c.id for c in Customer.query.all()], [self.customer_id])
+
+
+if __name__ == '__main__':
+    unittest.main()
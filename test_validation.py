@@ -0,0 +1,116 @@
+import unittest
+from datetime import date
+import validation
+from validation import (ValidDate, ReferenceDates, normalize_phone,
+                        validate_phones, validate_birth_dates,
+                        validate_order_dates, validate_prices, parse_price)
+
+
+class TestValidation(unittest.TestCase):
+
+    def setUp(self):
+        self.today = date(2025, 6, 15)
+        self.refs = ReferenceDates(self.today)
+
+    def test_normalize_phone(self):
+        self.assertEqual(normalize_phone('+79500000001'), '+79500000001')
+        self.assertEqual(normalize_phone('89500000001'), '+79500000001')
+        self.assertEqual(normalize_phone('8 (950) 000-00-01'), '+79500000001')
+        self.assertIsNone(normalize_phone('123'))
+        self.assertIsNone(normalize_phone(''))
+
+    def test_validate_phones(self):
+        codes = validate_phones(['+79500000001', '8-950-000-00-01', '123', ''])
+        self.assertEqual(
+            codes, [None, None, validation.INVALID_PHONE, validation.REQUIRED])
+
+    def test_parse_price(self):
+        self.assertEqual(parse_price('1 500,5'), 150050)
+        self.assertEqual(parse_price('1500.50'), 150050)
+        self.assertEqual(parse_price(30000), 3000000)
+        self.assertEqual(parse_price(0.1), 10)
+        self.assertEqual(
+            validate_prices(['', '10', '-1', '1.234', 'abc']),
+            [validation.REQUIRED, None, validation.NEGATIVE_PRICE,
+             validation.INVALID_PRICE, validation.INVALID_PRICE])
+
+    def test_birth_date_messages(self):
+        self.assertEqual(
+            ValidDate.is_valid_birth_date('1990-01-01', self.refs), (True, ''))
+        self.assertEqual(
+            ValidDate.is_valid_birth_date('', self.refs),
+            (False, "Поле \"Дата рождения\" обязательно для заполнения"))
+        self.assertEqual(
+            ValidDate.is_valid_birth_date('01.01.1990', self.refs),
+            (False, "Некорректный формат даты"))
+        self.assertEqual(
+            ValidDate.is_valid_birth_date('1900-01-01', self.refs),
+            (False, "Недопустимая дата рождения (позднее 1905г.)"))
+        self.assertEqual(
+            ValidDate.is_valid_birth_date('2007-06-16', self.refs),
+            (False, "Клиент должен быть совершеннолетним (18 лет)"))
+        self.assertEqual(
+            ValidDate.is_valid_birth_date('2007-06-15', self.refs), (True, ''))
+        # strptime в маршрутах не примет пробелы и не-ASCII цифры
+        for value in (' 1990-01-01', '1990-01-01\n', '١٩٩٠-01-01'):
+            self.assertEqual(
+                ValidDate.is_valid_birth_date(value, self.refs),
+                (False, "Некорректный формат даты"))
+
+    def test_birth_date_leap_day(self):
+        refs = ReferenceDates(date(2026, 2, 28))
+        self.assertFalse(ValidDate.is_valid_birth_date('2008-02-29', refs)[0])
+        refs = ReferenceDates(date(2026, 3, 1))
+        self.assertTrue(ValidDate.is_valid_birth_date('2008-02-29', refs)[0])
+
+    def test_batch_matches_single_value_checks(self):
+        values = ['1990-01-01', '2030-01-01', '1900-05-05', '2010-01-01',
+                  '', '   ', 'invalid', '1990.1.1', '1990-1-1'] * 200
+
+        birth_codes = validate_birth_dates(values, today=self.today)
+        order_codes = validate_order_dates(values, today=self.today)
+
+        self.assertEqual(len(birth_codes), len(values))
+        self.assertEqual(birth_codes[:9], [
+            None, validation.FUTURE_DATE, validation.TOO_EARLY_DATE,
+            validation.UNDERAGE, validation.REQUIRED, validation.REQUIRED,
+            validation.INVALID_DATE, validation.INVALID_DATE, None])
+        self.assertEqual(order_codes[:9], [
+            None, validation.FUTURE_DATE, None, None, None, None,
+            validation.INVALID_DATE, validation.INVALID_DATE, None])
+
+        for value, code in zip(values, birth_codes):
+            is_valid, _ = ValidDate.is_valid_birth_date(value, self.refs)
+            self.assertEqual(is_valid, code is None)
+
+    def test_batch_matches_scalar_on_iso_extensions(self):
+        # NumPy принимает расширенные годы ISO 8601, однострочная проверка - нет
+        values = ['+001990-01', '-000100-01', '0000-01-01', '1990-01-01',
+                  '+1990-01-01'] * (validation.NUMPY_MIN_BATCH // 5)
+        refs = self.refs
+        self.assertEqual(
+            validate_birth_dates(values, today=self.today),
+            [validation._birth_date_code(validation._parse_date(value), refs)
+             for value in values])
+        self.assertEqual(
+            validate_order_dates(values, today=self.today),
+            [validation._order_date_code(validation._parse_date(value), refs)
+             for value in values])
+        self.assertEqual(validate_birth_dates(values, today=self.today)[:5], [
+            validation.INVALID_DATE, validation.INVALID_DATE,
+            validation.INVALID_DATE, None, validation.INVALID_DATE])
+
+    def test_batch_without_numpy(self):
+        values = ['1990-01-01', '2030-01-01', '', 'invalid'] * 500
+        expected = validate_birth_dates(values, today=self.today)
+
+        numpy_module, validation.np = validation.np, None
+        try:
+            self.assertEqual(
+                validate_birth_dates(values, today=self.today), expected)
+        finally:
+            validation.np = numpy_module
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,211 @@
+"""Общая база для тестов, работающих с базой данных.
+
+Каждый процесс тестов получает собственный файл SQLite во временном
+каталоге, поэтому модули можно запускать параллельно, а рабочая база
+instance/flask.db не затрагивается. Схема создаётся один раз за процесс
+(create_all и отметка ревизии, см. db_schema.bootstrap_schema) или
+копируется из готового шаблона, если его подготовил запуск
+python testing.py.
+
+DatabaseTestCase открывает для класса тестов одно соединение и
+транзакцию, в которой seed() создаёт общие данные класса. Каждый тест
+идёт внутри SAVEPOINT, который откатывается после теста, так что commit
+в коде приложения виден только этому тесту.
+
+Модуль нужно импортировать раньше app: адрес тестовой базы задаётся
+через окружение до настройки приложения (для pytest это делает
+conftest.py).
+
+    python testing.py [-j ПРОЦЕССОВ] [модули ...]
+"""
+import argparse
+import atexit
+import os
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+DATABASE_ENV = 'SQLALCHEMY_DATABASE_URI'
+# Файл уже созданной базы, который процессы тестов копируют себе
+TEMPLATE_ENV = 'TEST_TEMPLATE_DB'
+TEST_DB_PREFIX = 'ad-tests-'
+
+_database_path = None
+_prepared = False
+
+
+def configure():
+    """Направляет приложение в отдельный файл базы этого процесса.
+
+    Журнал и аудит процесса пишутся в тот же временный каталог, а не в logs/.
+
+    Должна быть вызвана до импорта app.
+    """
+    global _database_path
+    if _database_path is not None:
+        return _database_path
+    if 'app' in sys.modules:
+        raise RuntimeError(
+            "testing must be imported before app, otherwise the tests would "
+            "run against the application database")
+
+    directory = tempfile.mkdtemp(prefix=TEST_DB_PREFIX)
+    atexit.register(shutil.rmtree, directory, True)
+    _database_path = os.path.join(directory, 'test.db')
+    os.environ[DATABASE_ENV] = 'sqlite:///' + _database_path
+    os.environ['LOG_FILE'] = os.path.join(directory, 'service.log')
+    os.environ['AUDIT_DIR'] = os.path.join(directory, 'audit')
+    return _database_path
+
+
+def prepare_database():
+    """Создаёт схему тестовой базы один раз за процесс."""
+    global _prepared
+    if _prepared:
+        return
+    from app import app, db
+    from db_schema import bootstrap_schema
+
+    template = os.environ.get(TEMPLATE_ENV)
+    with app.app_context():
+        engine = db.engine
+        _enable_savepoints(engine)
+        if template:
+            engine.dispose()
+            shutil.copyfile(template, _database_path)
+        else:
+            with engine.begin() as connection:
+                bootstrap_schema(app, db.metadata, connection)
+    _prepared = True
+
+
+def _enable_savepoints(engine):
+    # pysqlite сам управляет транзакциями и ломает SAVEPOINT; передаём
+    # управление SQLAlchemy (рецепт из документации SQLAlchemy для SQLite)
+    from sqlalchemy import event
+
+    @event.listens_for(engine, 'connect')
+    def do_connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(engine, 'begin')
+    def do_begin(connection):
+        connection.exec_driver_sql('BEGIN')
+
+    engine.dispose()
+
+
+class DatabaseTestCase(unittest.TestCase):
+    """Тест с откатом всех изменений базы после каждого теста."""
+
+    @classmethod
+    def seed(cls):
+        """Данные, общие для всех тестов класса; создаются один раз."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        from sqlalchemy.orm import Session, scoped_session, sessionmaker
+        from flask_sqlalchemy.session import _app_ctx_id
+        from app import app, db
+
+        prepare_database()
+        app.config['TESTING'] = True
+        cls.app = app
+        cls.db = db
+        cls._app_session = db.session
+
+        with app.app_context():
+            cls._connection = db.engine.connect()
+        cls._transaction = cls._connection.begin()
+        # Сессии приложения работают в транзакции теста: commit только
+        # освобождает SAVEPOINT, а откат теста отменяет всё
+        db.session = scoped_session(sessionmaker(
+            class_=Session, bind=cls._connection,
+            join_transaction_mode='create_savepoint'), scopefunc=_app_ctx_id)
+
+        try:
+            with app.app_context():
+                cls.seed()
+                db.session.commit()
+        except Exception:
+            cls._restore()
+            raise
+
+    @classmethod
+    def tearDownClass(cls):
+        cls._restore()
+        super().tearDownClass()
+
+    @classmethod
+    def _restore(cls):
+        # Сессии закрываются вместе с контекстом приложения (teardown
+        # Flask-SQLAlchemy), здесь остаётся вернуть обычную сессию
+        cls.db.session = cls._app_session
+        if cls._transaction.is_active:
+            cls._transaction.rollback()
+        cls._connection.close()
+
+    def setUp(self):
+        super().setUp()
+        self._savepoint = self._connection.begin_nested()
+        self.client = self.app.test_client()
+
+    def tearDown(self):
+        if self._savepoint.is_active:
+            self._savepoint.rollback()
+        super().tearDown()
+
+
+def build_template():
+    """Создаёт базу со схемой для копирования процессами тестов."""
+    configure()
+    prepare_database()
+    return _database_path
+
+
+def _run_module(module, env):
+    start = time.perf_counter()
+    result = subprocess.run([sys.executable, '-m', 'unittest', '-q', module],
+                            env=env, capture_output=True, text=True)
+    return module, result.returncode, result.stderr, time.perf_counter() - start
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(
+        description='Параллельный запуск модулей тестов с отдельными базами')
+    parser.add_argument('modules', nargs='*',
+                        help='модули тестов (по умолчанию все test_*.py)')
+    parser.add_argument('-j', '--jobs', type=int, default=os.cpu_count() or 1,
+                        help='число процессов')
+    args = parser.parse_args(argv)
+
+    modules = args.modules or sorted(
+        name[:-3] for name in os.listdir('.')
+        if name.startswith('test_') and name.endswith('.py'))
+    modules = [module[:-3] if module.endswith('.py') else module for module in modules]
+
+    env = dict(os.environ, **{TEMPLATE_ENV: build_template()})
+    env.pop(DATABASE_ENV, None)
+
+    failed = []
+    with ThreadPoolExecutor(max_workers=args.jobs) as executor:
+        for module, returncode, output, seconds in executor.map(
+                lambda module: _run_module(module, env), modules):
+            status = 'ok' if returncode == 0 else 'FAILED'
+            print(f"{module:<28} {status:<7} {seconds:6.2f} с")
+            if returncode:
+                failed.append(module)
+                print(output)
+    print(f"Модулей: {len(modules)}, с ошибками: {len(failed)}")
+    return 1 if failed else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
+else:
+    configure()
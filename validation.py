@@ -1,58 +1,317 @@
 import re
 from datetime import datetime, date
+from decimal import Decimal, InvalidOperation
+
+try:
+    import numpy as np
+except ImportError:
+    np = None
+
+
+PHONE_PATTERN = re.compile(r'^(\+7|7|8)?[489][0-9]{9}$')
+PHONE_CLEAN_PATTERN = re.compile(r'[^\d+]')
+# Только ASCII-цифры и без пробелов: маршруты разбирают дату через strptime
+DATE_PATTERN = re.compile(r'^([0-9]{4})-([0-9]{1,2})-([0-9]{1,2})\Z')
+# Строки, которые NumPy разбирает так же, как _parse_date: без знака и
+# расширенного года ISO 8601 (+001990-01) и без нулевого года
+NUMPY_DATE_PATTERN = re.compile(r'^(?!0000)[0-9]{4}-[0-9]{2}-[0-9]{2}\Z')
+PRICE_PATTERN = re.compile(r'^(-?)(\d{1,10})(?:[.,](\d{1,2}))?$')
+PRICE_SEPARATORS_PATTERN = re.compile(r'[\s\u00a0\u202f]')
+
+MIN_BIRTH_DATE = date(1905, 1, 1)
+ADULT_AGE = 18
+# Как у NUMERIC(12, 2): не больше 10 знаков в рублях
+MAX_PRICE_KOPECKS = 10 ** 12 - 1
+
+# Размер пачки, начиная с которого проверка диапазонов дат идёт через NumPy
+NUMPY_MIN_BATCH = 1000
+
+# Коды ошибок пакетной проверки (None - значение корректно)
+REQUIRED = 'required'
+INVALID_PHONE = 'invalid_phone'
+INVALID_DATE = 'invalid_date'
+FUTURE_DATE = 'future_date'
+TOO_EARLY_DATE = 'too_early_date'
+UNDERAGE = 'underage'
+INVALID_PRICE = 'invalid_price'
+NEGATIVE_PRICE = 'negative_price'
+
+BIRTH_DATE_MESSAGES = {
+    REQUIRED: "Поле \"Дата рождения\" обязательно для заполнения",
+    INVALID_DATE: "Некорректный формат даты",
+    FUTURE_DATE: "Дата рождения не может быть в будущем",
+    TOO_EARLY_DATE: "Недопустимая дата рождения (позднее 1905г.)",
+    UNDERAGE: "Клиент должен быть совершеннолетним (18 лет)",
+}
+
+ORDER_DATE_MESSAGES = {
+    INVALID_DATE: "Некорректный формат даты",
+    FUTURE_DATE: "Дата заказа не может быть в будущем",
+}
+
+PRICE_MESSAGES = {
+    INVALID_PRICE: "Некорректная стоимость. Укажите сумму в рублях, не более двух знаков после запятой",
+    NEGATIVE_PRICE: "Стоимость не может быть отрицательной",
+}
+
+_EMPTY = object()
+_INVALID = object()
 
 
 def is_valid_phone(phone):
-    pattern = r'^(\+7|7|8)?[489][0-9]{9}$'
-    phone_clean = re.sub(r'[^\d+]', '', phone)
-    return re.match(pattern, phone_clean) is not None
+    phone_clean = PHONE_CLEAN_PATTERN.sub('', phone)
+    return PHONE_PATTERN.match(phone_clean) is not None
 
 
-class ValidDate:
-    @staticmethod
-    def is_valid_birth_date(date_str):
+def normalize_phone(phone):
+    """Приводит российский номер к формату E.164 (+7XXXXXXXXXX).
 
-        if not date_str or not date_str.strip():
-            return False, "Поле \"Дата рождения\" обязательно для заполнения"
+    Возвращает None, если номер не проходит проверку is_valid_phone.
+    """
+    if not phone:
+        return None
 
-        try:
-            birth_date = datetime.strptime(date_str, '%Y-%m-%d').date()
-            today = datetime.now().date()
-            impossible_date = datetime.strptime(
-                '1905-01-01', '%Y-%m-%d').date()
+    phone_clean = PHONE_CLEAN_PATTERN.sub('', phone)
+    if PHONE_PATTERN.match(phone_clean) is None:
+        return None
+    return '+7' + phone_clean[-10:]
 
-            if birth_date > today:
-                return False, "Дата рождения не может быть в будущем"
 
-            if birth_date < impossible_date:
-                return False, "Недопустимая дата рождения (позднее 1905г.)"
+def parse_price(value):
+    """Переводит стоимость в рублях в целое число копеек.
 
-            age = today.year - birth_date.year
+    Принимает числа и строки вида "1 500", "1500,5", "1500.50".
+    Бросает ValueError, если значение не является корректной суммой.
+    """
+    if isinstance(value, bool):
+        raise ValueError(INVALID_PRICE)
+    if isinstance(value, int):
+        kopecks = value * 100
+    elif isinstance(value, (float, Decimal)):
+        try:
+            amount = Decimal(str(value))
+        except InvalidOperation:
+            raise ValueError(INVALID_PRICE)
+        if not amount.is_finite() or amount != amount.quantize(Decimal('0.01')):
+            raise ValueError(INVALID_PRICE)
+        kopecks = int(amount * 100)
+    else:
+        match = PRICE_PATTERN.match(
+            PRICE_SEPARATORS_PATTERN.sub('', str(value or '')))
+        if match is None:
+            raise ValueError(INVALID_PRICE)
+        sign, rubles, fraction = match.groups()
+        kopecks = int(rubles) * 100 + int((fraction or '0').ljust(2, '0'))
+        if sign:
+            kopecks = -kopecks
 
-            if today < birth_date.replace(year=today.year):
-                age -= 1
+    if kopecks < 0:
+        raise ValueError(NEGATIVE_PRICE)
+    if kopecks > MAX_PRICE_KOPECKS:
+        raise ValueError(INVALID_PRICE)
+    return kopecks
 
-            return age >= 18, "Клиент должен быть совершеннолетним (18 лет)"
 
-        except ValueError:
-            return False, "Некорректный формат даты"
+def kopecks_to_rubles(kopecks):
+    """Целое число копеек -> Decimal в рублях с двумя знаками."""
+    return Decimal(int(kopecks or 0)).scaleb(-2)
 
-    @staticmethod
-    def is_valid_order_date(date_str):
+
+def validate_prices(values):
+    """Пакетная проверка стоимости, возвращает список кодов ошибок."""
+    codes = []
+    for value in values:
+        if is_empty_field(value):
+            codes.append(REQUIRED)
+            continue
         try:
-            if date_str is None or str(date_str).strip() == '':
-                return True, ''
+            parse_price(value)
+            codes.append(None)
+        except ValueError as e:
+            codes.append(str(e))
+    return codes
+
+
+class ReferenceDates:
+    """Опорные даты, вычисляемые один раз на пачку проверяемых значений."""
+
+    def __init__(self, today=None):
+        self.today = today or datetime.now().date()
+        self.adult_cutoff = _years_before(self.today, ADULT_AGE)
+        self.min_birth_date = MIN_BIRTH_DATE
+
+
+def _years_before(day, years):
+    try:
+        return day.replace(year=day.year - years)
+    except ValueError:
+        # 29 февраля в невисокосном году
+        return day.replace(year=day.year - years, day=28)
+
+
+def _parse_date(value):
+    if value is None:
+        return _EMPTY
+    if isinstance(value, datetime):
+        return value.date()
+    if isinstance(value, date):
+        return value
+
+    value = str(value)
+    if not value.strip():
+        return _EMPTY
+
+    match = DATE_PATTERN.match(value)
+    if match is None:
+        return _INVALID
+    try:
+        return date(int(match[1]), int(match[2]), int(match[3]))
+    except ValueError:
+        return _INVALID
+
+
+def _birth_date_code(birth_date, refs):
+    if birth_date is _EMPTY:
+        return REQUIRED
+    if birth_date is _INVALID:
+        return INVALID_DATE
+    if birth_date > refs.today:
+        return FUTURE_DATE
+    if birth_date < refs.min_birth_date:
+        return TOO_EARLY_DATE
+    if birth_date > refs.adult_cutoff:
+        return UNDERAGE
+    return None
 
-            order_date = datetime.strptime(str(date_str), '%Y-%m-%d').date()
-            today = datetime.now().date()
 
-            if order_date > today:
-                return False, "Дата заказа не может быть в будущем"
+def _order_date_code(order_date, refs):
+    if order_date is _EMPTY:
+        return None
+    if order_date is _INVALID:
+        return INVALID_DATE
+    if order_date > refs.today:
+        return FUTURE_DATE
+    return None
 
+
+def _parse_dates_numpy(values):
+    """Разбирает столбец строк с датами средствами NumPy.
+
+    Строки строго вида ГГГГ-ММ-ДД разбираются в C одним вызовом, остальные
+    (пустые, без ведущих нулей, годы со знаком) - по одной через _parse_date.
+    Возвращает (days, empty, invalid) или None, если столбец не подходит
+    для быстрого разбора.
+    """
+    if not all(type(value) is str for value in values):
+        return None
+
+    column = np.array(values, dtype=str)
+    days = np.full(len(column), np.datetime64('NaT'), dtype='datetime64[D]')
+    empty = np.zeros(len(column), dtype=bool)
+    invalid = np.zeros(len(column), dtype=bool)
+
+    fast = np.fromiter((NUMPY_DATE_PATTERN.match(value) is not None for value in values),
+                       dtype=bool, count=len(values))
+    try:
+        days[fast] = column[fast].astype('datetime64[D]')
+    except ValueError:
+        return None
+
+    for index in np.flatnonzero(~fast).tolist():
+        parsed = _parse_date(values[index])
+        if parsed is _EMPTY:
+            empty[index] = True
+        elif parsed is _INVALID:
+            invalid[index] = True
+        else:
+            days[index] = parsed
+
+    return days, empty, invalid
+
+
+def _date_codes_numpy(parsed, conditions):
+    days, empty, invalid = parsed
+    codes = np.select(
+        [empty, invalid] + [condition(days) for condition, _ in conditions],
+        [REQUIRED, INVALID_DATE] + [code for _, code in conditions],
+        default='')
+    return [code or None for code in codes.tolist()]
+
+
+def _birth_date_codes_numpy(parsed, refs):
+    today = np.datetime64(refs.today)
+    min_birth_date = np.datetime64(refs.min_birth_date)
+    adult_cutoff = np.datetime64(refs.adult_cutoff)
+    return _date_codes_numpy(parsed, [
+        (lambda days: days > today, FUTURE_DATE),
+        (lambda days: days < min_birth_date, TOO_EARLY_DATE),
+        (lambda days: days > adult_cutoff, UNDERAGE),
+    ])
+
+
+def _order_date_codes_numpy(parsed, refs):
+    today = np.datetime64(refs.today)
+    codes = _date_codes_numpy(parsed, [
+        (lambda days: days > today, FUTURE_DATE),
+    ])
+    # Пустая дата заказа допустима
+    return [None if code == REQUIRED else code for code in codes]
+
+
+def validate_phones(phones):
+    """Пакетная проверка номеров телефонов.
+
+    Возвращает список кодов ошибок той же длины, что и входной
+    (None - номер корректен).
+    """
+    match = PHONE_PATTERN.match
+    clean = PHONE_CLEAN_PATTERN.sub
+    return [
+        REQUIRED if is_empty_field(phone)
+        else None if match(clean('', phone)) is not None
+        else INVALID_PHONE
+        for phone in phones
+    ]
+
+
+def validate_birth_dates(values, today=None):
+    """Пакетная проверка дат рождения, возвращает список кодов ошибок."""
+    refs = ReferenceDates(today)
+    if np is not None and len(values) >= NUMPY_MIN_BATCH:
+        parsed = _parse_dates_numpy(values)
+        if parsed is not None:
+            return _birth_date_codes_numpy(parsed, refs)
+    return [_birth_date_code(_parse_date(value), refs) for value in values]
+
+
+def validate_order_dates(values, today=None):
+    """Пакетная проверка дат заказов, пустая дата допустима."""
+    refs = ReferenceDates(today)
+    if np is not None and len(values) >= NUMPY_MIN_BATCH:
+        parsed = _parse_dates_numpy(values)
+        if parsed is not None:
+            return _order_date_codes_numpy(parsed, refs)
+    return [_order_date_code(_parse_date(value), refs) for value in values]
+
+
+class ValidDate:
+    @staticmethod
+    def is_valid_birth_date(date_str, refs=None):
+        code = _birth_date_code(_parse_date(date_str),
+                                refs or ReferenceDates())
+        if code is not None:
+            return False, BIRTH_DATE_MESSAGES[code]
+        return True, ''
+
+    @staticmethod
+    def is_valid_order_date(date_str, refs=None):
+        try:
+            code = _order_date_code(_parse_date(date_str),
+                                    refs or ReferenceDates())
+            if code is not None:
+                return False, ORDER_DATE_MESSAGES[code]
             return True, ''
 
-        except ValueError:
-            return False, "Некорректный формат даты"
         except Exception as e:
             return False, f"Ошибка при обработке даты: {str(e)}"
 